@@ -21,6 +21,7 @@
 #include <fstream>
 #include <unordered_map>
 #include <time.h>
+#include <chrono>
 #include "ns3/core-module.h"
 #include "ns3/qbb-helper.h"
 #include "ns3/point-to-point-helper.h"
@@ -75,12 +76,23 @@ uint64_t link_down_time = 0;
 uint32_t link_down_A = 0, link_down_B = 0;
 
 uint32_t enable_trace = 1;
+std::string trace_output_format = "text";
+uint32_t trace_write_buffer = 16; // MB, 0: write the trace synchronously
+std::string trace_record_file = "mix.tr";
+uint32_t trace_shard_nodes = 0; // 0: a single trace file
+std::string trace_compress = ""; // none, gzip or zstd; empty: from the TRACE_OUTPUT_FILE suffix
+std::string agg_output_file = ""; // empty: no throughput aggregation
+uint32_t agg_slot_ns = 100; // 100ns is the resolution of mix.tr
+std::string agg_scope = "total"; // total, node or flow
 
 uint32_t buffer_size = 16;
 
 uint32_t qlen_dump_interval = 100000000, qlen_mon_interval = 100;
 uint64_t qlen_mon_start = 2000000000, qlen_mon_end = 2100000000;
 string qlen_mon_file;
+std::string qlen_mon_mode = "poll"; // poll: sample every qlen_mon_interval; event: SwitchMmu updates on enqueue/dequeue
+
+uint64_t progress_interval = 0; // ns of simulated time between progress lines, 0 to disable
 
 unordered_map<uint64_t, uint32_t> rate2kmax, rate2kmin;
 unordered_map<uint64_t, double> rate2pmax;
@@ -125,6 +137,7 @@ struct FlowInput{
 };
 FlowInput flow_input = {0};
 uint32_t flow_num;
+uint32_t flows_finished = 0;
 
 void ReadFlowInput(){
 	if (flow_input.idx < flow_num){
@@ -181,6 +194,7 @@ void qp_finish(FILE* fout, Ptr<RdmaQueuePair> q){
 	// sip, dip, sport, dport, size (B), start_time, fct (ns), standalone_fct (ns)
 	fprintf(fout, "%08x %08x %u %u %lu %lu %lu %lu\n", q->sip.Get(), q->dip.Get(), q->sport, q->dport, q->m_size, q->startTime.GetTimeStep(), (Simulator::Now() - q->startTime).GetTimeStep(), standalone_fct);
 	fflush(fout);
+	flows_finished++;
 
 	// remove rxQp from the receiver
 	Ptr<Node> dstNode = n.Get(did);
@@ -203,6 +217,12 @@ struct QlenDistribution{
 	}
 };
 map<uint32_t, map<uint32_t, QlenDistribution> > queue_result;
+void print_qlen_distribution(FILE* qlen_output, uint32_t sw, uint32_t port, const vector<uint32_t> &dist){
+	fprintf(qlen_output, "%u %u", sw, port);
+	for (uint32_t i = 0; i < dist.size(); i++)
+		fprintf(qlen_output, " %u", dist[i]);
+	fprintf(qlen_output, "\n");
+}
 void monitor_buffer(FILE* qlen_output, NodeContainer *n){
 	for (uint32_t i = 0; i < n->GetN(); i++){
 		if (n->Get(i)->GetNodeType() == 1){ // is switch
@@ -220,18 +240,59 @@ void monitor_buffer(FILE* qlen_output, NodeContainer *n){
 	if (Simulator::Now().GetTimeStep() % qlen_dump_interval == 0){
 		fprintf(qlen_output, "time: %lu\n", Simulator::Now().GetTimeStep());
 		for (auto &it0 : queue_result)
-			for (auto &it1 : it0.second){
-				fprintf(qlen_output, "%u %u", it0.first, it1.first);
-				auto &dist = it1.second.cnt;
-				for (uint32_t i = 0; i < dist.size(); i++)
-					fprintf(qlen_output, " %u", dist[i]);
-				fprintf(qlen_output, "\n");
-			}
+			for (auto &it1 : it0.second)
+				print_qlen_distribution(qlen_output, it0.first, it1.first, it1.second.cnt);
 		fflush(qlen_output);
 	}
 	if (Simulator::Now().GetTimeStep() < qlen_mon_end)
 		Simulator::Schedule(NanoSeconds(qlen_mon_interval), &monitor_buffer, qlen_output, n);
 }
+// QLEN_MON_MODE event: the distributions are kept by each SwitchMmu, only dump them here
+void dump_buffer(FILE* qlen_output, NodeContainer *n){
+	uint64_t now = Simulator::Now().GetTimeStep();
+	fprintf(qlen_output, "time: %lu\n", now);
+	for (uint32_t i = 0; i < n->GetN(); i++){
+		if (n->Get(i)->GetNodeType() == 1){ // is switch
+			Ptr<SwitchNode> sw = DynamicCast<SwitchNode>(n->Get(i));
+			// now + 1: include the sample the polling monitor would take at this instant
+			for (uint32_t j = 1; j < sw->GetNDevices(); j++)
+				print_qlen_distribution(qlen_output, i, j, sw->m_mmu->GetQlenDistribution(j, now + 1));
+		}
+	}
+	fflush(qlen_output);
+}
+void schedule_buffer_dumps(FILE* qlen_output, NodeContainer *n){
+	// Dump at the same instants as monitor_buffer: sampling instants that are multiples of qlen_dump_interval
+	uint64_t last = qlen_mon_start + (qlen_mon_end > qlen_mon_start ? (qlen_mon_end - qlen_mon_start + qlen_mon_interval - 1) / qlen_mon_interval * qlen_mon_interval : 0);
+	for (uint64_t t = (qlen_mon_start + qlen_dump_interval - 1) / qlen_dump_interval * qlen_dump_interval; t <= last; t += qlen_dump_interval)
+		if ((t - qlen_mon_start) % qlen_mon_interval == 0)
+			Simulator::Schedule(NanoSeconds(t), &dump_buffer, qlen_output, n);
+}
+
+/******************************************************
+ * Progress
+ *****************************************************/
+struct ProgressState{
+	std::chrono::steady_clock::time_point start, last;
+	uint64_t last_events;
+};
+ProgressState progress;
+// One line per progress_interval of simulated time: simulated time, executed events, event rate over the last interval, wall time
+// Stops once every flow has finished, so it does not keep the event queue busy until the stop time
+void print_progress(){
+	std::chrono::steady_clock::time_point now = std::chrono::steady_clock::now();
+	uint64_t events = Simulator::GetEventCount();
+	double wall = std::chrono::duration<double>(now - progress.start).count();
+	double interval = std::chrono::duration<double>(now - progress.last).count();
+	double sim = Simulator::Now().GetSeconds();
+	printf("PROGRESS sim %.6f s events %lu rate %.0f ev/s wall %.3f s sim/wall %.6f\n",
+			sim, events, interval > 0 ? (events - progress.last_events) / interval : 0.0, wall, wall > 0 ? sim / wall : 0.0);
+	fflush(stdout);
+	progress.last = now;
+	progress.last_events = events;
+	if (flows_finished < flow_num)
+		Simulator::Schedule(NanoSeconds(progress_interval), &print_progress);
+}
 
 void CalculateRoute(Ptr<Node> host){
 	// queue for the BFS.
@@ -478,9 +539,11 @@ int main(int argc, char *argv[])
 				std::string v;
 				conf >> v;
 				trace_output_file = v + ".bin";
+				trace_record_file = v;
 				if (argc > 2)
 				{
 					trace_output_file = trace_output_file + std::string(argv[2]);
+					trace_record_file = trace_record_file + std::string(argv[2]);
 				}
 				std::cout << "TRACE_OUTPUT_FILE\t\t" << trace_output_file << "\n";
 			}
@@ -599,6 +662,29 @@ int main(int argc, char *argv[])
 			}else if (key.compare("ENABLE_TRACE") == 0){
 				conf >> enable_trace;
 				std::cout << "ENABLE_TRACE\t\t\t\t" << enable_trace << '\n';
+			}else if (key.compare("TRACE_OUTPUT_FORMAT") == 0){
+				conf >> trace_output_format;
+				std::cout << "TRACE_OUTPUT_FORMAT\t\t\t" << trace_output_format << '\n';
+			}else if (key.compare("TRACE_WRITE_BUFFER") == 0){
+				conf >> trace_write_buffer;
+				std::cout << "TRACE_WRITE_BUFFER\t\t\t" << trace_write_buffer << '\n';
+			}else if (key.compare("TRACE_SHARD_NODES") == 0){
+				conf >> trace_shard_nodes;
+				std::cout << "TRACE_SHARD_NODES\t\t\t" << trace_shard_nodes << '\n';
+			}else if (key.compare("TRACE_COMPRESS") == 0){
+				conf >> trace_compress;
+				std::cout << "TRACE_COMPRESS\t\t\t\t" << trace_compress << '\n';
+			}else if (key.compare("AGG_OUTPUT_FILE") == 0){
+				conf >> agg_output_file;
+				if (argc > 2)
+					agg_output_file = agg_output_file + std::string(argv[2]);
+				std::cout << "AGG_OUTPUT_FILE\t\t\t\t" << agg_output_file << '\n';
+			}else if (key.compare("AGG_SLOT_NS") == 0){
+				conf >> agg_slot_ns;
+				std::cout << "AGG_SLOT_NS\t\t\t\t" << agg_slot_ns << '\n';
+			}else if (key.compare("AGG_SCOPE") == 0){
+				conf >> agg_scope;
+				std::cout << "AGG_SCOPE\t\t\t\t" << agg_scope << '\n';
 			}else if (key.compare("KMAX_MAP") == 0){
 				int n_k ;
 				conf >> n_k;
@@ -647,6 +733,12 @@ int main(int argc, char *argv[])
 			}else if (key.compare("QLEN_MON_END") == 0){
 				conf >> qlen_mon_end;
 				std::cout << "QLEN_MON_END\t\t\t\t" << qlen_mon_end << '\n';
+			}else if (key.compare("QLEN_MON_MODE") == 0){
+				conf >> qlen_mon_mode;
+				std::cout << "QLEN_MON_MODE\t\t\t\t" << qlen_mon_mode << '\n';
+			}else if (key.compare("PROGRESS_INTERVAL") == 0){
+				conf >> progress_interval;
+				std::cout << "PROGRESS_INTERVAL\t\t\t\t" << progress_interval << '\n';
 			}else if (key.compare("MULTI_RATE") == 0){
 				int v;
 				conf >> v;
@@ -867,6 +959,8 @@ int main(int argc, char *argv[])
 			sw->m_mmu->ConfigNPort(sw->GetNDevices()-1);
 			sw->m_mmu->ConfigBufferSize(buffer_size* 1024 * 1024);
 			sw->m_mmu->node_id = sw->GetId();
+			if (qlen_mon_mode.compare("event") == 0)
+				sw->m_mmu->ConfigQlenMonitor(qlen_mon_start, qlen_mon_end, qlen_mon_interval);
 		}
 	}
 
@@ -977,9 +1071,50 @@ int main(int argc, char *argv[])
 	}
 
 	FILE *trace_output = fopen(trace_output_file.c_str(), "w");
+	// text: mix.tr, binary: fixed-width records in mix.trb
+	if (trace_output_format.compare("binary") == 0)
+		TraceFormat::SetOutputFormat(TRACE_BINARY);
+	else
+		TraceFormat::SetOutputFormat(TRACE_TEXT);
+	TraceFormat::SetOutputPath(trace_record_file);
+	// compressed trace: mix.tr.gz / mix.tr.zst, written through an external gzip/zstd
+	if (trace_compress.compare("gzip") == 0)
+		TraceFormat::SetCompression(TRACE_COMPRESS_GZIP);
+	else if (trace_compress.compare("zstd") == 0)
+		TraceFormat::SetCompression(TRACE_COMPRESS_ZSTD);
+	else if (trace_compress.empty())
+		TraceFormat::SetCompression(TraceFormat::CompressionFromPath(trace_record_file));
+	else
+		TraceFormat::SetCompression(TRACE_COMPRESS_NONE);
+	// trace records are buffered and written by a background thread
+	TraceFormat::SetWriterBuffer((size_t)trace_write_buffer << 20);
+	// sharded trace: one file per trace_shard_nodes node ids, the buffer is split among the shards
+	if (trace_shard_nodes > 0){
+		uint32_t n_shards = (n.GetN() + trace_shard_nodes - 1) / trace_shard_nodes;
+		TraceFormat::SetShardNodes(trace_shard_nodes);
+		if (trace_write_buffer > 0)
+			TraceFormat::SetWriterBuffer(std::max(((size_t)trace_write_buffer << 20) / n_shards, (size_t)256 << 10));
+	}
 	if (enable_trace)
 		qbb.EnableTracing(trace_output, trace_nodes);
 
+	// per-slot packet/byte counters of the traced nodes, dumped at the end
+	ThroughputSink *agg_sink = NULL;
+	FILE *agg_output = NULL;
+	if (!agg_output_file.empty()){
+		// open the output now so a bad path fails before the simulation runs
+		agg_output = fopen(agg_output_file.c_str(), "w");
+		if (agg_output == NULL)
+			TraceFormat::Fatal("cannot open AGG_OUTPUT_FILE " + agg_output_file + ": " + strerror(errno));
+		ThroughputSink::Scope scope;
+		if (!ThroughputSink::ParseScope(agg_scope, scope)){
+			std::cout << "Unknown AGG_SCOPE " << agg_scope << ", using total\n";
+			scope = ThroughputSink::SCOPE_TOTAL;
+		}
+		agg_sink = new ThroughputSink(agg_slot_ns, scope);
+		qbb.EnableThroughputSink(agg_sink, trace_nodes);
+	}
+
 	// dump link speed to trace file
 	{
 		SimSetting sim_setting;
@@ -1027,7 +1162,13 @@ int main(int argc, char *argv[])
 
 	// schedule buffer monitor
 	FILE* qlen_output = fopen(qlen_mon_file.c_str(), "w");
-	Simulator::Schedule(NanoSeconds(qlen_mon_start), &monitor_buffer, qlen_output, &n);
+	if (qlen_mon_mode.compare("event") == 0)
+		schedule_buffer_dumps(qlen_output, &n);
+	else{
+		if (qlen_mon_mode.compare("poll") != 0)
+			std::cout << "Unknown QLEN_MON_MODE " << qlen_mon_mode << ", using poll\n";
+		Simulator::Schedule(NanoSeconds(qlen_mon_start), &monitor_buffer, qlen_output, &n);
+	}
 
 	//
 	// Now, do the actual simulation.
@@ -1036,12 +1177,28 @@ int main(int argc, char *argv[])
 	fflush(stdout);
 	NS_LOG_INFO("Run Simulation.");
 	Simulator::Stop(Seconds(simulator_stop_time));
+	progress.start = progress.last = std::chrono::steady_clock::now();
+	progress.last_events = 0;
+	if (progress_interval > 0)
+		Simulator::Schedule(NanoSeconds(progress_interval), &print_progress);
 	Simulator::Run();
+	{
+		double wall = std::chrono::duration<double>(std::chrono::steady_clock::now() - progress.start).count();
+		uint64_t events = Simulator::GetEventCount();
+		printf("DONE sim %.6f s events %lu rate %.0f ev/s wall %.3f s\n",
+				Simulator::Now().GetSeconds(), events, wall > 0 ? events / wall : 0.0, wall);
+	}
 	Simulator::Destroy();
+	bool traces_ok = TraceFormat::CloseWriters();
+	if (agg_sink){
+		agg_sink->Dump(agg_output);
+		fclose(agg_output);
+		delete agg_sink;
+	}
 	NS_LOG_INFO("Done.");
 	fclose(trace_output);
 
 	endt = clock();
 	std::cout << (double)(endt - begint) / CLOCKS_PER_SEC << "\n";
-
+	return traces_ok ? 0 : 1;
 }
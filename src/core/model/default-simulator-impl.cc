@@ -63,6 +63,7 @@ DefaultSimulatorImpl::DefaultSimulatorImpl ()
   m_currentUid = 0;
   m_currentTs = 0;
   m_currentContext = 0xffffffff;
+  m_eventCount = 0;
   m_unscheduledEvents = 0;
   m_eventsWithContextEmpty = true;
 #if HAVE_PTHREAD_H
@@ -139,6 +140,7 @@ DefaultSimulatorImpl::ProcessOneEvent (void)
   m_currentTs = next.key.m_ts;
   m_currentContext = next.key.m_context;
   m_currentUid = next.key.m_uid;
+  m_eventCount++;
   next.impl->Invoke ();
   next.impl->Unref ();
 
@@ -431,4 +433,10 @@ DefaultSimulatorImpl::GetContext (void) const
   return m_currentContext;
 }
 
+uint64_t
+DefaultSimulatorImpl::GetEventCount (void) const
+{
+  return m_eventCount;
+}
+
 } // namespace ns3
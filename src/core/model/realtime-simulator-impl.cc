@@ -82,6 +82,7 @@ RealtimeSimulatorImpl::RealtimeSimulatorImpl ()
   m_currentUid = 0;
   m_currentTs = 0;
   m_currentContext = 0xffffffff;
+  m_eventCount = 0;
   m_unscheduledEvents = 0;
 
   m_main = SystemThread::Self();
@@ -342,6 +343,7 @@ RealtimeSimulatorImpl::ProcessOneEvent (void)
     m_currentTs = next.key.m_ts;
     m_currentContext = next.key.m_context;
     m_currentUid = next.key.m_uid;
+    m_eventCount++;
 
     // 
     // We're about to run the event and we've done our best to synchronize this
@@ -813,6 +815,12 @@ RealtimeSimulatorImpl::GetContext (void) const
   return m_currentContext;
 }
 
+uint64_t
+RealtimeSimulatorImpl::GetEventCount (void) const
+{
+  return m_eventCount;
+}
+
 void 
 RealtimeSimulatorImpl::SetSynchronizationMode (enum SynchronizationMode mode)
 {
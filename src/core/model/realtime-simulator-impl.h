@@ -73,6 +73,7 @@ public:
   virtual void SetScheduler (ObjectFactory schedulerFactory);
   virtual uint32_t GetSystemId (void) const; 
   virtual uint32_t GetContext (void) const;
+  virtual uint64_t GetEventCount (void) const;
 
   void ScheduleRealtimeWithContext (uint32_t context, Time const &time, EventImpl *event);
   void ScheduleRealtime (Time const &time, EventImpl *event);
@@ -105,6 +106,7 @@ private:
   uint32_t m_currentUid;
   uint64_t m_currentTs;
   uint32_t m_currentContext;
+  uint64_t m_eventCount;
 
   mutable SystemMutex m_mutex;
 
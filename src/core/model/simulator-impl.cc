@@ -14,4 +14,10 @@ SimulatorImpl::GetTypeId (void)
   return tid;
 }
 
+uint64_t
+SimulatorImpl::GetEventCount (void) const
+{
+  return 0;
+}
+
 } // namespace ns3
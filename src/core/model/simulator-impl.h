@@ -182,6 +182,11 @@ public:
    * \return the current simulation context
    */
   virtual uint32_t GetContext (void) const = 0;
+  /**
+   * \return the number of events executed so far, or 0 if the
+   *         implementation does not count them
+   */
+  virtual uint64_t GetEventCount (void) const;
 };
 
 } // namespace ns3
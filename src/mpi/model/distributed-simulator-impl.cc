@@ -103,6 +103,7 @@ DistributedSimulatorImpl::DistributedSimulatorImpl ()
   m_currentUid = 0;
   m_currentTs = 0;
   m_currentContext = 0xffffffff;
+  m_eventCount = 0;
   m_unscheduledEvents = 0;
   m_events = 0;
 }
@@ -243,6 +244,7 @@ DistributedSimulatorImpl::ProcessOneEvent (void)
   m_currentTs = next.key.m_ts;
   m_currentContext = next.key.m_context;
   m_currentUid = next.key.m_uid;
+  m_eventCount++;
   next.impl->Invoke ();
   next.impl->Unref ();
 }
@@ -510,4 +512,10 @@ DistributedSimulatorImpl::GetContext (void) const
   return m_currentContext;
 }
 
+uint64_t
+DistributedSimulatorImpl::GetEventCount (void) const
+{
+  return m_eventCount;
+}
+
 } // namespace ns3
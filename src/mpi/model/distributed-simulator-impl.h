@@ -115,6 +115,7 @@ public:
   virtual void SetScheduler (ObjectFactory schedulerFactory);
   virtual uint32_t GetSystemId (void) const;
   virtual uint32_t GetContext (void) const;
+  virtual uint64_t GetEventCount (void) const;
 
 private:
   virtual void DoDispose (void);
@@ -132,6 +133,7 @@ private:
   uint32_t m_currentUid;
   uint64_t m_currentTs;
   uint32_t m_currentContext;
+  uint64_t m_eventCount;
   // number of events that have been inserted but not yet scheduled,
   // not counting the "destroy" events; this is used for validation
   int m_unscheduledEvents;
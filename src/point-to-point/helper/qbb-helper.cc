@@ -467,4 +467,27 @@ void QbbHelper::EnableTracing(FILE *file, NodeContainer node_container){
     }
 }
 
+void QbbHelper::MacRxAggregateCallback (ThroughputSink *sink, Ptr<QbbNetDevice> dev, Ptr<const Packet> p){
+	if (sink->GetScope() == ThroughputSink::SCOPE_FLOW){
+		TraceFormat tr;
+		GetTraceFromPacket(tr, dev, p, 0, Recv, true);
+		sink->Record(tr.time, tr.node, tr.sip, tr.dip, tr.sport, p->GetSize());
+	}else {
+		// no header parsing needed for the total/per-node counters
+		sink->Record(Simulator::Now().GetTimeStep(), dev->GetNode()->GetId(), 0, 0, 0, p->GetSize());
+	}
+}
+
+void QbbHelper::EnableThroughputSink(ThroughputSink *sink, NodeContainer node_container){
+  for (NodeContainer::Iterator i = node_container.Begin (); i != node_container.End (); ++i)
+    {
+      Ptr<Node> node = *i;
+      for (uint32_t j = 0; j < node->GetNDevices (); ++j)
+        {
+			if (node->GetDevice(j)->IsQbb())
+				DynamicCast<QbbNetDevice>(node->GetDevice(j))->TraceConnectWithoutContext("MacRx", MakeBoundCallback(&QbbHelper::MacRxAggregateCallback, sink, DynamicCast<QbbNetDevice>(node->GetDevice(j))));
+        }
+    }
+}
+
 } // namespace ns3
@@ -32,6 +32,8 @@ namespace ns3 {
 		memset(ingress_bytes, 0, sizeof(ingress_bytes));
 		memset(paused, 0, sizeof(paused));
 		memset(egress_bytes, 0, sizeof(egress_bytes));
+		memset(egress_port_bytes, 0, sizeof(egress_port_bytes));
+		qlen_mon_enabled = false;
 	}
 	bool SwitchMmu::CheckIngressAdmission(uint32_t port, uint32_t qIndex, uint32_t psize){
 		if (psize + hdrm_bytes[port][qIndex] > headroom[port] && psize + GetSharedUsed(port, qIndex) > GetPfcThreshold(port)){
@@ -61,7 +63,10 @@ namespace ns3 {
 		}
 	}
 	void SwitchMmu::UpdateEgressAdmission(uint32_t port, uint32_t qIndex, uint32_t psize){
+		if (qlen_mon_enabled)
+			UpdateQlenDistribution(port, Simulator::Now().GetTimeStep());
 		egress_bytes[port][qIndex] += psize;
+		egress_port_bytes[port] += psize;
 	}
 	void SwitchMmu::RemoveFromIngressAdmission(uint32_t port, uint32_t qIndex, uint32_t psize){
 		uint32_t from_hdrm = std::min(hdrm_bytes[port][qIndex], psize);
@@ -71,7 +76,10 @@ namespace ns3 {
 		shared_used_bytes -= from_shared;
 	}
 	void SwitchMmu::RemoveFromEgressAdmission(uint32_t port, uint32_t qIndex, uint32_t psize){
+		if (qlen_mon_enabled)
+			UpdateQlenDistribution(port, Simulator::Now().GetTimeStep());
 		egress_bytes[port][qIndex] -= psize;
+		egress_port_bytes[port] -= psize;
 	}
 	bool SwitchMmu::CheckShouldPause(uint32_t port, uint32_t qIndex){
 		return !paused[port][qIndex] && (hdrm_bytes[port][qIndex] > 0 || GetSharedUsed(port, qIndex) >= GetPfcThreshold(port));
@@ -127,4 +135,36 @@ namespace ns3 {
 	void SwitchMmu::ConfigBufferSize(uint32_t size){
 		buffer_size = size;
 	}
+	void SwitchMmu::ConfigQlenMonitor(uint64_t start, uint64_t end, uint64_t interval){
+		qlen_mon_start = start;
+		qlen_mon_interval = interval;
+		// The polling monitor samples at start, start + interval, ... and stops after the first sample at or after end
+		uint64_t last = start + (end > start ? (end - start + interval - 1) / interval * interval : 0);
+		qlen_mon_stop = last + 1;
+		for (uint32_t i = 0; i < pCnt; i++){
+			qlen_updated[i] = start;
+			qlen_dist[i].clear();
+		}
+		qlen_mon_enabled = true;
+	}
+	void SwitchMmu::UpdateQlenDistribution(uint32_t port, uint64_t now){
+		// Count the polling instants in [qlen_updated[port], now) at which the queue had its current length
+		uint64_t from = std::max(qlen_updated[port], qlen_mon_start);
+		uint64_t to = std::min(now, qlen_mon_stop);
+		if (to > from){
+			uint64_t n = (to - qlen_mon_start + qlen_mon_interval - 1) / qlen_mon_interval - (from - qlen_mon_start + qlen_mon_interval - 1) / qlen_mon_interval;
+			if (n > 0){
+				uint32_t kb = egress_port_bytes[port] / 1000;
+				if (qlen_dist[port].size() < kb + 1)
+					qlen_dist[port].resize(kb + 1);
+				qlen_dist[port][kb] += n;
+			}
+		}
+		if (now > qlen_updated[port])
+			qlen_updated[port] = now;
+	}
+	const std::vector<uint32_t>& SwitchMmu::GetQlenDistribution(uint32_t port, uint64_t now){
+		UpdateQlenDistribution(port, now);
+		return qlen_dist[port];
+	}
 }
@@ -28,6 +28,7 @@
 #include "ns3/deprecated.h"
 #include "ns3/trace-helper.h"
 #include "ns3/trace-format.h"
+#include "ns3/throughput-sink.h"
 #include "ns3/qbb-net-device.h"
 
 namespace ns3 {
@@ -159,6 +160,14 @@ public:
 
   void EnableTracing(FILE *file, NodeContainer node_container);
 
+  static void MacRxAggregateCallback (ThroughputSink *sink, Ptr<QbbNetDevice>, Ptr<const Packet> p);
+
+  /**
+   * Count the packets received by node_container (the same MacRx events
+   * EnableTracing writes to the trace) in sink, without a per-packet trace.
+   */
+  void EnableThroughputSink(ThroughputSink *sink, NodeContainer node_container);
+
 private:
   /**
    * \brief Enable pcap output the indicated net device.
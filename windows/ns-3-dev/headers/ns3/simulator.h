@@ -748,6 +748,11 @@ public:
    */
   static uint32_t GetContext (void);
 
+  /**
+   * \returns the number of events executed so far
+   */
+  static uint64_t GetEventCount (void);
+
   /**
    * \param time delay until the event expires
    * \param event the event to schedule
@@ -2,6 +2,7 @@
 #define SWITCH_MMU_H
 
 #include <unordered_map>
+#include <vector>
 #include <ns3/node.h>
 
 namespace ns3 {
@@ -40,6 +41,13 @@ public:
 	void ConfigHdrm(uint32_t port, uint32_t size);
 	void ConfigNPort(uint32_t n_port);
 	void ConfigBufferSize(uint32_t size);
+	void ConfigQlenMonitor(uint64_t start, uint64_t end, uint64_t interval);
+
+	// Event-driven queue length distribution: instead of polling egress_bytes every
+	// qlen_mon_interval, a port's distribution is advanced only when its egress queue
+	// changes, crediting the old length with the number of polling instants it was held for.
+	void UpdateQlenDistribution(uint32_t port, uint64_t now);
+	const std::vector<uint32_t>& GetQlenDistribution(uint32_t port, uint64_t now);
 
 	// config
 	uint32_t node_id;
@@ -52,6 +60,8 @@ public:
 	double pmax[pCnt];
 	uint32_t total_hdrm;
 	uint32_t total_rsrv;
+	bool qlen_mon_enabled;
+	uint64_t qlen_mon_start, qlen_mon_stop, qlen_mon_interval;
 
 	// runtime
 	uint32_t shared_used_bytes;
@@ -59,6 +69,9 @@ public:
 	uint32_t ingress_bytes[pCnt][qCnt];
 	uint32_t paused[pCnt][qCnt];
 	uint32_t egress_bytes[pCnt][qCnt];
+	uint32_t egress_port_bytes[pCnt]; // egress_bytes summed over all queues of a port
+	uint64_t qlen_updated[pCnt]; // time up to which qlen_dist[port] has been accounted
+	std::vector<uint32_t> qlen_dist[pCnt]; // qlen_dist[port][i]: polling instants with a queue of i KB
 };
 
 } /* namespace ns3 */
@@ -4,8 +4,13 @@
 #include <cstdio>
 #include <cassert>
 #include <vector>
+#include <string>
 #include <stddef.h>
 #include <cstring>
+#include <cstdlib>
+#include <csignal>
+#include <cerrno>
+#include "trace-writer.h"
 
 namespace ns3 {
 
@@ -73,6 +78,45 @@ namespace ns3 {
 	// 	}
 	// };
 
+	enum TraceOutputFormat {
+		TRACE_TEXT = 0,   // one "%.7f /%u %u.%u>%u.%u u %u %u %u" line per packet in mix.tr
+		TRACE_BINARY = 1  // fixed-width TraceRecord per packet in mix.trb, after a layout header
+	};
+
+	enum TraceCompression {
+		TRACE_COMPRESS_NONE = 0,
+		TRACE_COMPRESS_GZIP = 1, // piped through "gzip", file name ends in .gz
+		TRACE_COMPRESS_ZSTD = 2  // piped through "zstd", file name ends in .zst
+	};
+
+#pragma pack(push, 1)
+	// On-disk record of the binary trace format, little-endian, no padding.
+	struct TraceRecord {
+		uint64_t time; // ns
+		uint16_t node;
+		uint32_t sip, dip;
+		uint16_t sport;
+		uint32_t seq;
+		uint16_t pg;
+	};
+
+	// Binary trace header: the magic, then the layout of TraceRecord so that
+	// readers (e.g. numpy.fromfile with a structured dtype) need no hard-coded offsets.
+	struct TraceFileHeader {
+		char magic[8];        // "MIXTRACE"
+		uint32_t version;
+		uint32_t header_size; // bytes before the first record
+		uint32_t record_size;
+		uint32_t num_fields;
+	};
+
+	struct TraceFieldDesc {
+		char name[16];
+		char dtype[8];        // numpy type string, e.g. "<u8"
+		uint32_t offset;
+	};
+#pragma pack(pop)
+
 	struct TraceFormat {
 		uint64_t time;
 		uint16_t node;
@@ -82,8 +126,252 @@ namespace ns3 {
 		uint16_t pg;
 		uint8_t l3Prot;
 
+		static TraceOutputFormat &OutputFormat() {
+			static TraceOutputFormat format = TRACE_TEXT;
+			return format;
+		}
+
+		static void SetOutputFormat(TraceOutputFormat format) {
+			OutputFormat() = format;
+		}
+
+		// Size of each in-memory trace buffer; 0 writes synchronously.
+		static size_t &WriterBufferBytes() {
+			static size_t bytes = 16 << 20;
+			return bytes;
+		}
+
+		static void SetWriterBuffer(size_t bytes) {
+			WriterBufferBytes() = bytes;
+		}
+
+		struct WriterList {
+			std::vector<TraceWriter*> writers;
+			std::vector<std::string> paths;
+			~WriterList() {
+				for (size_t i = 0; i < writers.size(); i++)
+					writers[i]->Close();
+			}
+		};
+
+		static WriterList &Writers() {
+			static WriterList list;
+			return list;
+		}
+
+		static TraceCompression &Compression() {
+			static TraceCompression compression = TRACE_COMPRESS_NONE;
+			return compression;
+		}
+
+		static void SetCompression(TraceCompression compression) {
+			Compression() = compression;
+		}
+
+		static const char *CompressionSuffix(TraceCompression compression) {
+			switch (compression) {
+				case TRACE_COMPRESS_GZIP:
+					return ".gz";
+				case TRACE_COMPRESS_ZSTD:
+					return ".zst";
+				default:
+					return "";
+			}
+		}
+
+		static bool HasSuffix(const std::string &path, const char *suffix) {
+			size_t len = strlen(suffix);
+			return len > 0 && path.size() >= len && path.compare(path.size() - len, len, suffix) == 0;
+		}
+
+		// Compression implied by the file name (mix.tr.gz, mix.tr.zst)
+		static TraceCompression CompressionFromPath(const std::string &path) {
+			if (HasSuffix(path, CompressionSuffix(TRACE_COMPRESS_GZIP)))
+				return TRACE_COMPRESS_GZIP;
+			if (HasSuffix(path, CompressionSuffix(TRACE_COMPRESS_ZSTD)))
+				return TRACE_COMPRESS_ZSTD;
+			return TRACE_COMPRESS_NONE;
+		}
+
+		static TraceWriter *OpenWriter(FILE *fp, TraceWriter::CloseFn close_fn = fclose, const std::string &path = "") {
+			TraceWriter *writer = new TraceWriter(fp, WriterBufferBytes(), 4, close_fn);
+			Writers().writers.push_back(writer);
+			Writers().paths.push_back(path);
+			return writer;
+		}
+
+		// Trace file from TRACE_OUTPUT_FILE; binary traces get a "b" suffix (mix.tr -> mix.trb).
+		static std::string &OutputPath() {
+			static std::string path = "mix.tr";
+			return path;
+		}
+
+		static void SetOutputPath(const std::string &path) {
+			OutputPath() = path;
+		}
+
+		// 0: one trace file; N: node ids [k*N, (k+1)*N) go to shard k.
+		static uint32_t &ShardNodes() {
+			static uint32_t nodes = 0;
+			return nodes;
+		}
+
+		static void SetShardNodes(uint32_t nodes) {
+			ShardNodes() = nodes;
+		}
+
+		// Shard k of "dir/mix.tr" is "dir/mix.000k.tr"
+		static std::string ShardPath(const std::string &path, uint32_t shard) {
+			char index[16];
+			snprintf(index, sizeof(index), ".%04u", shard);
+			size_t base = path.find_last_of("/\\");
+			size_t dot = path.rfind('.');
+			if (dot == std::string::npos || (base != std::string::npos && dot < base) || dot == base + 1)
+				return path + index;
+			return path.substr(0, dot) + index + path.substr(dot);
+		}
+
+		static std::vector<TraceWriter*> &ShardWriters() {
+			static std::vector<TraceWriter*> writers;
+			return writers;
+		}
+
+		static TraceWriter *GetWriter(uint32_t node) {
+			uint32_t shard = ShardNodes() ? node / ShardNodes() : 0;
+			std::vector<TraceWriter*> &writers = ShardWriters();
+			if (shard >= writers.size())
+				writers.resize(shard + 1, NULL);
+			if (writers[shard] == NULL) {
+				// e.g. shard 3 of a gzip-compressed binary trace: mix.0003.trb.gz
+				const char *suffix = CompressionSuffix(Compression());
+				std::string path = OutputPath();
+				if (HasSuffix(path, suffix))
+					path.erase(path.size() - strlen(suffix));
+				if (OutputFormat() == TRACE_BINARY)
+					path += "b";
+				if (ShardNodes())
+					path = ShardPath(path, shard);
+				path += suffix;
+				writers[shard] = OpenTraceFile(path);
+			}
+			return writers[shard];
+		}
+
+		// Flush and close every trace file; call after Simulator::Destroy().
+		// Returns false (after reporting on stderr) if any trace is incomplete.
+		static bool CloseWriters() {
+			WriterList &list = Writers();
+			bool ok = true;
+			for (size_t i = 0; i < list.writers.size(); i++) {
+				int status = list.writers[i]->Close();
+				if (status != 0) {
+					fprintf(stderr, "Error: trace file %s is incomplete (write or compressor failure, status %d)\n", list.paths[i].c_str(), status);
+					ok = false;
+				}
+			}
+			return ok;
+		}
+
+		static void WriteBinaryHeader(FILE *fp) {
+			const TraceFieldDesc fields[] = {
+				{"time", "<u8", offsetof(TraceRecord, time)},
+				{"node", "<u2", offsetof(TraceRecord, node)},
+				{"sip", "<u4", offsetof(TraceRecord, sip)},
+				{"dip", "<u4", offsetof(TraceRecord, dip)},
+				{"sport", "<u2", offsetof(TraceRecord, sport)},
+				{"seq", "<u4", offsetof(TraceRecord, seq)},
+				{"pg", "<u2", offsetof(TraceRecord, pg)},
+			};
+			TraceFileHeader header;
+			memcpy(header.magic, "MIXTRACE", sizeof(header.magic));
+			header.version = 1;
+			header.num_fields = sizeof(fields) / sizeof(fields[0]);
+			header.header_size = sizeof(header) + sizeof(fields);
+			header.record_size = sizeof(TraceRecord);
+			fwrite(&header, sizeof(header), 1, fp);
+			fwrite(fields, sizeof(fields), 1, fp);
+		}
+
+		static void Fatal(const std::string &message) {
+			fprintf(stderr, "Error: %s\n", message.c_str());
+			exit(1);
+		}
+
+		// Quote path as a single shell word for the compressor command line.
+		static std::string ShellQuote(const std::string &path) {
+#ifdef _WIN32
+			// cmd.exe: file names cannot contain '"'; '%' would still be expanded
+			if (path.find_first_of("\"%") != std::string::npos)
+				Fatal("unsupported character in trace file name " + path);
+			return "\"" + path + "\"";
+#else
+			std::string quoted = "'";
+			for (size_t i = 0; i < path.size(); i++) {
+				if (path[i] == '\'')
+					quoted += "'\\''";
+				else
+					quoted += path[i];
+			}
+			return quoted + "'";
+#endif
+		}
+
+		// Compressed traces are written through a gzip/zstd process, which must be on PATH.
+		static TraceWriter *OpenTraceFile(const std::string &path) {
+			bool binary = OutputFormat() == TRACE_BINARY;
+			TraceWriter::CloseFn close_fn = fclose;
+			FILE *fp;
+			if (Compression() == TRACE_COMPRESS_NONE) {
+				fp = fopen(path.c_str(), binary ? "wb" : "w");
+				if (fp == NULL)
+					Fatal("cannot open trace file " + path + ": " + strerror(errno));
+			} else {
+				const char *tool = Compression() == TRACE_COMPRESS_GZIP ? "gzip" : "zstd";
+				// popen() succeeds even when the compressor is missing; check it up front (once)
+				static bool probed = false;
+				if (!probed) {
+					std::string probe = std::string(tool) + " -V > " TRACE_NULL_DEVICE " 2>&1";
+					if (system(probe.c_str()) != 0)
+						Fatal(std::string(tool) + " not found on PATH, needed for trace file " + path);
+					probed = true;
+				}
+#ifndef _WIN32
+				// A compressor that dies mid-run makes fwrite fail with EPIPE (reported
+				// by CloseWriters) instead of killing the simulator with SIGPIPE.
+				signal(SIGPIPE, SIG_IGN);
+#endif
+				std::string cmd = Compression() == TRACE_COMPRESS_GZIP ? "gzip -1 -c" : "zstd -q -c";
+				cmd += " > " + ShellQuote(path);
+				fp = TRACE_POPEN(cmd.c_str(), binary ? TRACE_POPEN_BINARY : "w");
+				if (fp == NULL)
+					Fatal("cannot start " + cmd + ": " + strerror(errno));
+				close_fn = TRACE_PCLOSE;
+			}
+			if (binary)
+				WriteBinaryHeader(fp);
+			return OpenWriter(fp, close_fn, path);
+		}
+
+		void SerializeBinary(TraceWriter *writer) {
+			TraceRecord rec;
+			rec.time = time;
+			rec.node = node;
+			rec.sip = sip;
+			rec.dip = dip;
+			rec.sport = sport;
+			rec.seq = seq;
+			rec.pg = pg;
+			writer->Write(&rec, sizeof(rec));
+		}
+
+		// The FILE* opened from TRACE_OUTPUT_FILE carries the SimSetting header,
+		// records go to OutputPath() (or its shards) instead.
 		void Serialize(FILE *file) {
-			static FILE *mix_fp = fopen("mix.tr", "w");
+			TraceWriter *writer = GetWriter(node);
+			if (OutputFormat() == TRACE_BINARY) {
+				SerializeBinary(writer);
+				return;
+			}
 
 			// Convert time to seconds with 7 decimal places
 			double time_sec = time / 1e9;
@@ -96,7 +384,7 @@ namespace ns3 {
 
 			// Format and write the output string
 			char buffer[256];
-			snprintf(buffer, sizeof(buffer), "%.7f /%u %u.%u>%u.%u u %u %u %u\n",
+			int len = snprintf(buffer, sizeof(buffer), "%.7f /%u %u.%u>%u.%u u %u %u %u\n",
 					time_sec,
 					node,
 					src_second, src_fourth,
@@ -105,7 +393,7 @@ namespace ns3 {
 					seq,
 					pg);
 
-			fputs(buffer, mix_fp);
+			writer->Write(buffer, len);
 		}
 	};
 
@@ -0,0 +1,147 @@
+#ifndef TRACE_WRITER_H
+#define TRACE_WRITER_H
+#include <stdint.h>
+#include <cstdio>
+#include <cstring>
+#include <deque>
+#include <vector>
+#include <thread>
+#include <mutex>
+#include <condition_variable>
+
+#ifdef _WIN32
+#define TRACE_POPEN _popen
+#define TRACE_PCLOSE _pclose
+#define TRACE_POPEN_BINARY "wb"
+#define TRACE_NULL_DEVICE "NUL"
+#else
+#define TRACE_POPEN popen
+#define TRACE_PCLOSE pclose
+#define TRACE_POPEN_BINARY "w" // popen() only accepts "r"/"w"
+#define TRACE_NULL_DEVICE "/dev/null"
+#endif
+
+namespace ns3 {
+
+	/*
+	 * Buffered asynchronous writer for the packet trace.
+	 *
+	 * Records are appended to an in-memory buffer on the simulation thread;
+	 * full buffers are handed to a background thread that fwrite()s them in
+	 * order, so the bytes on disk are exactly what a synchronous fwrite()
+	 * per record would have produced.
+	 *
+	 * Memory is bounded: at most max_pending full buffers wait for the
+	 * background thread. When the disk cannot keep up, Write() blocks until
+	 * a buffer is drained (backpressure) instead of growing without limit.
+	 *
+	 * buffer_bytes == 0 disables the background thread and writes synchronously.
+	 * close_fn closes the stream, e.g. TRACE_PCLOSE for a compressor pipe.
+	 * Close() returns non-zero if any write failed or close_fn reported an
+	 * error (for a pipe: the compressor's exit status).
+	 */
+	class TraceWriter {
+	public:
+		typedef int (*CloseFn)(FILE *);
+
+		TraceWriter(FILE *fp, size_t buffer_bytes, size_t max_pending = 4, CloseFn close_fn = fclose)
+			: m_fp(fp), m_close(close_fn), m_bufferBytes(buffer_bytes), m_maxPending(max_pending ? max_pending : 1), m_stop(false), m_status(0) {
+			if (m_bufferBytes > 0) {
+				m_current.reserve(m_bufferBytes);
+				m_thread = std::thread(&TraceWriter::Run, this);
+			}
+		}
+
+		~TraceWriter() {
+			Close();
+		}
+
+		void Write(const void *data, size_t len) {
+			if (m_fp == NULL)
+				return;
+			if (m_bufferBytes == 0) {
+				fwrite(data, 1, len, m_fp);
+				return;
+			}
+			if (m_current.size() + len > m_bufferBytes && !m_current.empty())
+				Submit();
+			const char *p = (const char*)data;
+			m_current.insert(m_current.end(), p, p + len);
+		}
+
+		// Drain all buffered records and close the file; returns 0 on success.
+		int Close() {
+			if (m_fp == NULL)
+				return m_status;
+			if (m_thread.joinable()) {
+				if (!m_current.empty())
+					Submit();
+				{
+					std::lock_guard<std::mutex> lock(m_mutex);
+					m_stop = true;
+				}
+				m_dataCv.notify_one();
+				m_thread.join();
+			}
+			int failed = ferror(m_fp);
+			m_status = m_close(m_fp);
+			if (m_status == 0 && failed)
+				m_status = -1;
+			m_fp = NULL;
+			return m_status;
+		}
+
+	private:
+		// Hand the current buffer to the writer thread, waiting while too many are pending.
+		void Submit() {
+			std::unique_lock<std::mutex> lock(m_mutex);
+			while (m_pending.size() >= m_maxPending)
+				m_spaceCv.wait(lock);
+			m_pending.push_back(std::vector<char>());
+			m_pending.back().swap(m_current);
+			if (!m_free.empty()) {
+				m_current.swap(m_free.back());
+				m_free.pop_back();
+			}
+			lock.unlock();
+			m_dataCv.notify_one();
+			m_current.reserve(m_bufferBytes);
+		}
+
+		void Run() {
+			std::unique_lock<std::mutex> lock(m_mutex);
+			while (true) {
+				while (m_pending.empty() && !m_stop)
+					m_dataCv.wait(lock);
+				if (m_pending.empty())
+					break;
+				std::vector<char> buf;
+				buf.swap(m_pending.front());
+				m_pending.pop_front();
+				lock.unlock();
+				fwrite(buf.data(), 1, buf.size(), m_fp);
+				buf.clear();
+				lock.lock();
+				m_free.push_back(std::vector<char>());
+				m_free.back().swap(buf);
+				m_spaceCv.notify_one();
+			}
+		}
+
+		FILE *m_fp;
+		CloseFn m_close;
+		size_t m_bufferBytes;
+		size_t m_maxPending;
+		std::vector<char> m_current;          // filled by the simulation thread only
+		std::deque<std::vector<char> > m_pending; // full buffers, oldest first
+		std::vector<std::vector<char> > m_free;   // drained buffers for reuse
+		bool m_stop;
+		int m_status;
+		std::mutex m_mutex;
+		std::condition_variable m_dataCv, m_spaceCv;
+		std::thread m_thread;
+	};
+
+} // namespace ns3
+
+#endif /* TRACE_WRITER_H */
@@ -9,6 +9,10 @@ import argparse
 from pathlib import Path
 file_dir = Path(__file__).parent
 
+# 共用 mix 目录下的流式读取模块
+sys.path.insert(0, str(file_dir.parent))
+from trace_stream import scan_trace
+
 # 创建参数解析器
 parser = argparse.ArgumentParser(description='Configuration File Reader')
 parser.add_argument('--config', type=str, default=f'{file_dir/'config.txt'}', help='Path to the configuration file')
@@ -36,38 +40,14 @@ except Exception as e:
 print(f"The value of PACKET_PAYLOAD_SIZE is: {packet_payload_size}")
 
 # 初始化变量
-timestamps = []
-sequence_numbers = []
 packet_size = packet_payload_size + 18  # 每个数据包的大小，单位为字节
 
-# 读取数据文件
-with open(args.trace, 'r') as file:
-    for line in file:
-        parts = line.split()
-        if len(parts) < 7:
-            continue
-        timestamps.append(float(parts[0]))
-        sequence_numbers.append(int(parts[5]))
-
-# 计算每个时隙的带宽
-time_slots = []
-bandwidths = []
+# 分块流式读取数据文件并计算每个时隙的带宽
 time_slot_duration = 1e-4  # 时隙的持续时间，单位为秒
-current_slot_start = timestamps[0]
-current_slot_packets = 0
-
-for i in range(len(timestamps)):
-    if timestamps[i] < current_slot_start + time_slot_duration:
-        current_slot_packets += 1
-    else:
-        # 计算当前时隙的带宽
-        throughput = (current_slot_packets * packet_size * 8) / time_slot_duration / 1e9  # 带宽单位为 Gbps
-        time_slots.append(current_slot_start)
-        bandwidths.append(throughput)
-
-        # 移动到下一个时隙
-        current_slot_start += time_slot_duration
-        current_slot_packets = 0
+counter = scan_trace(args.trace, time_slot_duration)
+# 换槽时不计入触发包, 且丢弃最后一个未关闭的时隙
+time_slots, bandwidths = counter.result(packet_size, carry=False, include_last=False)
+time_slots, bandwidths = time_slots.tolist(), bandwidths.tolist()
 
 # 计算平均带宽
 average_bandwidth = sum(bandwidths) / len(bandwidths)
@@ -139,8 +119,8 @@ print(f'Average Bandwidth from {start_time_3:.6f} s to {end_time_3:.6f} s: {spec
 print(f'Fluctuation Rate from {start_time_3:.6f} s to {end_time_3:.6f} s: {fluctuation_rate_3:.6f}')
 
 # 计算网络平均带宽利用率
-total_data = len(timestamps) * packet_size * 8 / 1e9  # 总数据量(Gbits)
-completion_time = timestamps[-1]  # 实际整体流完成时间
+total_data = counter.num_packets * packet_size * 8 / 1e9  # 总数据量(Gbits)
+completion_time = counter.last_time  # 实际整体流完成时间
 theoretical_bandwidth = 8 * 12 * 25  # 存储理论总带宽 (8*12*25G)
 
 # bandwidth_utilization = (total_data / completion_time) / theoretical_bandwidth
@@ -166,7 +146,7 @@ print(''.join(rd_stdout.readlines()))
 rd_stdout.close()
 
 with open('result.txt', 'w') as file:
-    file.write(f'flow_completion_time {timestamps[-1]}\n')
+    file.write(f'flow_completion_time {counter.last_time}\n')
     file.write(f'average_bandwidth {average_bandwidth}\n')
     file.write(f'fluctuation_rate_1 {fluctuation_rate_1}\n')
     file.write(f'fluctuation_rate_2 {fluctuation_rate_2}\n')
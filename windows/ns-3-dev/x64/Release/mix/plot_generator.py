@@ -114,7 +114,7 @@ def plot_metrics(time_slots, bandwidths, intervals, timestamps, show_plot=True):
     # 新增：时间差值随时间变化
     plt.subplot(3, 1, 3)
     # 获取唯一时间戳并排序
-    unique_times = sorted(list(set(timestamps)))
+    unique_times = np.unique(timestamps)
     # 计算相邻时间戳的差值
     time_diffs = np.diff(unique_times)
     # 绘制时间差值图（使用前一个时间戳作为x轴）
@@ -181,7 +181,7 @@ def main():
                       help='不显示图表界面')
     args = parser.parse_args()
 
-    time_slots, bandwidths, intervals, timestamps = calculate_score()
+    time_slots, bandwidths, intervals, timestamps = calculate_score(keep_unique_times=True)
 
     # 生成图表，根据no-show参数决定是否显示
     plot_metrics(time_slots, bandwidths, intervals, timestamps, show_plot=not args.no_show)
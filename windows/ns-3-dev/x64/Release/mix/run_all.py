@@ -48,7 +48,7 @@ class CommandRunner:
             commands = [
                 # ['./run.sh', '>/dev/null', '&']
                 # ['../../run.sh']
-                ['../../../main-dcqcn-v1.exe', 'config.txt', '|', 'tee out.txt']
+                ['../../../main-dcqcn-v1.exe', 'config.txt']
             ]
 
             for cmd in commands:
@@ -59,18 +59,17 @@ class CommandRunner:
 
                 try:
                     logging.info(f"Executing: {cmd_str} in \n\t{directory}")
-                    result = subprocess.run(
-                        cmd,
-                        check=True,
-                        capture_output=True,
-                        text=True
-                    )
-                    logging.debug(f"Command output of {cmd_str} in \n\t{directory}:\n{result.stdout}--------------------------------------------\n")
-                    if result.stderr:
-                        logging.warning(f"Command stderr: {result.stderr}")
+                    # 参数列表中的 '|' 不会经过 shell, 仿真输出直接写入 out.txt
+                    with open('out.txt', 'w') as out:
+                        subprocess.run(
+                            cmd,
+                            check=True,
+                            stdout=out,
+                            stderr=subprocess.STDOUT,
+                            text=True
+                        )
                 except subprocess.CalledProcessError as e:
-                    logging.error(f"Error running {cmd_str} in {directory}: {e}")
-                    logging.error(f"Error output: {e.stderr}")
+                    logging.error(f"Error running {cmd_str} in {directory}: {e}, see out.txt")
                 except Exception as e:
                     logging.error(f"Unexpected error running {cmd_str}: {e}")
 
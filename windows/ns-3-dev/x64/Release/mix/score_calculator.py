@@ -1,6 +1,8 @@
 import sys
 import argparse
+import numpy as np
 from pathlib import Path
+from trace_stream import iter_trace_chunks, iter_trace_columns, SlotCounter
 
 # 修正相对路径
 from pathlib import Path
@@ -29,18 +31,29 @@ def read_flow_SIZE(flow_path):
     return None
 
 def read_trace(trace_path):
-    """读取跟踪文件"""
+    """读取跟踪文件, 返回逐包的时间戳与序号 (占用内存与 trace 长度成正比, 评分不再使用)"""
     timestamps = []
     sequence_numbers = []
-    with open(trace_path, 'r') as file:
-        for line in file:
-            parts = line.split()
-            if len(parts) < 7:
-                continue
-            timestamps.append(float(parts[0]))
-            sequence_numbers.append(int(parts[5]))
+    for chunk in iter_trace_chunks(trace_path, ('time', 'seq')):
+        timestamps.extend(chunk['time'].tolist())
+        sequence_numbers.extend(chunk['seq'].tolist())
     return timestamps, sequence_numbers
 
+def scan_trace(trace_path, time_slot_duration=1e-4, keep_unique_times=False):
+    """分块流式统计每个时隙的包数, 不保留逐包数据
+
+    返回 (SlotCounter, unique_times); keep_unique_times 为 True 时另外收集排序后的
+    不重复时间戳供 plot_generator 的时间差子图使用, 其大小与不同时间戳的个数成正比
+    """
+    counter = SlotCounter(time_slot_duration)
+    unique_chunks = []
+    for chunk in iter_trace_columns(trace_path, ('time',), use_cache=False):
+        counter.update(chunk['time'])
+        if keep_unique_times:
+            unique_chunks.append(np.unique(chunk['time']))
+    unique_times = np.unique(np.concatenate(unique_chunks)) if unique_chunks else None
+    return counter, unique_times
+
 def calculate_bandwidths(timestamps, packet_size, time_slot_duration=1e-4):
     """计算每个时隙的带宽"""
     time_slots = []
@@ -109,9 +122,8 @@ def calculate_interval_metrics(time_slots, bandwidths, start_time, end_time):
 #             (max_time * 0.75, max_time * 0.833)    # 约对应 90ms-100ms
 #         ]
 
-def get_intervals(timestamps, origin_6400 = False):
-    """根据trace文件的时间戳确定采样区间"""
-    max_time = timestamps[-1]
+def get_intervals(max_time, origin_6400 = False):
+    """根据trace文件的最后一个时间戳确定采样区间"""
 
     if origin_6400:  # 原始6400行数据的硬编码情况
         return [
@@ -151,18 +163,20 @@ def get_intervals(timestamps, origin_6400 = False):
                 intervals.append((start_time, end_time))
 
         return intervals
-def calculate_score(config_path = 'config.txt', trace_path = 'mix.tr'):
+def calculate_score(config_path = 'config.txt', trace_path = 'mix.tr', keep_unique_times = False):
     # 读取配置和数据
     packet_payload_size = read_config_PACKET_PAYLOAD_SIZE(config_path)
     packet_size = packet_payload_size + 18
-    timestamps, sequence_numbers = read_trace(trace_path)
+    counter, unique_times = scan_trace(trace_path, keep_unique_times=keep_unique_times)
+    completion_time = counter.last_time
 
-    # 计算带宽
-    time_slots, bandwidths = calculate_bandwidths(timestamps, packet_size)
+    # 计算带宽; 时隙序列长度只与仿真时长有关, 转为列表后沿用原有的区间计算
+    time_slots, bandwidths = counter.result(packet_size)
+    time_slots, bandwidths = time_slots.tolist(), bandwidths.tolist()
     average_bandwidth = sum(bandwidths) / len(bandwidths)
 
     # 根据行数获取适当的时间区间
-    intervals = get_intervals(timestamps, read_flow_SIZE(read_config_FLOW_FILE(config_path)) == 6400)
+    intervals = get_intervals(completion_time, read_flow_SIZE(read_config_FLOW_FILE(config_path)) == 6400)
 
     # 存储每个区间的结果
     results = {}
@@ -198,15 +212,15 @@ def calculate_score(config_path = 'config.txt', trace_path = 'mix.tr'):
 
     # 保存结果
     with open('plot-result.txt', 'w') as file:
-        file.write(f'flow_completion_time {timestamps[-1]}\n')
+        file.write(f'flow_completion_time {completion_time}\n')
         file.write(f'average_bandwidth {average_bandwidth}\n')
         for i in range(1, len(intervals) + 1):
             file.write(f'fluctuation_rate_{i} {results[f"interval_{i}"]["fluctuation_rate"]}\n')
         file.write(f"\nBandwidth Utilization: {bandwidth_utilization:.6f}\n")
         file.write(f"Final Score: {final_score:.2f}")
 
-    # 返回数据供绘图使用
-    return time_slots, bandwidths, intervals, timestamps
+    # 返回数据供绘图使用, 第四项为不重复的时间戳 (keep_unique_times 为 False 时为 None)
+    return time_slots, bandwidths, intervals, unique_times
 
 def main():
     # 参数解析
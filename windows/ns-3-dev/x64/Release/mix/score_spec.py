@@ -0,0 +1,318 @@
+"""声明式评分规格
+
+评分的各项口径写在规格文件 (JSON / TOML / YAML) 中, 而不是写死在脚本里:
+    name                  规格名
+    slot                  时隙宽度 (秒)
+    header_bytes          每个包在 PACKET_PAYLOAD_SIZE 之外的头部开销 (字节)
+    carry, include_last   时隙口径, 含义见 trace_stream.SlotCounter.result
+    theoretical_bandwidth 理论总带宽 (Gbps), 或 {"topology": 路径, "nodes": [起始, 结束)}
+                          由 topology.txt 中这些主机的接入链路速率求和; 省略路径时使用
+                          config.txt 的 TOPOLOGY_FILE, 省略 nodes 时为全部主机
+    windows               [{"start", "end", "weight"}, ...] 的固定窗口 (秒), 或
+                          {"adaptive": {"exponent": 0.8}} 即 score_calculator.get_intervals 的自适应窗口
+                          (FLOW_FILE 为 6400 条流时为原始的三个固定窗口);
+                          未给出 weight 的窗口权重为 1 / 窗口数
+    variants              [{"name", 覆盖的字段 ...}, ...], 每项在顶层规格上覆盖若干字段得到一个评分变体
+
+gen_result.py 与 score_calculator.py 的窗口分别取自 score_spec.json 中的 gen_result 与
+score_calculator 变体.
+
+final_score = (平均带宽 / 理论带宽 - sum(weight_i * 波动率_i)) * 100.
+
+trace 只扫描一次: 每种时隙宽度一个 SlotCounter, 同一时隙序列上所有规格的全部窗口
+由 SlotIndex.window_metrics 一次向量化计算, 因此可以对同一个 trace 试验任意多种评分口径.
+"""
+import os
+import re
+import csv
+import copy
+import json
+import argparse
+import numpy as np
+from pathlib import Path
+
+# 每个包在 PACKET_PAYLOAD_SIZE 之外的头部开销 (字节)
+HEADER_BYTES = 18
+# 8 个存储节点 x 12 个 25G 端口
+THEORETICAL_BANDWIDTH = 8 * 12 * 25
+
+# gen_result.py 的评分口径
+DEFAULT_SPEC = {
+    'name': 'default',
+    'slot': 1e-4,
+    'header_bytes': HEADER_BYTES,
+    'carry': False,
+    'include_last': False,
+    'theoretical_bandwidth': THEORETICAL_BANDWIDTH,
+    'windows': [
+        {'start': 1e-4, 'end': 5e-3, 'weight': 0.5},
+        {'start': 0.04, 'end': 0.06, 'weight': 1.0},
+        {'start': 0.09, 'end': 0.1, 'weight': 0.5},
+    ],
+}
+
+RATE_UNITS = {'': 1e-9, 'K': 1e-6, 'M': 1e-3, 'G': 1.0, 'T': 1e3}
+
+# 与脚本放在一起的规格文件, gen_result.py 与 score_calculator.py 从中读取各自变体的窗口
+SPEC_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'score_spec.json')
+
+
+class SpecError(ValueError):
+    pass
+
+
+def read_spec_file(spec_path):
+    """按扩展名读取规格文件, 返回原始的 dict"""
+    suffix = Path(spec_path).suffix.lower()
+    if suffix == '.json':
+        with open(spec_path, 'r') as file:
+            return json.load(file)
+    if suffix == '.toml':
+        import tomllib
+        with open(spec_path, 'rb') as file:
+            return tomllib.load(file)
+    if suffix in ('.yaml', '.yml'):
+        try:
+            import yaml
+        except ImportError:
+            raise SpecError(f'{spec_path}: reading YAML specs requires PyYAML (pip install pyyaml)')
+        with open(spec_path, 'r') as file:
+            return yaml.safe_load(file)
+    raise SpecError(f'{spec_path}: unknown spec format {suffix!r}, expected .json, .toml, .yaml or .yml')
+
+
+def _check_spec(spec):
+    name = spec['name']
+    if spec['slot'] <= 0:
+        raise SpecError(f'{name}: slot must be positive')
+    windows = spec['windows']
+    if isinstance(windows, dict):
+        if set(windows) != {'adaptive'}:
+            raise SpecError(f'{name}: windows must be a list or {{"adaptive": {{...}}}}')
+    else:
+        for window in windows:
+            if window['end'] <= window['start']:
+                raise SpecError(f"{name}: window {window['start']}-{window['end']} is empty")
+    return spec
+
+
+def expand_specs(raw, default_name='default'):
+    """在 DEFAULT_SPEC 上依次叠加顶层字段与各个 variants, 返回规格列表"""
+    base = copy.deepcopy(DEFAULT_SPEC)
+    base['name'] = default_name
+    base.update({key: value for key, value in raw.items() if key != 'variants'})
+    variants = raw.get('variants') or [{'name': base['name']}]
+    specs = []
+    for i, variant in enumerate(variants):
+        spec = copy.deepcopy(base)
+        spec['name'] = f"{base['name']}-{i}"
+        spec.update(variant)
+        unknown = set(spec) - set(DEFAULT_SPEC)
+        if unknown:
+            raise SpecError(f"{spec['name']}: unknown spec fields {sorted(unknown)}")
+        specs.append(_check_spec(spec))
+    return specs
+
+
+def load_specs(spec_paths):
+    """读取若干规格文件; 未给出 name 的规格以文件名命名"""
+    specs = []
+    for spec_path in spec_paths:
+        specs.extend(expand_specs(read_spec_file(spec_path), Path(spec_path).stem))
+    return specs
+
+
+_named_specs = {}
+
+
+def named_spec(name, spec_path=SPEC_FILE):
+    """规格文件中名为 name 的规格 (同一文件只读取一次)"""
+    if spec_path not in _named_specs:
+        _named_specs[spec_path] = {spec['name']: spec for spec in load_specs([spec_path])}
+    specs = _named_specs[spec_path]
+    if name not in specs:
+        raise SpecError(f'{spec_path}: no spec named {name!r}')
+    return specs[name]
+
+
+def parse_rate(rate):
+    """'25Gbps' 之类的链路速率, 返回 Gbps"""
+    match = re.fullmatch(r'([0-9.eE+-]+)\s*([KMGT]?)bps', rate.strip())
+    if match is None:
+        raise SpecError(f'unknown link rate {rate!r}')
+    return float(match.group(1)) * RATE_UNITS[match.group(2)]
+
+
+def topology_bandwidth(topology_path, nodes=None):
+    """topology.txt 中主机接入链路的速率之和 (Gbps); nodes 为 [起始, 结束) 时只统计这些主机"""
+    with open(topology_path, 'r') as file:
+        node_num, switch_num, link_num = map(int, file.readline().split())
+        switches = set(map(int, file.readline().split()))
+        total = 0.0
+        for _ in range(link_num):
+            src, dst, rate = file.readline().split()[:3]
+            src, dst = int(src), int(dst)
+            if (src in switches) == (dst in switches):
+                continue
+            host = dst if src in switches else src
+            if nodes is None or nodes[0] <= host < nodes[1]:
+                total += parse_rate(rate)
+    return total
+
+
+def read_config_value(config_path, key):
+    if not os.path.exists(config_path):
+        return None
+    with open(config_path, 'r') as file:
+        for line in file:
+            parts = line.split()
+            if len(parts) >= 2 and parts[0] == key:
+                return parts[1]
+    return None
+
+
+def read_flow_count(config_path='config.txt'):
+    """config.txt 的 FLOW_FILE 第一行的流数, 路径相对于 config.txt 所在目录; 读取失败时返回 None"""
+    flow_file = read_config_value(config_path, 'FLOW_FILE')
+    if flow_file is None:
+        return None
+    try:
+        with open(os.path.join(os.path.dirname(os.path.abspath(config_path)), flow_file), 'r') as file:
+            return int(file.readline().split()[0])
+    except (OSError, IndexError, ValueError):
+        return None
+
+
+def theoretical_bandwidth(spec, config_path='config.txt'):
+    """规格的理论带宽 (Gbps); 拓扑路径相对于 config.txt 所在目录"""
+    value = spec['theoretical_bandwidth']
+    if not isinstance(value, dict):
+        return float(value)
+    topology = value.get('topology') or read_config_value(config_path, 'TOPOLOGY_FILE')
+    if topology is None:
+        raise SpecError(f"{spec['name']}: no topology file for theoretical_bandwidth")
+    topology = os.path.join(os.path.dirname(os.path.abspath(config_path)), topology)
+    nodes = value.get('nodes')
+    return topology_bandwidth(topology, tuple(nodes) if nodes is not None else None)
+
+
+def spec_windows(spec, completion_time, origin_6400=False):
+    """返回 (windows, weights), windows 为 (start, end) 列表; origin_6400 见 score_calculator.get_intervals"""
+    windows = spec['windows']
+    if isinstance(windows, dict):
+        from score_calculator import get_intervals
+        options = windows['adaptive'] or {}
+        intervals = get_intervals(completion_time, origin_6400, options.get('exponent', 0.8))
+        return intervals, [1.0 / len(intervals)] * len(intervals)
+    intervals = [(window['start'], window['end']) for window in windows]
+    weights = [window.get('weight', 1.0 / len(windows)) for window in windows]
+    return intervals, weights
+
+
+def scan_slot_counters(trace_path, slots, use_cache=True):
+    """一次扫描 trace, 为每种时隙宽度填充一个 SlotCounter"""
+    from trace_stream import SlotCounter, iter_trace_columns
+    counters = {slot: SlotCounter(slot) for slot in slots}
+    for chunk in iter_trace_columns(trace_path, ('time',), use_cache):
+        for counter in counters.values():
+            counter.update(chunk['time'])
+    return counters
+
+
+def score_specs(specs, counters, packet_payload_size, config_path='config.txt'):
+    """按各规格评分, counters 为 {时隙宽度: SlotCounter}; 返回与 specs 一一对应的结果"""
+    from score_calculator import SlotIndex
+    # 同一时隙序列 (时隙宽度, 口径, 包大小) 上的规格共用一个 SlotIndex
+    groups = {}
+    for i, spec in enumerate(specs):
+        key = (spec['slot'], bool(spec['carry']), bool(spec['include_last']), packet_payload_size + spec['header_bytes'])
+        groups.setdefault(key, []).append(i)
+
+    # 自适应窗口在原始 6400 条流的场景下使用固定窗口, 与 score_calculator.py 一致
+    origin_6400 = read_flow_count(config_path) == 6400
+    results = [None] * len(specs)
+    for (slot, carry, include_last, packet_size), members in groups.items():
+        counter = counters[slot]
+        time_slots, bandwidths = counter.result(packet_size, carry, include_last)
+        index = SlotIndex(time_slots, bandwidths)
+        average_bandwidth = float(bandwidths.mean()) if len(bandwidths) else 0.0
+
+        windows = [spec_windows(specs[i], counter.last_time, origin_6400) for i in members]
+        starts = np.array([start for intervals, _ in windows for start, _ in intervals], dtype=np.float64)
+        ends = np.array([end for intervals, _ in windows for _, end in intervals], dtype=np.float64)
+        averages, fluctuations = index.window_metrics(starts, ends)
+
+        offset = 0
+        for i, (intervals, weights) in zip(members, windows):
+            spec = specs[i]
+            n = len(intervals)
+            window_averages, window_fluctuations = averages[offset:offset + n], fluctuations[offset:offset + n]
+            offset += n
+            bandwidth = theoretical_bandwidth(spec, config_path)
+            utilization = average_bandwidth / bandwidth
+            final_score = (utilization - float(np.dot(weights, window_fluctuations))) * 100
+            results[i] = {
+                'name': spec['name'],
+                'completion_time': counter.last_time,
+                'average_bandwidth': average_bandwidth,
+                'theoretical_bandwidth': bandwidth,
+                'bandwidth_utilization': utilization,
+                'windows': [
+                    {'start': start, 'end': end, 'weight': weight,
+                     'average_bandwidth': float(avg), 'fluctuation_rate': float(fluct)}
+                    for (start, end), weight, avg, fluct in zip(intervals, weights, window_averages, window_fluctuations)
+                ],
+                'final_score': final_score,
+            }
+    return results
+
+
+def print_scores(results):
+    width = max([8] + [len(result['name']) for result in results])
+    print(f"{'spec':<{width}} {'avg_bw(Gbps)':>13} {'theory(Gbps)':>13} {'utilization':>12} "
+          f"{'windows':>8} {'fluctuation':>12} {'score':>9}")
+    for result in results:
+        fluctuation = sum(window['weight'] * window['fluctuation_rate'] for window in result['windows'])
+        print(f"{result['name']:<{width}} {result['average_bandwidth']:>13.6f} {result['theoretical_bandwidth']:>13g} "
+              f"{result['bandwidth_utilization']:>12.6f} {len(result['windows']):>8} {fluctuation:>12.6f} "
+              f"{result['final_score']:>9.4f}")
+
+
+def write_scores(results, path):
+    """.json 保存完整结果 (含各窗口), 其他扩展名写每个规格一行的 CSV"""
+    if path.endswith('.json'):
+        with open(path, 'w') as file:
+            json.dump(results, file, indent=2)
+        return
+    with open(path, 'w', newline='') as file:
+        writer = csv.writer(file)
+        writer.writerow(['name', 'completion_time', 'average_bandwidth', 'theoretical_bandwidth',
+                         'bandwidth_utilization', 'fluctuation_rates', 'final_score'])
+        for result in results:
+            writer.writerow([result['name'], result['completion_time'], result['average_bandwidth'],
+                             result['theoretical_bandwidth'], result['bandwidth_utilization'],
+                             ' '.join(str(window['fluctuation_rate']) for window in result['windows']),
+                             result['final_score']])
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Score a trace under one or more declarative scoring specs')
+    parser.add_argument('specs', nargs='*', help='Spec files (.json, .toml, .yaml); default: the gen_result.py scoring')
+    parser.add_argument('--config', type=str, default='config.txt', help='Path to config file')
+    parser.add_argument('--trace', type=str, default='mix.tr', help='Path to trace file')
+    parser.add_argument('--no-cache', action='store_true', help='Do not read or write the columnar trace cache')
+    parser.add_argument('--output', type=str, default=None, help='Write the scores to this .csv or .json file')
+    args = parser.parse_args()
+
+    from trace_stream import resolve_trace_path
+    specs = load_specs(args.specs) if args.specs else [copy.deepcopy(DEFAULT_SPEC)]
+    packet_payload_size = int(read_config_value(args.config, 'PACKET_PAYLOAD_SIZE'))
+    counters = scan_slot_counters(resolve_trace_path(args.trace), {spec['slot'] for spec in specs}, not args.no_cache)
+    results = score_specs(specs, counters, packet_payload_size, args.config)
+    print_scores(results)
+    if args.output:
+        write_scores(results, args.output)
+
+
+if __name__ == '__main__':
+    main()
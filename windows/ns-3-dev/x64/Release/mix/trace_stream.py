@@ -0,0 +1,883 @@
+"""mix.tr 的流式读取与增量统计
+
+TraceFormat::Serialize 输出的每一行为
+    "%.7f /%u %u.%u>%u.%u u %u %u %u"
+即 time /node src>dst u sport seq pg 共 7 个字段.
+
+iter_trace_chunks 按固定字节数分块读取文件, 每块解析为若干 NumPy 列,
+SlotCounter 逐块累计每个时隙的包数, 内存占用与 trace 长度无关.
+iter_trace_mmap 则把文件 mmap 后按窗口直接在字节数组上解析上述固定格式,
+不为每行创建 Python 对象, 可以处理比内存更大的 trace.
+
+第一次文本解析时会在 trace 旁边写一个列式缓存目录 (mix.tr.cols/),
+每列一个可 memmap 的二进制文件, 以 trace 的大小和修改时间作为键.
+之后的分析 (plot_generator.py 之后的 gen_result.py 等) 直接映射这些列, 不再解析文本.
+
+配置 TRACE_OUTPUT_FORMAT binary 时仿真改为输出二进制的 mix.trb:
+文件头 (magic "MIXTRACE" 及各字段的名称/类型/偏移) 之后是定长记录,
+这里按文件头构造结构化 dtype 后直接 memmap, 完全不需要解析.
+读取接口按 magic 自动识别两种格式, 时间列换算为与文本 "%.7f" 完全一致的秒数.
+
+配置 TRACE_SHARD_NODES N 时 trace 按节点号每 N 个一组分片写出 (mix.0000.tr, mix.0001.tr, ...).
+各分片内按时间有序, 可以分别并行处理; 需要全局时间顺序时 merge_trace_columns
+按块做 k 路归并. mix.tr 不存在而分片存在时, 读取接口自动归并各分片.
+
+仿真也可以直接输出 gzip/zstd 压缩的 trace (mix.tr.gz, mix.tr.zst).
+open_trace 按 magic 识别压缩格式并边读边解压, 各读取接口对压缩文件透明;
+第一次读取后同样写入列式缓存, 之后的分析不再解压.
+
+配置 AGG_OUTPUT_FILE 时仿真在内部按时隙统计收到的包数并在结束时输出紧凑的时间序列,
+scan_series 由它得到与 scan_trace 完全相同的 SlotCounter, 不需要逐包 trace.
+
+TraceFollower 跟随仿真仍在写入的 trace, 每次只读取新增的完整记录, 用于运行中的增量评分.
+"""
+import io
+import os
+import re
+import gzip
+import json
+import mmap
+import contextlib
+import subprocess
+import shutil
+import tempfile
+import numpy as np
+
+# 每次读取的字节数, 约 40 万行
+CHUNK_BYTES = 16 << 20
+# 每行字段数
+TRACE_FIELDS = 7
+# 列名 -> (字段下标, 类型)
+# 文本 trace 中的地址只保留了 IP 的第二和第四个字节, sip/dip 列为 (第二字节 << 16) | 第四字节,
+# 即 ip & 0x00ff00ff; 二进制 trace 中为完整的 32 位 IP
+TRACE_COLUMNS = {
+    'time': (0, np.float64),
+    'node': (1, np.int64),
+    'sip': (2, np.int64),
+    'dip': (2, np.int64),
+    'sport': (4, np.int64),
+    'seq': (5, np.int64),
+    'pg': (6, np.int64),
+}
+
+# mmap 解析时每个窗口的字节数; 每个窗口的临时数组约为窗口大小的 30 倍
+MMAP_WINDOW_BYTES = 4 << 20
+# 每行中的十进制数字串个数: 时间整数部分, 时间小数部分, node, 源地址两段, 目的地址两段, sport, seq, pg
+TRACE_NUMBERS = 10
+# 列名 -> 数字串下标 (time 由前两个数字串组合得到)
+MMAP_NUMBERS = {'node': 2, 'sport': 7, 'seq': 8, 'pg': 9}
+# 地址列 -> (第二字节, 第四字节) 的数字串下标
+MMAP_ADDRESSES = {'sip': (3, 4), 'dip': (5, 6)}
+# 10 的幂, 用于按位权组合数字以及把时间的定点表示转换为浮点数
+POW10 = 10 ** np.arange(19, dtype=np.int64)
+POW10_FLOAT = POW10.astype(np.float64)
+
+# 列式缓存目录后缀、格式版本以及各列的存储类型 (与 TraceFormat 中的字段宽度一致)
+CACHE_SUFFIX = '.cols'
+CACHE_VERSION = 2
+CACHE_DTYPES = {
+    'time': np.float64,
+    'node': np.uint16,
+    'sip': np.uint32,
+    'dip': np.uint32,
+    'sport': np.uint16,
+    'seq': np.uint32,
+    'pg': np.uint16,
+}
+# 从缓存读取时每块的行数
+CACHE_CHUNK_ROWS = 1 << 20
+
+# 二进制 trace 的文件头, 与 trace-format.h 中的 TraceFileHeader / TraceFieldDesc 对应
+BINARY_SUFFIX = 'b'
+BINARY_MAGIC = b'MIXTRACE'
+BINARY_VERSION = 1
+BINARY_HEADER = np.dtype([('magic', 'S8'), ('version', '<u4'), ('header_size', '<u4'),
+                          ('record_size', '<u4'), ('num_fields', '<u4')])
+BINARY_FIELD = np.dtype([('name', 'S16'), ('dtype', 'S8'), ('offset', '<u4')])
+
+# 聚合时间序列 (throughput-sink.h) 各 scope 的键列
+SERIES_KEYS = {
+    'total': (),
+    'node': ('node',),
+    'flow': ('sip', 'dip', 'sport'),
+}
+
+# 压缩 trace 的 magic 与文件名后缀
+GZIP_MAGIC = b'\x1f\x8b'
+ZSTD_MAGIC = b'\x28\xb5\x2f\xfd'
+COMPRESSED_SUFFIXES = ('.gz', '.zst')
+
+
+def trace_compression(trace_path):
+    """按文件开头的 magic 判断压缩格式, 返回 'gzip', 'zstd' 或 None"""
+    try:
+        with open(trace_path, 'rb') as file:
+            head = file.read(len(ZSTD_MAGIC))
+    except OSError:
+        return None
+    if head.startswith(GZIP_MAGIC):
+        return 'gzip'
+    if head.startswith(ZSTD_MAGIC):
+        return 'zstd'
+    return None
+
+
+@contextlib.contextmanager
+def open_trace(trace_path):
+    """以二进制流打开 trace, gzip/zstd 压缩的文件边读边解压
+
+    zstd 优先使用 zstandard 模块, 未安装时调用 zstd 命令行解压.
+    """
+    compression = trace_compression(trace_path)
+    if compression == 'gzip':
+        with gzip.open(trace_path, 'rb') as file:
+            yield file
+    elif compression == 'zstd':
+        try:
+            import zstandard
+        except ImportError:
+            zstandard = None
+        if zstandard is not None:
+            with open(trace_path, 'rb') as raw, zstandard.ZstdDecompressor().stream_reader(raw) as reader:
+                yield io.BufferedReader(reader, 1 << 20)
+        else:
+            process = subprocess.Popen(['zstd', '-dcq', str(trace_path)], stdout=subprocess.PIPE)
+            try:
+                yield process.stdout
+            finally:
+                process.stdout.close()
+                process.wait()
+    else:
+        with open(trace_path, 'rb') as file:
+            yield file
+
+
+def _read_exact(file, size):
+    """从 (解压) 流中读取 size 字节, 只有到达文件末尾时才会更少"""
+    data = file.read(size)
+    if len(data) == size or not data:
+        return data
+    parts = [data]
+    size -= len(data)
+    while size > 0:
+        data = file.read(size)
+        if not data:
+            break
+        parts.append(data)
+        size -= len(data)
+    return b''.join(parts)
+
+
+def _concatenate_chunks(chunks, columns):
+    return {name: np.concatenate([chunk[name] for chunk in chunks]) if chunks
+            else np.empty(0, dtype=TRACE_COLUMNS[name][1]) for name in columns}
+
+
+def _split_fields(data):
+    """把一段完整行切分为字段列表, 字段数不足 7 的行被跳过"""
+    tokens = data.split()
+    num_lines = data.count(b'\n') + (0 if data.endswith(b'\n') else 1)
+    if len(tokens) == TRACE_FIELDS * num_lines and tokens[3::TRACE_FIELDS].count(b'u') == num_lines:
+        return tokens
+
+    # 存在空行或格式不规整的行时逐行处理
+    fields = []
+    for line in data.splitlines():
+        parts = line.split()
+        if len(parts) < TRACE_FIELDS:
+            continue
+        fields.extend(parts[:TRACE_FIELDS])
+    return fields
+
+
+def parse_trace_block(data, columns=('time',)):
+    """解析一段由完整行组成的字节串, 返回 {列名: ndarray}"""
+    fields = _split_fields(data)
+    chunk = {}
+    for name in columns:
+        position, dtype = TRACE_COLUMNS[name]
+        values = fields[position::TRACE_FIELDS]
+        if name == 'node':
+            # 节点字段形如 "/320"
+            values = b' '.join(values).replace(b'/', b'').split()
+        elif name in MMAP_ADDRESSES and values:
+            # 地址字段形如 "0.1>0.2"
+            octets = np.array(b' '.join(values).replace(b'>', b' ').replace(b'.', b' ').split()).astype(dtype)
+            octets = octets.reshape(-1, 4)
+            second, fourth = (0, 1) if name == 'sip' else (2, 3)
+            chunk[name] = octets[:, second] << 16 | octets[:, fourth]
+            continue
+        chunk[name] = np.array(values).astype(dtype) if values else np.empty(0, dtype=dtype)
+    return chunk
+
+
+def _parse_lines(block, cut, columns):
+    """解析 block[:cut] 中的完整行, 优先按固定格式解析"""
+    chunk = _parse_fixed_layout(np.frombuffer(block, dtype=np.uint8, count=cut), columns)
+    if chunk is None:
+        chunk = parse_trace_block(block[:cut], columns)
+    return chunk
+
+
+def iter_trace_chunks(trace_path, columns=('time',), chunk_bytes=CHUNK_BYTES):
+    """按块读取 (可能压缩的) trace 文件, 每次产出一个 {列名: ndarray} 字典, 块边界总在行尾"""
+    with open_trace(trace_path) as file:
+        remainder = b''
+        while True:
+            block = file.read(chunk_bytes)
+            if not block:
+                break
+            block = remainder + block
+            cut = block.rfind(b'\n') + 1
+            remainder = block[cut:]
+            if cut == 0:
+                continue
+            chunk = _parse_lines(block, cut, columns)
+            if len(chunk[columns[0]]):
+                yield chunk
+
+        if remainder.strip():
+            chunk = parse_trace_block(remainder, columns)
+            if len(chunk[columns[0]]):
+                yield chunk
+
+
+def _parse_fixed_layout(buf, columns):
+    """在 uint8 数组上按固定格式解析完整行, 格式不规整时返回 None
+
+    每行应恰好包含 10 个数字串且都位于本行的换行符之前. 数字串的值按位权
+    一次 reduceat 求出; 时间由 (整数部分 * 10^k + 小数部分) / 10^k 得到,
+    分子分母都可精确表示, 因此与 float() 解析文本的结果逐位一致.
+    """
+    newlines = np.flatnonzero(buf == ord('\n'))
+    if len(buf) and buf[-1] != ord('\n'):
+        newlines = np.append(newlines, len(buf))
+    num_lines = len(newlines)
+
+    digits = buf - np.uint8(ord('0'))
+    is_digit = digits < 10
+    edges = np.diff(is_digit.view(np.int8), prepend=np.int8(0), append=np.int8(0))
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1)
+    if len(starts) != TRACE_NUMBERS * num_lines:
+        return None
+    line_starts = np.concatenate(([-1], newlines[:-1]))
+    if np.any(starts[::TRACE_NUMBERS] <= line_starts) or np.any(ends[TRACE_NUMBERS - 1::TRACE_NUMBERS] > newlines):
+        return None
+    lengths = ends - starts
+    if num_lines and lengths.max() >= len(POW10):
+        return None
+
+    positions = np.flatnonzero(is_digit)
+    number_ids = np.repeat(np.arange(len(starts), dtype=np.int32), lengths)
+    weights = POW10[ends[number_ids] - 1 - positions]
+    offsets = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+    numbers = np.add.reduceat(digits[positions].astype(np.int64) * weights, offsets) if num_lines else np.empty(0, dtype=np.int64)
+    numbers = numbers.reshape(num_lines, TRACE_NUMBERS)
+
+    chunk = {}
+    for name in columns:
+        if name == 'time':
+            scale = lengths[1::TRACE_NUMBERS]
+            chunk[name] = (numbers[:, 0] * POW10[scale] + numbers[:, 1]) / POW10_FLOAT[scale]
+        elif name in MMAP_ADDRESSES:
+            second, fourth = MMAP_ADDRESSES[name]
+            chunk[name] = numbers[:, second] << 16 | numbers[:, fourth]
+        else:
+            chunk[name] = numbers[:, MMAP_NUMBERS[name]].astype(TRACE_COLUMNS[name][1])
+    return chunk
+
+
+def iter_trace_mmap(trace_path, columns=('time',), window_bytes=MMAP_WINDOW_BYTES):
+    """mmap 整个 trace 并按窗口零拷贝解析, 产出与 iter_trace_chunks 相同的块
+
+    窗口边界总在行尾; 某个窗口格式不规整时该窗口退回逐行解析.
+    无法 mmap 的文件 (空文件、管道等) 以及压缩文件直接使用 iter_trace_chunks.
+    """
+    if trace_compression(trace_path) is not None:
+        yield from iter_trace_chunks(trace_path, columns)
+        return
+    with open(trace_path, 'rb') as file:
+        try:
+            mm = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        except (ValueError, OSError):
+            yield from iter_trace_chunks(trace_path, columns)
+            return
+
+        with mm:
+            size = len(mm)
+            view = np.frombuffer(mm, dtype=np.uint8)
+            try:
+                start = 0
+                while start < size:
+                    end = min(start + window_bytes, size)
+                    if end < size:
+                        cut = mm.rfind(b'\n', start, end)
+                        if cut < 0:
+                            # 单行比窗口还长
+                            cut = mm.find(b'\n', end)
+                        end = size if cut < 0 else cut + 1
+                    chunk = _parse_fixed_layout(view[start:end], columns)
+                    if chunk is None:
+                        chunk = parse_trace_block(mm[start:end], columns)
+                    if len(chunk[columns[0]]):
+                        yield chunk
+                    start = end
+            finally:
+                # 释放对 mmap 的引用后才能关闭
+                del view
+
+
+def count_trace_lines(trace_path, window_bytes=MMAP_WINDOW_BYTES):
+    """统计 trace 的行数, 作为记录数的上界"""
+    count = 0
+    with open(trace_path, 'rb') as file:
+        while True:
+            block = file.read(window_bytes)
+            if not block:
+                break
+            count += block.count(b'\n')
+            last = block
+        if count == 0 or not last.endswith(b'\n'):
+            count += 1
+    return count
+
+
+def resolve_trace_path(trace_path):
+    """trace_path 不存在时依次尝试二进制 (mix.trb) 与压缩 (mix.tr.gz, mix.trb.zst ...) 的同名 trace"""
+    trace_path = str(trace_path)
+    for name in (trace_path, trace_path + BINARY_SUFFIX):
+        for suffix in ('',) + COMPRESSED_SUFFIXES:
+            if os.path.exists(name + suffix):
+                return name + suffix
+    return trace_path
+
+
+def is_binary_trace(trace_path):
+    try:
+        with open_trace(trace_path) as file:
+            return _read_exact(file, len(BINARY_MAGIC)) == BINARY_MAGIC
+    except (OSError, EOFError):
+        return False
+
+
+def _read_binary_header(file, trace_path):
+    """从流的开头解析文件头, 读完后流停在第一条记录处"""
+    header = np.frombuffer(_read_exact(file, BINARY_HEADER.itemsize), dtype=BINARY_HEADER)
+    if len(header) != 1 or header['magic'][0] != BINARY_MAGIC:
+        raise ValueError(f'{trace_path}: not a binary trace')
+    header = header[0]
+    if header['version'] != BINARY_VERSION:
+        raise ValueError(f'{trace_path}: unsupported binary trace version {header["version"]}')
+    fields = np.frombuffer(_read_exact(file, BINARY_FIELD.itemsize * int(header['num_fields'])), dtype=BINARY_FIELD)
+    header_size = int(header['header_size'])
+    _read_exact(file, header_size - BINARY_HEADER.itemsize - fields.nbytes)
+    dtype = np.dtype({
+        'names': [name.decode() for name in fields['name']],
+        'formats': [code.decode() for code in fields['dtype']],
+        'offsets': [int(offset) for offset in fields['offset']],
+        'itemsize': int(header['record_size']),
+    })
+    return dtype, header_size
+
+
+def read_binary_header(trace_path):
+    """解析二进制 trace 的文件头, 返回 (记录的结构化 dtype, 文件头字节数)"""
+    with open_trace(trace_path) as file:
+        return _read_binary_header(file, trace_path)
+
+
+def load_binary_trace(trace_path):
+    """把二进制 trace 映射为结构化数组; 仿真仍在写入时忽略末尾不完整的记录"""
+    dtype, header_size = read_binary_header(trace_path)
+    length = (os.path.getsize(trace_path) - header_size) // dtype.itemsize
+    if length <= 0:
+        return np.empty(0, dtype=dtype)
+    return np.memmap(trace_path, dtype=dtype, mode='r', offset=header_size, shape=(length,))
+
+
+def binary_time_seconds(time_ns):
+    """纳秒时间换算为秒, 与文本 trace 中 "%.7f" 再 float() 的结果逐位一致
+
+    "%.7f" 对 ns / 1e9 四舍五入到 100ns, 只有恰好余 50ns 时受 ns / 1e9 的舍入误差影响,
+    这些记录逐个按文本格式换算.
+    """
+    time_ns = np.asarray(time_ns, dtype=np.int64)
+    quotient, remainder = np.divmod(time_ns, 100)
+    quotient += remainder > 50
+    seconds = quotient / 1e7
+    ties = np.flatnonzero(remainder == 50)
+    for i in ties:
+        seconds[i] = float(f'{int(time_ns[i]) / 1e9:.7f}')
+    return seconds
+
+
+def _binary_columns(records, columns):
+    return {name: binary_time_seconds(records['time']) if name == 'time'
+            else np.asarray(records[name], dtype=TRACE_COLUMNS[name][1])
+            for name in columns}
+
+
+def iter_binary_trace(trace_path, columns=('time',)):
+    """按块产出二进制 trace 的列; 未压缩时直接映射, 压缩时边解压边读"""
+    if trace_compression(trace_path) is None:
+        records = load_binary_trace(trace_path)
+        for start in range(0, len(records), CACHE_CHUNK_ROWS):
+            yield _binary_columns(records[start:start + CACHE_CHUNK_ROWS], columns)
+        return
+
+    with open_trace(trace_path) as file:
+        dtype, _ = _read_binary_header(file, trace_path)
+        block_bytes = CACHE_CHUNK_ROWS * dtype.itemsize
+        while True:
+            block = _read_exact(file, block_bytes)
+            count = len(block) // dtype.itemsize
+            if count:
+                yield _binary_columns(np.frombuffer(block, dtype=dtype, count=count), columns)
+            if len(block) < block_bytes:
+                break
+
+
+def _iter_trace_source(trace_path, columns):
+    """按 trace 的实际格式解析, 不经过缓存"""
+    if is_binary_trace(trace_path):
+        return iter_binary_trace(trace_path, columns)
+    return iter_trace_mmap(trace_path, columns)
+
+
+def trace_shards(trace_path):
+    """mix.tr 对应的分片文件 (mix.0000.tr ...), 按分片号排序; 没有分片时为空列表
+
+    文本分片与二进制分片 (mix.0000.trb ...) 不混用: 优先与 trace_path 同格式的一组.
+    """
+    directory, name = os.path.split(str(trace_path))
+    compressed = ''
+    for suffix in COMPRESSED_SUFFIXES:
+        if name.endswith(suffix):
+            name, compressed = name[:-len(suffix)], suffix
+    stem, ext = os.path.splitext(name)
+    binary = len(ext) > 1 and ext.endswith(BINARY_SUFFIX)
+    if binary:
+        ext = ext[:-len(BINARY_SUFFIX)]
+    # 压缩分片形如 mix.0000.tr.gz
+    pattern = re.compile(re.escape(stem) + r'\.(\d{4,})' + re.escape(ext) + f'({BINARY_SUFFIX})?'
+                         + (re.escape(compressed) if compressed else '(?:' + '|'.join(map(re.escape, COMPRESSED_SUFFIXES)) + ')?') + '$')
+    shards = ({}, {})
+    for entry in os.listdir(directory or '.'):
+        match = pattern.match(entry)
+        if match:
+            shards[bool(match.group(2))][int(match.group(1))] = os.path.join(directory, entry)
+    found = shards[binary] or shards[not binary]
+    return [found[index] for index in sorted(found)]
+
+
+def trace_files(trace_path):
+    """组成 trace_path 的全部已有文件: 文本/二进制及其压缩形式的同名 trace, 以及两种格式的分片"""
+    trace_path = str(trace_path)
+    files = []
+    for name in (trace_path, trace_path + BINARY_SUFFIX):
+        for suffix in ('',) + COMPRESSED_SUFFIXES:
+            if os.path.isfile(name + suffix):
+                files.append(name + suffix)
+    for name in (trace_path, trace_path + BINARY_SUFFIX):
+        try:
+            shards = trace_shards(name)
+        except OSError:
+            continue
+        files.extend(path for path in shards if path not in files)
+    return files
+
+
+def merge_trace_columns(shard_paths, columns=('time',), use_cache=True):
+    """把各自按时间有序的分片归并为全局按时间有序的块序列
+
+    每个分片保持一个当前块; 所有当前块中最后时间的最小值以前的记录都不会再有更早的记录到来,
+    把这些记录稳定排序后输出, 然后为耗尽的分片读取下一块. 时间相同的记录按分片顺序排列.
+    """
+    columns = tuple(columns)
+    read_columns = columns if 'time' in columns else columns + ('time',)
+    iterators = [iter_trace_columns(path, read_columns, use_cache) for path in shard_paths]
+    buffers = [None] * len(iterators)
+
+    def refill(i):
+        for chunk in iterators[i]:
+            if len(chunk['time']):
+                buffers[i] = chunk
+                return
+        buffers[i] = None
+
+    for i in range(len(iterators)):
+        refill(i)
+    while True:
+        active = [i for i in range(len(buffers)) if buffers[i] is not None]
+        if not active:
+            return
+        horizon = min(buffers[i]['time'][-1] for i in active)
+        parts = []
+        for i in active:
+            cut = np.searchsorted(buffers[i]['time'], horizon, side='right')
+            parts.append({name: values[:cut] for name, values in buffers[i].items()})
+            if cut == len(buffers[i]['time']):
+                refill(i)
+            else:
+                buffers[i] = {name: values[cut:] for name, values in buffers[i].items()}
+        merged = {name: np.concatenate([part[name] for part in parts]) for name in read_columns}
+        order = np.argsort(merged['time'], kind='stable')
+        yield {name: merged[name][order] for name in columns}
+
+
+def cache_path(trace_path):
+    """trace 对应的列式缓存目录"""
+    return str(trace_path) + CACHE_SUFFIX
+
+
+def _trace_key(trace_path):
+    st = os.stat(trace_path)
+    return {'version': CACHE_VERSION, 'size': st.st_size, 'mtime_ns': st.st_mtime_ns}
+
+
+def load_trace_cache(trace_path):
+    """缓存有效时返回 {列名: 只读 memmap}, 缺失或过期时返回 None"""
+    directory = cache_path(trace_path)
+    try:
+        with open(os.path.join(directory, 'meta.json'), 'r') as file:
+            meta = json.load(file)
+        key = _trace_key(trace_path)
+    except (OSError, ValueError):
+        return None
+    if any(meta.get(name) != value for name, value in key.items()):
+        return None
+
+    length = meta['length']
+    columns = {}
+    for name, dtype in CACHE_DTYPES.items():
+        if length == 0:
+            columns[name] = np.empty(0, dtype=dtype)
+        else:
+            columns[name] = np.memmap(os.path.join(directory, f'{name}.bin'), dtype=dtype, mode='r', shape=(length,))
+    return columns
+
+
+class TraceCacheWriter:
+    """边解析文本边写列式缓存, 先写入临时目录, 全部写完后再替换到位"""
+    def __init__(self, trace_path):
+        self.trace_path = trace_path
+        self.key = _trace_key(trace_path)
+        self.directory = cache_path(trace_path)
+        parent = os.path.dirname(os.path.abspath(self.directory))
+        self.tmp_directory = tempfile.mkdtemp(prefix='.cols-', dir=parent)
+        self.files = {name: open(os.path.join(self.tmp_directory, f'{name}.bin'), 'wb') for name in CACHE_DTYPES}
+        self.length = 0
+
+    def write(self, chunk):
+        for name, dtype in CACHE_DTYPES.items():
+            self.files[name].write(chunk[name].astype(dtype).tobytes())
+        self.length += len(chunk['time'])
+
+    def _close(self):
+        for file in self.files.values():
+            file.close()
+
+    def commit(self):
+        self._close()
+        # 解析期间 trace 被改写 (如仿真仍在运行) 时缓存作废
+        if _trace_key(self.trace_path) != self.key:
+            self.abort()
+            return
+        meta = dict(self.key, length=self.length, columns={name: np.dtype(dtype).str for name, dtype in CACHE_DTYPES.items()})
+        with open(os.path.join(self.tmp_directory, 'meta.json'), 'w') as file:
+            json.dump(meta, file)
+        shutil.rmtree(self.directory, ignore_errors=True)
+        os.replace(self.tmp_directory, self.directory)
+
+    def abort(self):
+        self._close()
+        shutil.rmtree(self.tmp_directory, ignore_errors=True)
+
+
+def iter_trace_columns(trace_path, columns=('time',), use_cache=True):
+    """与 iter_trace_chunks 相同, 但优先从列式缓存读取, 缓存无效时解析文本并顺带写缓存"""
+    if not os.path.exists(trace_path):
+        shards = trace_shards(trace_path)
+        if shards:
+            yield from merge_trace_columns(shards, columns, use_cache)
+            return
+
+    if trace_compression(trace_path) is None and is_binary_trace(trace_path):
+        # 未压缩的二进制 trace 本身就能直接映射, 不需要缓存
+        yield from iter_binary_trace(trace_path, columns)
+        return
+
+    if use_cache:
+        cached = load_trace_cache(trace_path)
+        if cached is not None:
+            length = len(cached['time'])
+            for start in range(0, length, CACHE_CHUNK_ROWS):
+                yield {name: np.asarray(cached[name][start:start + CACHE_CHUNK_ROWS], dtype=TRACE_COLUMNS[name][1])
+                       for name in columns}
+            return
+
+    writer = None
+    if use_cache:
+        try:
+            writer = TraceCacheWriter(trace_path)
+        except OSError:
+            # 目录不可写时只解析, 不缓存
+            writer = None
+
+    completed = False
+    try:
+        parse_columns = tuple(CACHE_DTYPES) if writer else columns
+        for chunk in _iter_trace_source(trace_path, parse_columns):
+            if writer:
+                writer.write(chunk)
+            yield {name: chunk[name] for name in columns}
+        completed = True
+    finally:
+        if writer:
+            if completed:
+                writer.commit()
+            else:
+                writer.abort()
+
+
+def load_trace_columns(trace_path, columns=('time',)):
+    """返回整条 trace 的若干列; 有缓存时为 memmap, 不占用内存"""
+    if not os.path.exists(trace_path) and trace_shards(trace_path):
+        return _concatenate_chunks(list(iter_trace_columns(trace_path, columns)), columns)
+    if trace_compression(trace_path) is None and is_binary_trace(trace_path):
+        records = load_binary_trace(trace_path)
+        return {name: binary_time_seconds(records['time']) if name == 'time' else records[name]
+                for name in columns}
+    cached = load_trace_cache(trace_path)
+    if cached is None:
+        for _ in iter_trace_columns(trace_path, ('time',)):
+            pass
+        cached = load_trace_cache(trace_path)
+    if cached is None and trace_compression(trace_path) is not None:
+        # 压缩 trace 无法预先统计行数, 逐块收集后拼接
+        return _concatenate_chunks(list(_iter_trace_source(trace_path, columns)), columns)
+    if cached is None:
+        # 无法写缓存时按行数预分配数组, 再逐窗口填入
+        capacity = count_trace_lines(trace_path)
+        result = {name: np.empty(capacity, dtype=TRACE_COLUMNS[name][1]) for name in columns}
+        length = 0
+        for chunk in iter_trace_mmap(trace_path, columns):
+            size = len(chunk[columns[0]])
+            for name in columns:
+                result[name][length:length + size] = chunk[name]
+            length += size
+        return {name: values[:length] for name, values in result.items()}
+    return {name: cached[name] for name in columns}
+
+
+class SlotCounter:
+    """增量统计每个时隙的包数, 结果与 score_calculator 中的逐包循环逐位一致
+
+    循环中每个落在当前时隙之外的包只会让时隙前进一格, 记第 i 个包真正所在的
+    时隙为 j_i, 被计入的时隙为 k_i, 则在时间戳单调时有
+        k_i - i = min(k_{i-1} - (i - 1), j_i - i)
+    因此每块只需一次 minimum.accumulate. 时隙起点与循环一样逐次累加得到.
+    """
+    def __init__(self, time_slot_duration=1e-4):
+        self.time_slot_duration = time_slot_duration
+        self.slot_starts = np.empty(0)
+        self.slot_ends = np.empty(0)
+        self.counts = np.zeros(0, dtype=np.int64)
+        self.num_packets = 0
+        self.first_time = None
+        self.last_time = None
+        self.last_slot = 0
+        self._offset = 0  # k_{i-1} - (i - 1)
+
+    def _ensure_slots(self, max_time, max_slot=0):
+        """保证时隙数组覆盖到 max_time 以及下标 max_slot"""
+        d = self.time_slot_duration
+        while len(self.slot_starts) <= max_slot or self.slot_ends[-1] <= max_time:
+            size = max(int((max_time - self.slot_starts[-1]) / d) + 2, max_slot + 1, len(self.slot_starts))
+            steps = np.full(size, d)
+            steps[0] = self.slot_starts[-1] + d
+            starts = np.add.accumulate(steps)
+            self.slot_starts = np.concatenate((self.slot_starts, starts))
+            self.slot_ends = np.concatenate((self.slot_ends, starts + d))
+            self.counts = np.concatenate((self.counts, np.zeros(size, dtype=np.int64)))
+
+    def update(self, timestamps):
+        """计入一块时间戳"""
+        ts = np.asarray(timestamps, dtype=np.float64)
+        if len(ts) == 0:
+            return
+        if self.first_time is None:
+            self.first_time = float(ts[0])
+            self.slot_starts = np.array([ts[0]])
+            self.slot_ends = self.slot_starts + self.time_slot_duration
+            self.counts = np.zeros(1, dtype=np.int64)
+        self._ensure_slots(ts.max())
+
+        index = np.arange(self.num_packets, self.num_packets + len(ts))
+        true_slot = np.searchsorted(self.slot_ends, ts, side='right')
+        offset = np.minimum.accumulate(np.concatenate(([self._offset], true_slot - index)))[1:]
+        slot = index + offset
+
+        # 递推成立的条件是 j_i >= k_{i-1}, 时间戳回退时逐包处理
+        previous = np.concatenate(([self.last_slot], slot[:-1]))
+        if np.any(true_slot < previous):
+            self._update_loop(ts)
+            return
+
+        self.counts[:slot[-1] + 1] += np.bincount(slot)
+        self.num_packets += len(ts)
+        self.last_slot = int(slot[-1])
+        self._offset = int(offset[-1])
+        self.last_time = float(ts[-1])
+
+    def _update_loop(self, ts):
+        """逐包执行原始循环"""
+        slot = self.last_slot
+        for t in ts.tolist():
+            if t >= self.slot_ends[slot]:
+                slot += 1
+                self._ensure_slots(t, slot)
+            self.counts[slot] += 1
+        self.num_packets += len(ts)
+        self.last_slot = slot
+        self._offset = slot - (self.num_packets - 1)
+        self.last_time = float(ts[-1])
+
+    def result(self, packet_size, carry=True, include_last=True):
+        """返回 (time_slots, bandwidths), 带宽单位为 Gbps
+
+        carry: 触发换槽的包是否计入新时隙 (score_calculator 为 True, gen_result.py 为 False)
+        include_last: 是否输出最后一个未关闭的时隙 (gen_result.py 为 False)
+        """
+        if self.num_packets == 0:
+            return np.empty(0), np.empty(0)
+
+        counts = self.counts[:self.last_slot + 1].copy()
+        if not carry:
+            counts[1:] -= 1
+        if not include_last or counts[-1] == 0:
+            counts = counts[:-1]
+
+        time_slots = self.slot_starts[:len(counts)]
+        bandwidths = (counts * packet_size * 8) / self.time_slot_duration / 1e9
+        return time_slots, bandwidths
+
+
+def scan_trace(trace_path, time_slot_duration=1e-4, use_cache=True):
+    """流式读取 trace 文件 (或其列式缓存) 并返回填充好的 SlotCounter"""
+    counter = SlotCounter(time_slot_duration)
+    for chunk in iter_trace_columns(trace_path, ('time',), use_cache):
+        counter.update(chunk['time'])
+    return counter
+
+
+def read_throughput_series(series_path):
+    """读取 AGG_OUTPUT_FILE, 返回 (时隙宽度 ns, scope, {列名: ndarray})
+
+    每行为 [node | sip dip sport] slot packets bytes, 时隙 slot 从 slot * slot_ns 纳秒开始.
+    """
+    with open(series_path, 'r') as file:
+        header = file.readline().split()
+        meta = dict(zip(header[1::2], header[2::2]))
+        values = np.array(file.read().split(), dtype=np.int64)
+    scope = meta['scope']
+    names = SERIES_KEYS[scope] + ('slot', 'packets', 'bytes')
+    values = values.reshape(-1, len(names))
+    return int(meta['slot_ns']), scope, {name: values[:, i] for i, name in enumerate(names)}
+
+
+def scan_series(series_path, time_slot_duration=1e-4):
+    """由聚合时间序列得到填充好的 SlotCounter
+
+    时隙宽度为 100ns (mix.tr 的时间精度) 时结果与 scan_trace 逐位一致;
+    更宽的时隙把包都计在时隙起点, 结果是近似的.
+    """
+    slot_ns, _, series = read_throughput_series(series_path)
+    # 各节点/各流的序列按时隙合并为全网的包数
+    slots, inverse = np.unique(series['slot'], return_inverse=True)
+    packets = np.zeros(len(slots), dtype=np.int64)
+    np.add.at(packets, inverse, series['packets'])
+    times = slots * (slot_ns // 100) / 1e7
+
+    counter = SlotCounter(time_slot_duration)
+    total = np.cumsum(packets)
+    start = 0
+    while start < len(times):
+        # 每块展开后约 CACHE_CHUNK_ROWS 个包
+        consumed = total[start - 1] if start else 0
+        end = max(int(np.searchsorted(total, consumed + CACHE_CHUNK_ROWS, side='right')), start + 1)
+        counter.update(np.repeat(times[start:end], packets[start:end]))
+        start = end
+    return counter
+
+
+class TraceFollower:
+    """跟随仍在写入的 trace (文本或未压缩的二进制)
+
+    每次 poll 只从上次读到的位置往后读, 已读过的字节不会再读; 末尾不完整的行/记录
+    留在内存中, 与之后新写入的字节拼接后再解析.
+    """
+    def __init__(self, trace_path, columns=('time',)):
+        self.trace_path = str(trace_path)
+        self.columns = tuple(columns)
+        self.file = None
+        self.offset = 0
+        self.remainder = b''
+        self.dtype = None  # 二进制 trace 的记录类型, 文本为 None
+        self.checked = False
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+    def poll(self, max_bytes=CHUNK_BYTES):
+        """读取新增的字节, 返回其中完整记录的 {列名: ndarray}; 没有新记录时返回 None"""
+        if self.file is None:
+            try:
+                self.file = open(self.trace_path, 'rb')
+            except FileNotFoundError:
+                # 仿真还没有创建 trace
+                return None
+        size = os.fstat(self.file.fileno()).st_size
+        if size < self.offset:
+            raise RuntimeError(f'{self.trace_path}: trace was truncated while following')
+        if size == self.offset:
+            return None
+        block = self.file.read(min(size - self.offset, max_bytes))
+        self.offset += len(block)
+        data = self.remainder + block
+
+        if not self.checked:
+            # 根据开头的 magic 判断格式
+            if len(data) < len(BINARY_MAGIC):
+                self.remainder = data
+                return None
+            if data.startswith(GZIP_MAGIC) or data.startswith(ZSTD_MAGIC):
+                raise ValueError(f'{self.trace_path}: cannot follow a compressed trace')
+            if data.startswith(BINARY_MAGIC):
+                if len(data) < BINARY_HEADER.itemsize:
+                    self.remainder = data
+                    return None
+                header_size = int(np.frombuffer(data[:BINARY_HEADER.itemsize], dtype=BINARY_HEADER)['header_size'][0])
+                if len(data) < header_size:
+                    self.remainder = data
+                    return None
+                self.dtype, _ = _read_binary_header(io.BytesIO(data), self.trace_path)
+                data = data[header_size:]
+            self.checked = True
+
+        if self.dtype is not None:
+            count = len(data) // self.dtype.itemsize
+            self.remainder = data[count * self.dtype.itemsize:]
+            if count == 0:
+                return None
+            return _binary_columns(np.frombuffer(data, dtype=self.dtype, count=count), self.columns)
+
+        cut = data.rfind(b'\n') + 1
+        self.remainder = data[cut:]
+        if cut == 0:
+            return None
+        chunk = _parse_lines(data, cut, self.columns)
+        return chunk if len(chunk[self.columns[0]]) else None
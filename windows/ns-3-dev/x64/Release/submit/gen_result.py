@@ -1,118 +1,192 @@
 #python gen_result.py --config config.txt --trace mix.tr
 
-import matplotlib.pyplot as plt
+import sys
 import configparser
 import argparse
-
-# 创建参数解析器
-parser = argparse.ArgumentParser(description='Configuration File Reader')
-parser.add_argument('--config', type=str, required=True, help='Path to the configuration file')
-parser.add_argument('--trace', type=str, required=True, help='Path to the trace file')
-
-# 解析命令行参数
-args = parser.parse_args()
-
-# 读取配置文件
-with open(args.config, 'r') as file:
-    for line in file:
-        if line.startswith('PACKET_PAYLOAD_SIZE'):
-            # 获取等号后的数值
-            packet_payload_size = int(line.split(' ')[1].strip())
-            break
-
-print(f"The value of PACKET_PAYLOAD_SIZE is: {packet_payload_size}")
-
-# 初始化变量
-timestamps = []
-sequence_numbers = []
-packet_size = packet_payload_size + 18  # 每个数据包的大小，单位为字节
-
-# 读取数据文件
-with open(args.trace, 'r') as file:
-    for line in file:
-        parts = line.split()
-        if len(parts) < 7:
-            continue
-        timestamps.append(float(parts[0]))
-        sequence_numbers.append(int(parts[5]))
-
-# 计算每个时隙的带宽
-time_slots = []
-bandwidths = []
-time_slot_duration = 1e-4  # 时隙的持续时间，单位为秒
-current_slot_start = timestamps[0]
-current_slot_packets = 0
-
-for i in range(len(timestamps)):
-    if timestamps[i] < current_slot_start + time_slot_duration:
-        current_slot_packets += 1
-    else:
-        # 计算当前时隙的带宽
-        throughput = (current_slot_packets * packet_size * 8) / time_slot_duration / 1e9  # 带宽单位为 Gbps
+from score_spec import named_spec, spec_windows, theoretical_bandwidth
+
+# 修正相对路径
+# from pathlib import Path
+# file_dir = Path(__file__).parent
+
+# 时隙宽度, 头部开销, 时隙口径, 理论带宽以及计算平均带宽和波动率的区间 (秒) 与权重
+# 均取自 score_spec.json 中的这个规格
+RESULT_SPEC = 'gen_result'
+
+def read_packet_payload_size(config_path):
+    """读取配置文件"""
+    with open(config_path, 'r') as file:
+        for line in file:
+            if line.startswith('PACKET_PAYLOAD_SIZE'):
+                # 获取等号后的数值
+                return int(line.split(' ')[1].strip())
+    return None
+
+def slot_bandwidths(trace_path, packet_payload_size, engine='numpy', use_cache=True, spec=None):
+    """计算每个时隙的带宽, 返回 (time_slots, bandwidths, num_packets, completion_time)"""
+    spec = spec or named_spec(RESULT_SPEC)
+    time_slot_duration = spec['slot']  # 时隙的持续时间，单位为秒
+    packet_size = packet_payload_size + spec['header_bytes']  # 每个数据包的大小，单位为字节
+    if engine == 'numpy':
+        from trace_stream import scan_trace
+        # 分块流式读取数据文件, 不保留逐包数据
+        counter = scan_trace(trace_path, time_slot_duration, use_cache=use_cache)
+        return counter_bandwidths(counter, packet_payload_size, spec)
+
+    from trace_stream import iter_trace_columns
+    # 读取数据文件, 逐包循环需要完整的时间戳列表
+    timestamps = []
+    for chunk in iter_trace_columns(trace_path, use_cache=use_cache):
+        timestamps.extend(chunk['time'].tolist())
+
+    time_slots = []
+    bandwidths = []
+    current_slot_start = timestamps[0]
+    current_slot_packets = 0
+
+    for i in range(len(timestamps)):
+        if timestamps[i] < current_slot_start + time_slot_duration:
+            current_slot_packets += 1
+        else:
+            # 计算当前时隙的带宽
+            throughput = (current_slot_packets * packet_size * 8) / time_slot_duration / 1e9  # 带宽单位为 Gbps
+            time_slots.append(current_slot_start)
+            bandwidths.append(throughput)
+
+            # 移动到下一个时隙
+            current_slot_start += time_slot_duration
+            current_slot_packets = 1 if spec['carry'] else 0
+
+    # gen_result 规格不输出最后一个未关闭的时隙
+    if spec['include_last'] and current_slot_packets > 0:
+        throughput = (current_slot_packets * packet_size * 8) / time_slot_duration / 1e9
         time_slots.append(current_slot_start)
         bandwidths.append(throughput)
 
-        # 移动到下一个时隙
-        current_slot_start += time_slot_duration
-        current_slot_packets = 0
-
-# 计算平均带宽
-average_bandwidth = sum(bandwidths) / len(bandwidths)
-print(f'Average Bandwidth: {average_bandwidth:.6f} Gbps')
-
-# 计算指定时间区间后的平均带宽和波动率
-start_time_1 = 1e-4  # 区间起始时间，单位为秒
-end_time_1 = 5e-3 # 区间结束时间，单位为秒
-
-start_index = next(i for i, t in enumerate(time_slots) if t >= start_time_1)
-end_index = next(i for i, t in enumerate(time_slots) if t >= end_time_1)
-
-specified_bandwidths = bandwidths[start_index:end_index]
-specified_average_bandwidth_1 = sum(specified_bandwidths) / len(specified_bandwidths)
-specified_max_bandwidth = max(specified_bandwidths)
-specified_min_bandwidth = min(specified_bandwidths)
-print(specified_max_bandwidth, specified_min_bandwidth)
-fluctuation_rate_1 = (specified_max_bandwidth - specified_min_bandwidth) / specified_average_bandwidth_1
-
-print(f'Average Bandwidth from {start_time_1:.6f} s to {end_time_1:.6f} s: {specified_average_bandwidth_1:.6f} Gbps')
-print(f'Fluctuation Rate from {start_time_1:.6f} s to {end_time_1:.6f} s: {fluctuation_rate_1:.6f}')
-
-
-# 计算指定时间区间后的平均带宽和波动率
-start_time_2 = 0.04  # 区间起始时间，单位为秒
-end_time_2 = 0.06 # 区间结束时间，单位为秒
-
-start_index = next(i for i, t in enumerate(time_slots) if t >= start_time_2)
-end_index = next(i for i, t in enumerate(time_slots) if t >= end_time_2)
-
-specified_bandwidths = bandwidths[start_index:end_index]
-specified_average_bandwidth_2 = sum(specified_bandwidths) / len(specified_bandwidths)
-specified_max_bandwidth = max(specified_bandwidths)
-specified_min_bandwidth = min(specified_bandwidths)
-fluctuation_rate_2 = (specified_max_bandwidth - specified_min_bandwidth) / specified_average_bandwidth_2
-
-print(f'Average Bandwidth from {start_time_2:.6f} s to {end_time_2:.6f} s: {specified_average_bandwidth_2:.6f} Gbps')
-print(f'Fluctuation Rate from {start_time_2:.6f} s to {end_time_2:.6f} s: {fluctuation_rate_2:.6f}')
-
-# 计算指定时间区间后的平均带宽和波动率
-start_time_3 = 0.09  # 区间起始时间，单位为秒
-end_time_3 = 0.1 # 区间结束时间，单位为秒
-
-start_index = next(i for i, t in enumerate(time_slots) if t >= start_time_3)
-end_index = next(i for i, t in enumerate(time_slots) if t >= end_time_3)
-
-specified_bandwidths = bandwidths[start_index:end_index]
-specified_average_bandwidth_3 = sum(specified_bandwidths) / len(specified_bandwidths)
-specified_max_bandwidth = max(specified_bandwidths)
-specified_min_bandwidth = min(specified_bandwidths)
-fluctuation_rate_3 = (specified_max_bandwidth - specified_min_bandwidth) / specified_average_bandwidth_3
-
-print(f'Average Bandwidth from {start_time_3:.6f} s to {end_time_3:.6f} s: {specified_average_bandwidth_3:.6f} Gbps')
-print(f'Fluctuation Rate from {start_time_3:.6f} s to {end_time_3:.6f} s: {fluctuation_rate_3:.6f}')
-
-with open('result.txt', 'w') as file:
-    file.write(f'flow_completion_time {timestamps[-1]}\n')
-    file.write(f'average_bandwidth {average_bandwidth}\n')
-    file.write(f'fluctuation_rate_1 {fluctuation_rate_1}\n')
-    file.write(f'fluctuation_rate_2 {fluctuation_rate_2}\n')
-    file.write(f'fluctuation_rate_3 {fluctuation_rate_3}\n')
\ No newline at end of file
+    return time_slots, bandwidths, len(timestamps), timestamps[-1]
+
+def counter_bandwidths(counter, packet_payload_size, spec=None):
+    """由已填充的 SlotCounter 得到本脚本口径的时隙带宽, 供批量评分复用同一次扫描"""
+    spec = spec or named_spec(RESULT_SPEC)
+    # gen_result 规格换槽时不计入触发包, 且丢弃最后一个未关闭的时隙
+    time_slots, bandwidths = counter.result(packet_payload_size + spec['header_bytes'], spec['carry'], spec['include_last'])
+    return time_slots.tolist(), bandwidths.tolist(), counter.num_packets, counter.last_time
+
+def interval_fluctuation(time_slots, bandwidths, start_time, end_time):
+    """计算并打印 [start_time, end_time) 的平均带宽和波动率"""
+    try:
+        start_index = next(i for i, t in enumerate(time_slots) if t >= start_time)
+        end_index = next(i for i, t in enumerate(time_slots) if t >= end_time)
+        specified_bandwidths = bandwidths[start_index:end_index]
+        specified_average_bandwidth = sum(specified_bandwidths) / len(specified_bandwidths)
+        specified_max_bandwidth = max(specified_bandwidths)
+        specified_min_bandwidth = min(specified_bandwidths)
+        print(specified_max_bandwidth, specified_min_bandwidth)
+        fluctuation_rate = (specified_max_bandwidth - specified_min_bandwidth) / specified_average_bandwidth
+    except Exception as e:
+        print(e)
+        specified_average_bandwidth = 0.0
+        fluctuation_rate = 0
+
+    print(f'Average Bandwidth from {start_time:.6f} s to {end_time:.6f} s: {specified_average_bandwidth:.6f} Gbps')
+    print(f'Fluctuation Rate from {start_time:.6f} s to {end_time:.6f} s: {fluctuation_rate:.6f}')
+    return specified_average_bandwidth, fluctuation_rate
+
+def compute_result(time_slots, bandwidths, num_packets, completion_time, packet_payload_size,
+                   config_path='config.txt', spec=None):
+    """打印完整的评分过程 (即 output.txt 的内容) 并返回 result.txt 中的各项指标"""
+    spec = spec or named_spec(RESULT_SPEC)
+    print(f"The value of PACKET_PAYLOAD_SIZE is: {packet_payload_size}")
+
+    # 初始化变量
+    packet_size = packet_payload_size + spec['header_bytes']  # 每个数据包的大小，单位为字节
+
+    # 计算平均带宽
+    average_bandwidth = sum(bandwidths) / len(bandwidths)
+    # print(f'Average Bandwidth: {average_bandwidth:.6f} Gbps')
+
+    intervals, weights = spec_windows(spec, completion_time)
+    fluctuation_rates = []
+    for start_time, end_time in intervals:
+        _, fluctuation_rate = interval_fluctuation(time_slots, bandwidths, start_time, end_time)
+        fluctuation_rates.append(fluctuation_rate)
+
+    # 计算网络平均带宽利用率
+    total_data = num_packets * packet_size * 8 / 1e9  # 总数据量(Gbits)
+    # completion_time 为实际整体流完成时间
+    total_bandwidth = theoretical_bandwidth(spec, config_path)  # 存储理论总带宽 (由拓扑得到, 8*12*25G)
+
+    # bandwidth_utilization = (total_data / completion_time) / total_bandwidth
+    bandwidth_utilization = average_bandwidth / total_bandwidth
+
+    # 计算最终得分
+    # score = (bandwidth_utilization - 0.5*波动率1 - 1*波动率2 - 0.5*波动率3) * 100, 权重见规格
+    final_score = bandwidth_utilization
+    for weight, fluctuation_rate in zip(weights, fluctuation_rates):
+        final_score -= weight * fluctuation_rate
+    final_score *= 100
+
+    print(f'\nFinal Score Calculation:')
+    print(f'Average Bandwidth: {average_bandwidth:.6f} Gbps')
+    print(f'Theoretical Bandwidth: {total_bandwidth:g} Gbps')
+    print(f'Bandwidth Utilization: {bandwidth_utilization:.6f}')
+    print(f'Total Data: {total_data:.4f} Gbits')
+    print(f'Completion Time: {completion_time:.6f} s')
+    print(f'Final Score: {final_score:.4f}')
+
+    return {
+        'flow_completion_time': completion_time,
+        'average_bandwidth': average_bandwidth,
+        'fluctuation_rates': fluctuation_rates,
+        'bandwidth_utilization': bandwidth_utilization,
+        'final_score': final_score,
+    }
+
+def write_result(result, path='result.txt'):
+    with open(path, 'w') as file:
+        file.write(f'flow_completion_time {result["flow_completion_time"]}\n')
+        file.write(f'average_bandwidth {result["average_bandwidth"]}\n')
+        for i, fluctuation_rate in enumerate(result['fluctuation_rates'], 1):
+            file.write(f'fluctuation_rate_{i} {fluctuation_rate}\n')
+
+def main():
+    # 创建参数解析器
+    parser = argparse.ArgumentParser(description='Configuration File Reader')
+    parser.add_argument('--config', type=str, default='config.txt', help='Path to the configuration file')
+    parser.add_argument('--trace', type=str, default='mix.tr', help='Path to the trace file')
+    parser.add_argument('--engine', choices=['python', 'numpy'], default='numpy', help='Slot bandwidth engine')
+    parser.add_argument('--no-cache', action='store_true', help='Do not read or write the columnar trace cache')
+
+    # 解析命令行参数
+    args = parser.parse_args()
+
+    from trace_stream import resolve_trace_path
+    # 只有二进制 trace (mix.trb) 时直接读取它
+    args.trace = resolve_trace_path(args.trace)
+
+    # 读取配置文件
+    packet_payload_size = read_packet_payload_size(args.config)
+    # 保存stdout
+    console = sys.stdout
+    try:
+        rd_stdout = open('output.txt', 'w+')
+        sys.stdout = rd_stdout
+    except Exception as e:
+        print(e)
+        exit(-1)
+
+    try:
+        time_slots, bandwidths, num_packets, completion_time = slot_bandwidths(
+            args.trace, packet_payload_size, args.engine, not args.no_cache)
+        result = compute_result(time_slots, bandwidths, num_packets, completion_time, packet_payload_size, args.config)
+    finally:
+        sys.stdout = console
+    rd_stdout.flush()
+    rd_stdout.seek(0)
+    print(''.join(rd_stdout.readlines()))
+    rd_stdout.close()
+
+    write_result(result)
+
+if __name__ == '__main__':
+    main()
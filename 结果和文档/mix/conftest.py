@@ -0,0 +1,68 @@
+"""分析脚本测试共用的小型确定性输入
+
+make_times 生成有突发与空闲时隙的有序时间戳, write_trace 按 TraceFormat::Serialize 的文本格式写出,
+write_topology 写出 416 台主机各以 25Gbps 接入一台交换机的拓扑 (节点 320-415 合计 2400Gbps, 与 8*12*25 一致),
+write_run 在目录中写出 config.txt / flow.txt / topology.txt / mix.tr, 组成一个最小的运行目录.
+"""
+import os
+import numpy as np
+import pytest
+
+
+def make_times(num_packets, seed=0, duration=0.12):
+    """[0, duration) 内的有序时间戳 (秒, 7 位小数), 包含突发和长于一个时隙的空闲"""
+    rng = np.random.default_rng(seed)
+    gaps = rng.exponential(duration / num_packets, num_packets)
+    # 少数长间隔制造空时隙, 少数零间隔制造同一时刻的多个包
+    gaps[rng.random(num_packets) < 0.002] += 5e-4
+    gaps[rng.random(num_packets) < 0.05] = 0
+    times = np.cumsum(gaps)
+    times *= duration / times[-1] * 0.999
+    return np.round(times, 7)
+
+
+def trace_lines(times, seed=0):
+    rng = np.random.default_rng(seed + 1)
+    lines = []
+    for t in times:
+        node, src, dst = rng.integers(0, 416, 3)
+        lines.append('%.7f /%u %u.%u>%u.%u u %u %u %u\n' % (
+            t, node, src // 256, src % 256, dst // 256, dst % 256, 10000 + rng.integers(0, 50),
+            rng.integers(0, 1 << 20), 3))
+    return lines
+
+
+def write_trace(path, times, seed=0):
+    with open(path, 'w') as file:
+        file.writelines(trace_lines(times, seed))
+    return str(path)
+
+
+def write_topology(path, hosts=416, rate='25Gbps'):
+    """hosts 台主机各有一条 rate 的链路接到交换机 (节点 hosts)"""
+    with open(path, 'w') as file:
+        file.write(f'{hosts + 1} 1 {hosts}\n{hosts}\n')
+        for host in range(hosts):
+            file.write(f'{host} {hosts} {rate} 0.001ms 0\n')
+    return str(path)
+
+
+def write_run(directory, num_packets=20000, flows=100, seed=0, payload=1000):
+    """写出一个最小的运行目录, 返回其路径"""
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, 'config.txt'), 'w') as file:
+        file.write(f'PACKET_PAYLOAD_SIZE {payload}\nFLOW_FILE flow.txt\nTOPOLOGY_FILE topology.txt\n'
+                   f'TRACE_OUTPUT_FILE mix.tr\n')
+    with open(os.path.join(directory, 'flow.txt'), 'w') as file:
+        file.write(f'{flows}\n')
+    write_topology(os.path.join(directory, 'topology.txt'))
+    write_trace(os.path.join(directory, 'mix.tr'), make_times(num_packets, seed), seed)
+    return str(directory)
+
+
+@pytest.fixture
+def run_dir(tmp_path, monkeypatch):
+    """工作目录切换到一个最小的运行目录"""
+    directory = write_run(tmp_path / 'run')
+    monkeypatch.chdir(directory)
+    return directory
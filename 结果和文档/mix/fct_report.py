@@ -0,0 +1,193 @@
+"""FCT_OUTPUT_FILE 的尾延迟分析
+
+third.cc 的 qp_finish 为每个完成的 QP 输出一行
+    "%08x %08x %u %u %lu %lu %lu %lu"
+即 sip dip sport dport size start fct standalone_fct, 时间单位为 ns.
+standalone_fct 为该流在空网络中独占链路时的完成时间, slowdown = fct / standalone_fct.
+
+read_fct 把整个文件一次解析为 NumPy 列; slowdown_report 按流大小分桶计算 slowdown 的
+p50/p95/p99/p99.9, 多个结果目录 (如 6400/hpcc 与 6400/dcqcn) 的结果并排输出.
+"""
+import os
+import csv
+import argparse
+import numpy as np
+
+FCT_COLUMNS = ('sip', 'dip', 'sport', 'dport', 'size', 'start', 'fct', 'standalone_fct')
+# 以十六进制输出的列
+FCT_HEX_COLUMNS = ('sip', 'dip')
+PERCENTILES = (50, 95, 99, 99.9)
+# 流大小分桶的边界 (字节), 各桶为 [前一个边界, 当前边界)
+SIZE_BUCKETS = (10_000, 100_000, 1_000_000, 10_000_000)
+# slowdown 直方图的边界
+HISTOGRAM_EDGES = (1, 1.5, 2, 3, 5, 10, 20, 50, 100, 1000)
+
+
+def _parse_hex(column):
+    """把等宽的十六进制字节串数组转换为整数, 不等宽时逐个转换"""
+    lengths = np.char.str_len(column)
+    if len(column) == 0 or np.any(lengths != lengths[0]):
+        return np.array([int(value, 16) for value in column.tolist()], dtype=np.int64)
+    width = int(lengths[0])
+    digits = np.ascontiguousarray(column, dtype=f'S{width}').view(np.uint8).reshape(-1, width).astype(np.int64)
+    # 0-9, A-F, a-f
+    digits = np.where(digits >= ord('a'), digits - (ord('a') - 10),
+                      np.where(digits >= ord('A'), digits - (ord('A') - 10), digits - ord('0')))
+    return digits @ (16 ** np.arange(width - 1, -1, -1, dtype=np.int64))
+
+
+def read_fct(fct_path):
+    """读取 FCT 文件, 返回 {列名: ndarray}; 字段数不足的行被跳过"""
+    with open(fct_path, 'rb') as file:
+        data = file.read()
+    tokens = data.split()
+    num_fields = len(FCT_COLUMNS)
+    if len(tokens) != num_fields * len(data.splitlines()):
+        # 存在空行或不完整的行 (仿真被中断) 时逐行处理
+        tokens = []
+        for line in data.splitlines():
+            parts = line.split()
+            if len(parts) >= num_fields:
+                tokens.extend(parts[:num_fields])
+    if not tokens:
+        # 空文件或没有完整的行 (仿真在任何 QP 完成前被中断)
+        return {name: np.empty(0, dtype=np.int64) for name in FCT_COLUMNS}
+    fields = np.array(tokens).reshape(-1, num_fields)
+    table = {}
+    for i, name in enumerate(FCT_COLUMNS):
+        if name in FCT_HEX_COLUMNS:
+            table[name] = _parse_hex(fields[:, i])
+        else:
+            table[name] = fields[:, i].astype(np.int64)
+    return table
+
+
+def slowdown(table):
+    """每条流的 slowdown; 由于 standalone_fct 的取整, 比值略小于 1 时记为 1"""
+    return np.maximum(table['fct'] / np.maximum(table['standalone_fct'], 1), 1.0)
+
+
+def _size_label(size):
+    for unit, scale in (('G', 10 ** 9), ('M', 10 ** 6), ('K', 10 ** 3)):
+        if size >= scale:
+            return f'{size / scale:g}{unit}'
+    return f'{size:g}'
+
+
+def bucket_labels(edges=SIZE_BUCKETS):
+    bounds = (0,) + tuple(edges)
+    labels = [f'{_size_label(low)}-{_size_label(high)}' for low, high in zip(bounds[:-1], bounds[1:])]
+    labels.append(f'>={_size_label(bounds[-1])}')
+    return labels
+
+
+def slowdown_report(table, edges=SIZE_BUCKETS, percentiles=PERCENTILES):
+    """按流大小分桶统计 slowdown, 返回每个桶一行的列表 (最后一行为全部流)
+
+    每行为 {'bucket', 'count', 'mean_fct_us', 'p<q>' ...}; 空桶的各项为 nan.
+    """
+    values = slowdown(table)
+    bucket = np.searchsorted(np.asarray(edges), table['size'], side='right')
+    # 按 (桶, slowdown) 排序后每个桶是连续的一段
+    order = np.lexsort((values, bucket))
+    sorted_values, sorted_fct = values[order], table['fct'][order]
+    bounds = np.searchsorted(bucket[order], np.arange(len(edges) + 2))
+
+    labels = bucket_labels(edges) + ['all']
+    rows = []
+    for i, label in enumerate(labels):
+        if label == 'all':
+            part, fct = np.sort(values), table['fct']
+        else:
+            part, fct = sorted_values[bounds[i]:bounds[i + 1]], sorted_fct[bounds[i]:bounds[i + 1]]
+        row = {'bucket': label, 'count': len(part)}
+        row['mean_fct_us'] = fct.mean() / 1e3 if len(part) else np.nan
+        quantiles = np.percentile(part, percentiles) if len(part) else [np.nan] * len(percentiles)
+        row.update({f'p{q:g}': value for q, value in zip(percentiles, quantiles)})
+        rows.append(row)
+    return rows
+
+
+def slowdown_histogram(table, edges=HISTOGRAM_EDGES):
+    """slowdown 落在各区间 [edges[i], edges[i+1]) 的流数, 最后一个区间不设上界"""
+    bins = np.append(np.asarray(edges, dtype=np.float64), np.inf)
+    counts, _ = np.histogram(slowdown(table), bins)
+    return counts
+
+
+def fct_path_of(directory, default='fct.txt'):
+    """结果目录中的 FCT 文件, 优先使用 config.txt 中的 FCT_OUTPUT_FILE"""
+    config = os.path.join(directory, 'config.txt')
+    name = default
+    if os.path.exists(config):
+        with open(config, 'r') as file:
+            for line in file:
+                if line.startswith('FCT_OUTPUT_FILE'):
+                    name = line.split()[1]
+                    break
+    return os.path.join(directory, name)
+
+
+def print_comparison(reports, histograms, percentiles=PERCENTILES):
+    """把各结果目录的统计并排打印, reports / histograms 均为 {目录: 结果}"""
+    names = list(reports)
+    width = max([12] + [len(name) for name in names])
+    metrics = ['count', 'mean_fct_us'] + [f'p{q:g}' for q in percentiles]
+    print('Slowdown (fct / standalone_fct) by flow size')
+    print(f"{'size':<14} {'metric':<12} " + ' '.join(f'{name:>{width}}' for name in names))
+    for i, row in enumerate(reports[names[0]]):
+        if all(reports[name][i]['count'] == 0 for name in names):
+            continue
+        for j, metric in enumerate(metrics):
+            label = row['bucket'] if j == 0 else ''
+            cells = []
+            for name in names:
+                value = reports[name][i][metric]
+                cells.append(f'{value:>{width}d}' if metric == 'count' else f'{value:>{width}.3f}')
+            print(f'{label:<14} {metric:<12} ' + ' '.join(cells))
+
+    print('\nSlowdown histogram (number of flows)')
+    print(f"{'slowdown':<14} " + ' '.join(f'{name:>{width}}' for name in names))
+    labels = [f'[{low:g}, {high:g})' for low, high in zip(HISTOGRAM_EDGES[:-1], HISTOGRAM_EDGES[1:])]
+    labels.append(f'>={HISTOGRAM_EDGES[-1]:g}')
+    for i, label in enumerate(labels):
+        print(f'{label:<14} ' + ' '.join(f'{histograms[name][i]:>{width}d}' for name in names))
+
+
+def write_report_csv(reports, path):
+    with open(path, 'w', newline='') as file:
+        writer = None
+        for name, rows in reports.items():
+            for row in rows:
+                if writer is None:
+                    writer = csv.DictWriter(file, fieldnames=['variant'] + list(row))
+                    writer.writeheader()
+                writer.writerow(dict(row, variant=name))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Slowdown percentiles and histograms from FCT_OUTPUT_FILE')
+    parser.add_argument('directories', nargs='*', default=['.'],
+                        help='Result directories to compare side by side (default: current directory)')
+    parser.add_argument('--fct', type=str, default=None,
+                        help='FCT file name inside each directory (default: FCT_OUTPUT_FILE of config.txt, or fct.txt)')
+    parser.add_argument('--buckets', type=int, nargs='+', default=list(SIZE_BUCKETS),
+                        help='Flow size bucket edges in bytes')
+    parser.add_argument('--csv', type=str, default=None, help='Also write the percentile table to this CSV file')
+    args = parser.parse_args()
+
+    reports, histograms = {}, {}
+    for directory in args.directories:
+        path = os.path.join(directory, args.fct) if args.fct else fct_path_of(directory)
+        table = read_fct(path)
+        name = os.path.normpath(directory)
+        reports[name] = slowdown_report(table, sorted(args.buckets))
+        histograms[name] = slowdown_histogram(table)
+
+    print_comparison(reports, histograms)
+    if args.csv:
+        write_report_csv(reports, args.csv)
+
+
+if __name__ == '__main__':
+    main()
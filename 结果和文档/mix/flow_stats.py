@@ -0,0 +1,228 @@
+"""逐流的 goodput 与完成时间分析
+
+评分脚本把所有包汇总成一条带宽曲线, 这里按 trace 中的 (node, sip, dip, sport) 区分各条流,
+一次流式读取 trace 得到每条流的
+    包数、首包/末包时间、新数据包数 (seq 超过此前最大值的包)、
+    seq 跳跃 (丢失的字节) 与重传 (seq 未超过此前最大值的包)、
+    以及按时隙统计的 goodput 时间序列,
+用于找出决定整体完成时间的拖尾流.
+
+每块数据先按流键 lexsort, 再用 reduceat 对每组做聚合; 流的状态 (最后的 seq、已见的最大 seq 等)
+保存在按流编号索引的数组中, 跨块衔接时只需取出上一块结束时的状态.
+文本 trace 中的地址只保留了 IP 的第二和第四个字节 (见 trace_stream.TRACE_COLUMNS), 因此流键包含
+观测到该包的节点号; 二进制 trace 的地址是完整的.
+"""
+import csv
+import argparse
+import numpy as np
+from trace_stream import iter_trace_columns, resolve_trace_path
+
+# 流键列, 顺序即 lexsort 的主次顺序
+FLOW_KEYS = ('node', 'sip', 'dip', 'sport')
+FLOW_COLUMNS = ('time',) + FLOW_KEYS + ('seq',)
+# trace 的时间精度为 100ns
+TRACE_TICKS_PER_SECOND = 10 ** 7
+# 分组累计最大值时用于隔开各组的偏移, 大于任何 32 位 seq
+GROUP_STRIDE = 1 << 33
+
+
+class FlowStats:
+    """逐块累计每条流的统计量
+
+    packet_payload_size: 每个数据包的负载字节数, 用于判断 seq 跳跃并把包数换算为 goodput
+    time_slot_duration: goodput 时间序列的时隙宽度 (秒), 按 trace 的 100ns 精度取整
+    """
+    def __init__(self, packet_payload_size=1000, time_slot_duration=1e-4):
+        self.packet_payload_size = packet_payload_size
+        self.time_slot_duration = time_slot_duration
+        self.slot_ticks = max(int(round(time_slot_duration * TRACE_TICKS_PER_SECOND)), 1)
+        self.ids = {}  # 流键 -> 流编号, 每块只对其中出现的不同流键查询一次
+        self.keys = np.empty((0, len(FLOW_KEYS)), dtype=np.int64)
+        self.packets = np.zeros(0, dtype=np.int64)
+        self.delivered = np.zeros(0, dtype=np.int64)
+        self.first_time = np.empty(0)
+        self.last_time = np.empty(0)
+        self.last_seq = np.zeros(0, dtype=np.int64)
+        self.max_seq = np.zeros(0, dtype=np.int64)
+        self.seq_gaps = np.zeros(0, dtype=np.int64)
+        self.missing_bytes = np.zeros(0, dtype=np.int64)
+        self.retransmits = np.zeros(0, dtype=np.int64)
+        self._series = []  # 每块的 (流编号, 时隙, 新数据包数)
+
+    @property
+    def num_flows(self):
+        return len(self.keys)
+
+    def _flow_ids(self, unique_keys):
+        """返回各流键的编号以及其中第一次出现的流, 并为新流分配状态"""
+        ids = np.empty(len(unique_keys), dtype=np.int64)
+        new = np.zeros(len(unique_keys), dtype=bool)
+        for i, key in enumerate(map(tuple, unique_keys.tolist())):
+            flow = self.ids.get(key)
+            if flow is None:
+                flow = self.ids[key] = len(self.ids)
+                new[i] = True
+            ids[i] = flow
+        added = int(new.sum())
+        if added:
+            self.keys = np.concatenate((self.keys, unique_keys[new]))
+            for name in ('packets', 'delivered', 'seq_gaps', 'missing_bytes', 'retransmits', 'last_seq'):
+                setattr(self, name, np.concatenate((getattr(self, name), np.zeros(added, dtype=np.int64))))
+            self.max_seq = np.concatenate((self.max_seq, np.full(added, -1, dtype=np.int64)))
+            self.first_time = np.concatenate((self.first_time, np.zeros(added)))
+            self.last_time = np.concatenate((self.last_time, np.zeros(added)))
+        return ids, new
+
+    def update(self, chunk):
+        """计入一块按时间有序的记录, chunk 至少包含 FLOW_COLUMNS 各列"""
+        n = len(chunk['time'])
+        if n == 0:
+            return
+        keys = np.stack([np.asarray(chunk[name], dtype=np.int64) for name in FLOW_KEYS], axis=1)
+        # lexsort 是稳定的, 同一条流内仍按时间先后排列
+        order = np.lexsort(keys.T[::-1])
+        keys = keys[order]
+        times = np.asarray(chunk['time'], dtype=np.float64)[order]
+        seq = np.asarray(chunk['seq'], dtype=np.int64)[order]
+
+        starts = np.flatnonzero(np.concatenate(([True], np.any(keys[1:] != keys[:-1], axis=1))))
+        counts = np.diff(np.append(starts, n))
+        ends = starts + counts - 1
+        ids, new = self._flow_ids(keys[starts])
+        group = np.repeat(np.arange(len(starts)), counts)
+
+        # 与同一条流的上一个包比较 seq, 每组的第一个包与上一块结束时的状态比较
+        previous = np.empty(n, dtype=np.int64)
+        previous[1:] = seq[:-1]
+        previous[starts] = self.last_seq[ids]
+        has_previous = np.ones(n, dtype=bool)
+        has_previous[starts[new]] = False
+        step = seq - previous
+        gap = has_previous & (step > self.packet_payload_size)
+
+        # 组内的累计最大值: 各组加上递增的偏移后一次 maximum.accumulate
+        offset = group * GROUP_STRIDE
+        running_max = np.maximum.accumulate(seq + offset) - offset
+        seen_max = np.empty(n, dtype=np.int64)
+        seen_max[1:] = running_max[:-1]
+        seen_max[starts] = -1
+        seen_max = np.maximum(seen_max, np.repeat(self.max_seq[ids], counts))
+        fresh = seq > seen_max
+
+        self.packets[ids] += counts
+        self.delivered[ids] += np.add.reduceat(fresh.astype(np.int64), starts)
+        self.retransmits[ids] += counts - np.add.reduceat(fresh.astype(np.int64), starts)
+        self.seq_gaps[ids] += np.add.reduceat(gap.astype(np.int64), starts)
+        self.missing_bytes[ids] += np.add.reduceat(np.where(gap, step - self.packet_payload_size, 0), starts)
+        self.first_time[ids[new]] = times[starts[new]]
+        self.last_time[ids] = times[ends]
+        self.last_seq[ids] = seq[ends]
+        self.max_seq[ids] = np.maximum(self.max_seq[ids], running_max[ends])
+
+        # 新数据包按 (流, 时隙) 计数; 组内时间有序, 因此相同的 (流, 时隙) 是连续的
+        slots = np.rint(times[fresh] * TRACE_TICKS_PER_SECOND).astype(np.int64) // self.slot_ticks
+        flows = ids[group[fresh]]
+        if len(slots):
+            bounds = np.flatnonzero(np.concatenate(([True], (flows[1:] != flows[:-1]) | (slots[1:] != slots[:-1]))))
+            self._series.append((flows[bounds], slots[bounds], np.diff(np.append(bounds, len(slots)))))
+
+    def goodput_series(self):
+        """返回 (流编号, 时隙编号, goodput Gbps), 按流编号和时隙排序; 时隙 k 从 k * time_slot_duration 秒开始"""
+        if not self._series:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64), np.zeros(0)
+        flows, slots, packets = (np.concatenate(parts) for parts in zip(*self._series))
+        order = np.lexsort((slots, flows))
+        flows, slots, packets = flows[order], slots[order], packets[order]
+        # 跨块的同一 (流, 时隙) 合并
+        bounds = np.flatnonzero(np.concatenate(([True], (flows[1:] != flows[:-1]) | (slots[1:] != slots[:-1]))))
+        packets = np.add.reduceat(packets, bounds)
+        self._series = [(flows[bounds], slots[bounds], packets)]
+        goodput = packets * self.packet_payload_size * 8 / self.time_slot_duration / 1e9
+        return flows[bounds], slots[bounds], goodput
+
+    def table(self):
+        """每条流一行的统计表 {列名: ndarray}, 按流编号排列"""
+        duration = self.last_time - self.first_time
+        data = self.delivered * self.packet_payload_size * 8 / 1e9
+        table = {name: self.keys[:, i] for i, name in enumerate(FLOW_KEYS)}
+        table.update({
+            'packets': self.packets,
+            'delivered': self.delivered,
+            'first_time': self.first_time,
+            'last_time': self.last_time,
+            'duration': duration,
+            # 只有一个包的流持续时间为 0, 不计算平均 goodput
+            'goodput': np.divide(data, duration, out=np.zeros(len(duration)), where=duration > 0),
+            'seq_gaps': self.seq_gaps,
+            'missing_bytes': self.missing_bytes,
+            'retransmits': self.retransmits,
+        })
+        return table
+
+    def stragglers(self, top=20):
+        """末包时间最晚的 top 条流的编号, 从晚到早"""
+        return np.argsort(-self.last_time, kind='stable')[:top]
+
+
+def scan_flows(trace_path, packet_payload_size=1000, time_slot_duration=1e-4, use_cache=True):
+    """流式读取 trace 并返回填充好的 FlowStats"""
+    stats = FlowStats(packet_payload_size, time_slot_duration)
+    for chunk in iter_trace_columns(trace_path, FLOW_COLUMNS, use_cache):
+        stats.update(chunk)
+    return stats
+
+
+def write_flow_table(stats, path):
+    table = stats.table()
+    with open(path, 'w', newline='') as file:
+        writer = csv.writer(file)
+        writer.writerow(table.keys())
+        writer.writerows(zip(*(values.tolist() for values in table.values())))
+
+
+def print_stragglers(stats, top=20):
+    table = stats.table()
+    last_time = table['last_time']
+    print(f"Flows: {stats.num_flows}")
+    if stats.num_flows == 0:
+        return
+    p50, p99 = np.percentile(last_time, [50, 99])
+    print(f"Last packet time: p50 {p50:.6f} s, p99 {p99:.6f} s, max {last_time.max():.6f} s")
+    print(f"\nTop {min(top, stats.num_flows)} straggler flows (latest last packet):")
+    print(f"{'node':>6} {'sip':>8} {'dip':>8} {'sport':>6} {'packets':>9} {'first(s)':>10} {'last(s)':>10} "
+          f"{'Gbps':>8} {'gaps':>6} {'missing(B)':>11} {'retx':>6}")
+    for flow in stats.stragglers(top):
+        print(f"{table['node'][flow]:>6} {table['sip'][flow]:08x} {table['dip'][flow]:08x} {table['sport'][flow]:>6} "
+              f"{table['packets'][flow]:>9} {table['first_time'][flow]:>10.6f} {table['last_time'][flow]:>10.6f} "
+              f"{table['goodput'][flow]:>8.3f} {table['seq_gaps'][flow]:>6} {table['missing_bytes'][flow]:>11} "
+              f"{table['retransmits'][flow]:>6}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Per-flow goodput and completion time analysis of mix.tr')
+    parser.add_argument('--config', type=str, default='config.txt', help='Path to config file (for PACKET_PAYLOAD_SIZE)')
+    parser.add_argument('--trace', type=str, default='mix.tr', help='Path to trace file')
+    parser.add_argument('--payload', type=int, default=None, help='Packet payload size, overrides the config file')
+    parser.add_argument('--slot', type=float, default=1e-4, help='Goodput time slot in seconds (default: 1e-4)')
+    parser.add_argument('--top', type=int, default=20, help='Number of straggler flows to print (default: 20)')
+    parser.add_argument('--output', type=str, default='flow_stats.csv', help='Per-flow table (default: flow_stats.csv)')
+    parser.add_argument('--series-output', type=str, default=None, help='Save the per-flow goodput series to this .npz file')
+    parser.add_argument('--no-cache', action='store_true', help='Do not read or write the columnar trace cache')
+    args = parser.parse_args()
+
+    payload = args.payload
+    if payload is None:
+        from score_calculator import read_config_PACKET_PAYLOAD_SIZE
+        payload = read_config_PACKET_PAYLOAD_SIZE(args.config)
+
+    stats = scan_flows(resolve_trace_path(args.trace), payload, args.slot, not args.no_cache)
+    print_stragglers(stats, args.top)
+    write_flow_table(stats, args.output)
+    if args.series_output:
+        flows, slots, goodput = stats.goodput_series()
+        np.savez_compressed(args.series_output, keys=stats.keys, key_names=np.array(FLOW_KEYS),
+                            flow=flows, slot=slots, goodput=goodput, slot_duration=stats.time_slot_duration)
+
+
+if __name__ == '__main__':
+    main()
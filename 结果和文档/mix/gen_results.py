@@ -1,19 +1,153 @@
 import os
+import io
+import csv
+import json
+import contextlib
 import subprocess
 import argparse
 import logging
-from concurrent.futures import ThreadPoolExecutor
+import threading
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
 from datetime import datetime
 
 # 配置常量
 TRACE_FILE_SUFFIX = '.tr'
 MAX_WORKERS = 14
 LOG_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+SUMMARY_PREFIX = 'results_summary'
+JOURNAL_FILE = 'results_journal.jsonl'
+# 评分在每个目录中写出的文件, 记入任务日志
+SCORE_OUTPUTS = ('output.txt', 'result.txt', 'plot-result.txt')
+
+def peak_rss_mb():
+    """当前进程的峰值 RSS (MB), 不支持 resource 模块的平台返回 None"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    # Linux 上 ru_maxrss 的单位为 KB
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def journal_outputs(directory):
+    """评分输出的校验信息; 作为输入的 trace 只记录大小与修改时间, 以便 trace 被重新仿真后重新评分"""
+    from job_journal import output_checksums
+    traces = [name for name in os.listdir(directory) if name.endswith(TRACE_FILE_SUFFIX)]
+    return output_checksums(directory, list(SCORE_OUTPUTS) + traces, unhashed=traces)
+
+def score_directory(directory, use_cache=True, plot_formats=('png',)):
+    """在当前进程中生成 plot_generator.py --no-show 与 gen_result.py 在该目录下的全部输出
+
+    trace 只扫描一次, 每种时隙宽度一个 SlotCounter, 按两个脚本各自规格的时隙口径给出带宽序列.
+    返回 (汇总行, 标准输出文本). 进程池中每个进程同一时刻只处理一个目录, 可以安全地切换工作目录.
+    绘图走 plot_generator 的无界面路径, 同一进程处理的各目录复用同一个图模板.
+    """
+    import gen_result
+    import plot_generator
+    import score_calculator
+    from score_spec import named_spec, scan_slot_counters
+    from trace_stream import resolve_trace_path
+
+    original_dir = os.getcwd()
+    stdout = io.StringIO()
+    start_time = datetime.now()
+    try:
+        os.chdir(directory)
+        packet_payload_size = score_calculator.read_config_PACKET_PAYLOAD_SIZE('config.txt')
+        calculator_spec = named_spec(score_calculator.SCORE_SPEC)
+        result_spec = named_spec(gen_result.RESULT_SPEC)
+        counters = scan_slot_counters(resolve_trace_path('mix.tr'), {calculator_spec['slot'], result_spec['slot']}, use_cache)
+        origin_6400 = score_calculator.read_flow_SIZE(score_calculator.read_config_FLOW_FILE('config.txt')) == 6400
+
+        # plot_generator.py --no-show
+        with contextlib.redirect_stdout(stdout):
+            counter = counters[calculator_spec['slot']]
+            time_slots, bandwidths = score_calculator.counter_bandwidths(counter, packet_payload_size, calculator_spec)
+            score = score_calculator.score_bandwidths(time_slots, bandwidths, counter.last_time, origin_6400)
+            score_calculator.print_score(score, packet_payload_size)
+            score_calculator.write_plot_result(score)
+            plot_generator.plot_metrics(time_slots, bandwidths, score['intervals'], show_plot=False,
+                                         formats=plot_formats)
+
+        # gen_result.py
+        report = io.StringIO()
+        with contextlib.redirect_stdout(report):
+            time_slots, bandwidths, num_packets, completion_time = gen_result.counter_bandwidths(
+                counters[result_spec['slot']], packet_payload_size, result_spec)
+            result = gen_result.compute_result(time_slots, bandwidths, num_packets, completion_time, packet_payload_size,
+                                               spec=result_spec)
+        with open('output.txt', 'w') as file:
+            file.write(report.getvalue())
+        gen_result.write_result(result)
+        stdout.write(report.getvalue())
+    finally:
+        os.chdir(original_dir)
+
+    flows, variant = os.path.split(os.path.normpath(directory))
+    row = {
+        'directory': os.path.relpath(directory),
+        'flows': os.path.basename(flows),
+        'variant': variant,
+        'flow_completion_time': score['completion_time'],
+        'average_bandwidth': score['average_bandwidth'],
+        'bandwidth_utilization': score['bandwidth_utilization'],
+        'fluctuation_rates': [score['results'][f'interval_{i}']['fluctuation_rate']
+                              for i in range(1, len(score['intervals']) + 1)],
+        'final_score': score['final_score'],
+        # gen_result.py 的固定区间口径 (result.txt)
+        'result': result,
+        'wall_time': (datetime.now() - start_time).total_seconds(),
+        # 进程池中的进程会处理多个目录, 这是该进程到目前为止的峰值
+        'max_rss_mb': peak_rss_mb(),
+    }
+    return row, stdout.getvalue()
+
+def write_summary(rows, prefix=SUMMARY_PREFIX):
+    """把所有目录的评分写成 <prefix>.csv 和 <prefix>.json 两张汇总表"""
+    rows = sorted(rows, key=lambda row: row['directory'])
+    with open(f'{prefix}.json', 'w') as file:
+        json.dump(rows, file, indent=2)
+
+    num_intervals = max((len(row['fluctuation_rates']) for row in rows), default=0)
+    num_result_intervals = max((len(row['result']['fluctuation_rates']) for row in rows), default=0)
+    fieldnames = (['directory', 'flows', 'variant', 'flow_completion_time', 'average_bandwidth', 'bandwidth_utilization']
+                  + [f'fluctuation_rate_{i}' for i in range(1, num_intervals + 1)]
+                  + ['final_score', 'result_average_bandwidth']
+                  + [f'result_fluctuation_rate_{i}' for i in range(1, num_result_intervals + 1)]
+                  + ['result_final_score'])
+    with open(f'{prefix}.csv', 'w', newline='') as file:
+        writer = csv.DictWriter(file, fieldnames=fieldnames)
+        writer.writeheader()
+        for row in rows:
+            line = {key: value for key, value in row.items() if key in fieldnames}
+            for i, rate in enumerate(row['fluctuation_rates'], 1):
+                line[f'fluctuation_rate_{i}'] = rate
+            line['result_average_bandwidth'] = row['result']['average_bandwidth']
+            for i, rate in enumerate(row['result']['fluctuation_rates'], 1):
+                line[f'result_fluctuation_rate_{i}'] = rate
+            line['result_final_score'] = row['result']['final_score']
+            writer.writerow(line)
+    logging.info(f"Summary of {len(rows)} directories written to {prefix}.csv and {prefix}.json")
 
 class CommandRunner:
-    def __init__(self, dry_run=False, log_level=logging.DEBUG):
+    def __init__(self, dry_run=False, log_level=logging.DEBUG, in_process=False, use_cache=True, summary_prefix=SUMMARY_PREFIX,
+                 plot_formats=('png',), journal_path=JOURNAL_FILE, resume=False, verify=False):
         self.dry_run = dry_run
+        self.in_process = in_process
+        self.use_cache = use_cache
+        self.summary_prefix = summary_prefix
+        self.plot_formats = plot_formats
+        self.resume = resume
+        self.verify = verify
         self.setup_logging(log_level)
+        from job_journal import JobJournal
+        self.journal = JobJournal(journal_path)
+        self.journal_lock = threading.Lock()
+
+    def record(self, directory, state, returncode=None, wall_time=None, max_rss_mb=None):
+        """把目录的评分状态写入任务日志, 完成时附带输出的校验信息"""
+        outputs = journal_outputs(directory) if state == 'done' else None
+        with self.journal_lock:
+            self.journal.record(directory, state, returncode, wall_time, max_rss_mb, outputs)
 
     def setup_logging(self, log_level):
         """设置日志记录"""
@@ -39,6 +173,10 @@ class CommandRunner:
     def run_commands_in_directory(self, directory):
         """在指定目录中运行命令"""
         original_dir = os.getcwd()  # 保存当前目录
+        start_time = datetime.now()
+        returncode = 0
+        if not self.dry_run:
+            self.record(directory, 'started')
 
         try:
             # 切换到目标目录
@@ -70,13 +208,19 @@ class CommandRunner:
                 except subprocess.CalledProcessError as e:
                     logging.error(f"Error running {cmd_str} in {directory}: {e}")
                     logging.error(f"Error output: {e.stderr}")
+                    returncode = returncode or e.returncode
                 except Exception as e:
                     logging.error(f"Unexpected error running {cmd_str}: {e}")
+                    returncode = returncode or -1
 
         finally:
             # 恢复原始目录
             os.chdir(original_dir)
 
+        if not self.dry_run:
+            wall_time = (datetime.now() - start_time).total_seconds()
+            self.record(directory, 'done' if returncode == 0 else 'failed', returncode, wall_time)
+
     def find_trace_directories(self):
         """查找包含.tr文件的目录"""
         trace_dirs = []
@@ -112,11 +256,22 @@ class CommandRunner:
 
             logging.debug(f"Found {len(trace_dirs)} directories to process")
 
+            skipped = []
+            if self.resume:
+                pending = self.journal.pending(trace_dirs, self.verify)
+                skipped = [directory for directory in trace_dirs if directory not in pending]
+                logging.info(f"Resuming: {len(skipped)} of {len(trace_dirs)} directories already scored")
+                trace_dirs = pending
+
             if self.dry_run:
                 for directory in trace_dirs:
                     logging.info(f"[DRY RUN] Would process: {directory}")
                 return
 
+            if self.in_process:
+                self.score_directories(trace_dirs, skipped)
+                return
+
             # 使用线程池并行处理
             with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
                 list(executor.map(self.run_commands_in_directory, trace_dirs))
@@ -124,6 +279,40 @@ class CommandRunner:
         except Exception as e:
             logging.error(f"An error occurred while processing directories: {e}", exc_info=True)
 
+    def score_directories(self, trace_dirs, skipped=()):
+        """在进程池中直接评分各目录, 不再为每个目录启动两个解释器, 最后写出汇总表
+
+        skipped 为 --resume 时跳过的目录, 它们的汇总行取自上一次的汇总表.
+        """
+        rows = self.previous_rows(skipped)
+        with ProcessPoolExecutor(max_workers=MAX_WORKERS) as executor:
+            futures = {}
+            for directory in trace_dirs:
+                self.record(directory, 'started')
+                futures[executor.submit(score_directory, directory, self.use_cache, self.plot_formats)] = directory
+            for future in as_completed(futures):
+                directory = futures[future]
+                try:
+                    row, output = future.result()
+                except Exception as e:
+                    logging.error(f"Error scoring {directory}: {e}")
+                    self.record(directory, 'failed', -1)
+                    continue
+                logging.debug(f"Scoring output in \n\t{directory}:\n{output}--------------------------------------------\n")
+                logging.info(f"Scored {directory}: final score {row['final_score']:.2f}")
+                self.record(directory, 'done', 0, row['wall_time'], row['max_rss_mb'])
+                rows.append(row)
+        write_summary(rows, self.summary_prefix)
+
+    def previous_rows(self, directories):
+        """上一次汇总表中 directories 的各行"""
+        path = f'{self.summary_prefix}.json'
+        if not directories or not os.path.exists(path):
+            return []
+        wanted = {os.path.relpath(directory) for directory in directories}
+        with open(path, 'r') as file:
+            return [row for row in json.load(file) if row['directory'] in wanted]
+
 def main():
     global TRACE_FILE_SUFFIX, MAX_WORKERS
     # 设置命令行参数
@@ -152,6 +341,43 @@ def main():
         choices=['DEBUG', 'INFO', 'WARNING', 'ERROR', 'CRITICAL'],
         help='Set the logging level (default: INFO)'
     )
+    parser.add_argument(
+        '--in-process',
+        action='store_true',
+        help='Score every directory in a process pool instead of running the two scripts, and write a summary table'
+    )
+    parser.add_argument(
+        '--summary',
+        default=SUMMARY_PREFIX,
+        help=f'Summary table path without extension, used with --in-process (default: {SUMMARY_PREFIX})'
+    )
+    parser.add_argument(
+        '--no-cache',
+        action='store_true',
+        help='Do not read or write the columnar trace cache in --in-process mode'
+    )
+    parser.add_argument(
+        '--plot-format',
+        nargs='+',
+        choices=['png', 'svg'],
+        default=['png'],
+        help='Plot formats written in --in-process mode (default: png)'
+    )
+    parser.add_argument(
+        '--journal',
+        default=JOURNAL_FILE,
+        help=f'Job journal recording the state of every directory (default: {JOURNAL_FILE})'
+    )
+    parser.add_argument(
+        '--resume',
+        action='store_true',
+        help='Skip directories the journal records as scored with unchanged outputs and trace'
+    )
+    parser.add_argument(
+        '--verify',
+        action='store_true',
+        help='With --resume, re-hash the recorded outputs instead of comparing size and modification time'
+    )
     args = parser.parse_args()
 
     # 更新全局常量
@@ -159,7 +385,9 @@ def main():
     MAX_WORKERS = args.workers
 
     # 创建运行器实例并执行
-    runner = CommandRunner(dry_run=args.dry_run, log_level=args.log_level)
+    runner = CommandRunner(dry_run=args.dry_run, log_level=args.log_level, in_process=args.in_process,
+                           use_cache=not args.no_cache, summary_prefix=args.summary, plot_formats=args.plot_format,
+                           journal_path=args.journal, resume=args.resume, verify=args.verify)
     runner.process_directories()
 
 if __name__ == "__main__":
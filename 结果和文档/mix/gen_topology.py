@@ -1,105 +1,275 @@
 # %%
+"""参数化的 fat-tree / 多层 Clos / leaf-spine 拓扑生成
+
+生成 third.cc 读取的 topology.txt:
+    第一行: 总节点数 交换机数 链路数
+    第二行: 交换机节点 ID
+    其余每行: src dst rate delay error_rate
+节点编号与原有拓扑一致: 主机 (每个网卡端口为一个节点) 为 0..H-1, 交换机从 H 开始按层
+(leaf 在前) 依次编号.
+
+多层 Clos 由各层交换机数 switches, 每层的上行链路数 uplinks 与分组数 pods 描述: 第 t 层与
+第 t+1 层各自按编号均分为 pods[t] 组, 第 t 层组内第 i 台交换机的第 j 条上行链路接到
+第 t+1 层同组的第 (i * uplinks[t] + j) % (该组交换机数) 台. 组内全连接 (fat-tree 的 pod 内),
+跨组条纹连接 (fat-tree 的 agg-core) 与 leaf-spine 都是这一规则的特例. 链路用 NumPy
+按层整体生成, 数万主机的拓扑在数秒内写完.
+"""
+import re
+import math
+import argparse
+
+import numpy as np
+
+RATE_UNITS = {'': 1e-9, 'K': 1e-6, 'M': 1e-3, 'G': 1.0, 'T': 1e3}
+# 每次格式化写出的链路数
+WRITE_CHUNK_LINKS = 1 << 16
+TRAILER = (
+    "\n"
+    "First line: total node #, switch node #, link #\n"
+    "Second line: switch node IDs...\n"
+    "src1 dst1 rate delay error_rate\n"
+    "..."
+)
+
+
+class TopologyError(ValueError):
+    pass
+
+
+def parse_rate(rate):
+    """'25Gbps' 之类的链路速率, 返回 Gbps"""
+    match = re.fullmatch(r'([0-9.eE+-]+)\s*([KMGT]?)bps', rate.strip())
+    if match is None:
+        raise TopologyError(f'unknown link rate {rate!r}')
+    return float(match.group(1)) * RATE_UNITS[match.group(2)]
+
+
+def _per_level(value, levels, name):
+    """标量或长度为 levels 的序列, 返回长度为 levels 的列表"""
+    if isinstance(value, (list, tuple)):
+        if len(value) == 1:
+            return list(value) * levels
+        if len(value) != levels:
+            raise TopologyError(f'{name} needs 1 or {levels} values, got {len(value)}')
+        return list(value)
+    return [value] * levels
+
+
+class Topology:
+    """主机与各层交换机的编号, 以及按层 (主机-leaf, leaf-第二层, ...) 存放的链路"""
+    def __init__(self, hosts, switches):
+        self.hosts = hosts
+        self.switches = list(switches)
+        self.offsets = np.cumsum([hosts] + self.switches)[:-1]
+        self.levels = []  # [(src, dst, rate, delay, error_rate)]
+
+    @property
+    def nodes(self):
+        return self.hosts + sum(self.switches)
+
+    @property
+    def links(self):
+        return sum(len(src) for src, _, _, _, _ in self.levels)
+
+    def switch_ids(self):
+        return np.arange(self.hosts, self.nodes)
+
+    def add_level(self, src, dst, rate, delay, error_rate=0):
+        self.levels.append((np.asarray(src, dtype=np.int64), np.asarray(dst, dtype=np.int64), rate, delay, error_rate))
+
+    def oversubscription(self):
+        """每层交换机下行容量与上行容量之比的最大值 (Gbps / Gbps), 最高层没有上行, 不计"""
+        down = np.zeros(self.nodes)
+        up = np.zeros(self.nodes)
+        for src, dst, rate, _, _ in self.levels:
+            # 每条链路 src 在下层, dst 在上层
+            np.add.at(up, src, parse_rate(rate))
+            np.add.at(down, dst, parse_rate(rate))
+        ratios = []
+        for tier in range(len(self.switches) - 1):
+            ids = np.arange(self.offsets[tier], self.offsets[tier] + self.switches[tier])
+            used = up[ids] > 0
+            ratios.append(float(np.max(down[ids][used] / up[ids][used])) if used.any() else math.inf)
+        return ratios
+
+    def write(self, file):
+        """按 topology.txt 格式写入已打开的文件"""
+        file.write(f"{self.nodes} {sum(self.switches)} {self.links}\n")
+        file.write(' '.join(map(str, self.switch_ids().tolist())) + '\n')
+        for src, dst, rate, delay, error_rate in self.levels:
+            pairs = np.column_stack([src, dst])
+            for start in range(0, len(pairs), WRITE_CHUNK_LINKS):
+                chunk = pairs[start:start + WRITE_CHUNK_LINKS]
+                file.write((f'%d %d {rate} {delay} {error_rate}\n' * len(chunk)) % tuple(chunk.ravel().tolist()))
+
+    def to_text(self):
+        import io
+        buffer = io.StringIO()
+        self.write(buffer)
+        return buffer.getvalue().rstrip('\n')
+
+    def summary(self):
+        tiers = ', '.join(f'L{tier + 1} {count}' for tier, count in enumerate(self.switches))
+        ratios = ', '.join(f'L{tier + 1} {ratio:.2f}:1' for tier, ratio in enumerate(self.oversubscription()))
+        return (f"{self.nodes} nodes ({self.hosts} hosts; switches {tiers}), {self.links} links; "
+                f"oversubscription {ratios or '-'}")
+
+
+def clos(hosts_per_leaf, switches, uplinks, pods=None, rates='25Gbps', delays='1us', error_rate=0):
+    """多层 Clos
+
+    hosts_per_leaf  每台 leaf 下的主机端口数, 整数或长度为 leaf 数的序列
+    switches        各层交换机数, switches[0] 为 leaf
+    uplinks         第 t 层每台交换机到第 t+1 层的链路数, 长度为层数 - 1
+    pods            第 t 层与第 t+1 层的分组数, 默认全为 1 (相邻两层之间全局条纹连接)
+    rates, delays   各级链路 (主机-leaf, leaf-第二层, ...) 的速率与时延, 标量或长度为层数的序列
+    """
+    tiers = len(switches)
+    if tiers < 1 or any(count <= 0 for count in switches):
+        raise TopologyError(f'switch counts must be positive, got {switches}')
+    if len(uplinks) != tiers - 1:
+        raise TopologyError(f'uplinks needs {tiers - 1} values, got {len(uplinks)}')
+    pods = [1] * (tiers - 1) if pods is None else list(pods)
+    if len(pods) != tiers - 1:
+        raise TopologyError(f'pods needs {tiers - 1} values, got {len(pods)}')
+    rates = _per_level(rates, tiers, 'rates')
+    delays = _per_level(delays, tiers, 'delays')
+    for rate in rates:
+        parse_rate(rate)
+
+    per_leaf = np.asarray(hosts_per_leaf, dtype=np.int64)
+    if per_leaf.ndim == 0:
+        per_leaf = np.full(switches[0], per_leaf)
+    if len(per_leaf) != switches[0] or (per_leaf < 0).any():
+        raise TopologyError(f'hosts_per_leaf needs 1 or {switches[0]} non-negative values')
+    hosts = int(per_leaf.sum())
+    topology = Topology(hosts, switches)
+
+    leaf_of_host = np.repeat(np.arange(switches[0]), per_leaf)
+    topology.add_level(np.arange(hosts), topology.offsets[0] + leaf_of_host, rates[0], delays[0], error_rate)
+
+    for tier in range(tiers - 1):
+        lower, upper, count, groups = switches[tier], switches[tier + 1], uplinks[tier], pods[tier]
+        if count <= 0:
+            raise TopologyError(f'L{tier + 1} needs at least one uplink')
+        if lower % groups or upper % groups:
+            raise TopologyError(f'{groups} pods do not divide L{tier + 1} ({lower}) and L{tier + 2} ({upper})')
+        lower_per_pod, upper_per_pod = lower // groups, upper // groups
+        ids = np.arange(lower)
+        pod, local = ids // lower_per_pod, ids % lower_per_pod
+        targets = (local[:, None] * count + np.arange(count)[None, :]) % upper_per_pod
+        targets += (pod * upper_per_pod)[:, None]
+        topology.add_level(topology.offsets[tier] + np.repeat(ids, count),
+                           topology.offsets[tier + 1] + targets.ravel(),
+                           rates[tier + 1], delays[tier + 1], error_rate)
+    return topology
+
+
+def fat_tree(k, hosts_per_edge=None, oversubscription=1.0, rates='25Gbps', delays='1us', error_rate=0):
+    """k 叉 fat-tree: k 个 pod, 每个 pod k/2 台 edge 与 k/2 台 aggregation, (k/2)^2 台 core;
+    每台 edge 下默认 k/2 * oversubscription 个主机"""
+    if k < 2 or k % 2:
+        raise TopologyError(f'fat-tree k must be an even number >= 2, got {k}')
+    half = k // 2
+    if hosts_per_edge is None:
+        hosts_per_edge = int(round(half * oversubscription))
+    return clos(hosts_per_edge, [k * half, k * half, half * half], [half, half], [k, 1], rates, delays, error_rate)
+
+
+def leaf_spine(leaves, spines, hosts_per_leaf, uplinks=None, oversubscription=None,
+               rates='25Gbps', delays='1us', error_rate=0):
+    """两层 leaf-spine; uplinks 默认每台 spine 一条, 给出 oversubscription 时按
+    主机接入容量 / (oversubscription * 上行速率) 向上取整"""
+    rates = _per_level(rates, 2, 'rates')
+    if uplinks is None:
+        if oversubscription is None:
+            uplinks = spines
+        else:
+            demand = np.max(hosts_per_leaf) * parse_rate(rates[0])
+            uplinks = max(1, math.ceil(demand / (oversubscription * parse_rate(rates[1])) - 1e-9))
+    return clos(hosts_per_leaf, [leaves, spines], [uplinks], [1], rates, delays, error_rate)
+
+
+def huawei():
+    """原有的四层拓扑: 160 个计算节点 x 2 端口 (每台 L1 16 个) 与 8 个存储节点 x 12 端口
+    (每台 L1 12 个), L1/L2/L3/L4 为 28/28/24/12 台, 全部 25Gbps"""
+    return clos([16] * 20 + [12] * 8, [28, 28, 24, 12], [16, 8, 8], [7, 4, 4], '25Gbps', '1us')
+
+
 def generate_topology():
     """
-    生成四层Fat-tree拓扑结构的topology.txt文件
+    生成四层Fat-tree拓扑结构的topology.txt内容
     基于华为网络架构图的具体配置
     """
-    # 基础参数定义
-    compute_nodes = 160  # 计算节点，每个2×25G
-    storage_nodes = 8  # 存储节点，每个12×25G
-
-    # 每个节点的端口数
-    compute_ports = compute_nodes * 2  # 320个计算端口
-    storage_ports = storage_nodes * 12  # 96个存储端口
-    total_end_ports = compute_ports + storage_ports  # 416个终端端口
-
-    # 交换机数量
-    l1_switches = 28  # L1层交换机
-    l2_switches = 28  # L2层交换机
-    l3_switches = 24  # L3层交换机
-    l4_switches = 12  # L4层交换机
-    total_switches = l1_switches + l2_switches + l3_switches + l4_switches
-
-    # 总节点数（所有端口+所有交换机）
-    total_nodes = total_end_ports + total_switches
-
-    # 计算总链路数
-    # 计算节点链路 + 存储节点链路 + L1到L2链路 + L2到L3链路 + L3到L4链路
-    total_links = (
-        (compute_ports)
-        + (storage_ports)
-        + (l1_switches * 16)
-        + (l2_switches * 8)
-        + (l3_switches * 8)
-    )
-
-    content = []
-
-    # 第一行：总节点数 交换机数 链路数
-    content.append(f"{total_nodes} {total_switches} {total_links}")
-
-    # 第二行：交换机节点ID列表
-    switch_start = total_end_ports
-    switch_ids = list(range(switch_start, switch_start + total_switches))
-    content.append(" ".join(map(str, switch_ids)))
-
-    # 生成链路连接
-    current_port = 0
-
-    # 1. 计算节点到L1交换机的连接
-    for i in range(compute_nodes):
-        for j in range(2):  # 每个计算节点2个端口
-            l1_sw = switch_start + (current_port // 16)
-            content.append(f"{current_port} {l1_sw} 25Gbps 1us 0")
-            current_port += 1
-
-    # 2. 存储节点到L1交换机的连接
-    for i in range(storage_nodes):
-        for j in range(12):  # 每个存储节点12个端口
-            l1_sw = switch_start + (current_port // 12)
-            content.append(f"{current_port} {l1_sw} 25Gbps 1us 0")
-            current_port += 1
-
-    # 3. L1到L2的连接
-    l2_start = switch_start + l1_switches
-    for i in range(l1_switches):
-        for j in range(16):  # 每个L1交换机16个上行端口
-            l2_index = (i // 4) * 4 + (j % 4)
-            content.append(f"{switch_start + i} {l2_start + l2_index} 25Gbps 1us 0")
-
-    # 4. L2到L3的连接
-    l3_start = l2_start + l2_switches
-    for i in range(l2_switches):
-        for j in range(8):  # 每个L2交换机8个上行端口
-            l3_index = (i // 8) * 6 + (j % 6)
-            content.append(f"{l2_start + i} {l3_start + l3_index} 25Gbps 1us 0")
-
-    # 5. L3到L4的连接
-    l4_start = l3_start + l3_switches
-    for i in range(l3_switches):
-        for j in range(8):  # 每个L3交换机8个上行端口
-            l4_index = (i // 6) * 3 + (j % 3)
-            content.append(f"{l3_start + i} {l4_start + l4_index} 25Gbps 1us 0")
-
-    return "\n".join(content)
-
-
-def write_topology_file(filename="./topology.txt"):
+    return huawei().to_text()
+
+
+def write_topology_file(filename="./topology.txt", topology=None):
     """
     将生成的拓扑结构写入文件
     """
-    topology_content = generate_topology()
+    topology = huawei() if topology is None else topology
     with open(filename, "w") as f:
-        f.write(topology_content)
-        f.write("\n\n")
-        f.write("First line: total node #, switch node #, link #\n")
-        f.write("Second line: switch node IDs...\n")
-        f.write("src1 dst1 rate delay error_rate\n")
-        f.write("...")
+        topology.write(f)
+        f.write(TRAILER)
+
+
+# %%
+def main():
+    # 各子命令共用的选项, 放在子命令之后, 避免 nargs='+' 吞掉子命令名
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument('--output', type=str, default='./topology.txt', help='Output file (default: ./topology.txt)')
+    common.add_argument('--rates', nargs='+', default=['25Gbps'],
+                        help='Link rate of each level, host-leaf first; one value for all levels (default: 25Gbps)')
+    common.add_argument('--delays', nargs='+', default=['1us'], help='Link delay of each level (default: 1us)')
+    common.add_argument('--error-rate', type=float, default=0, help='Link error rate (default: 0)')
+    parser = argparse.ArgumentParser(description='Generate a fat-tree, multi-tier Clos or leaf-spine topology.txt')
+    subparsers = parser.add_subparsers(dest='kind')
+
+    tree = subparsers.add_parser('fat-tree', parents=[common], help='k-ary fat-tree')
+    tree.add_argument('--k', type=int, required=True, help='Switch radix, even')
+    tree.add_argument('--hosts-per-edge', type=int, default=None, help='Hosts per edge switch (default: k/2 * oversubscription)')
+    tree.add_argument('--oversubscription', type=float, default=1.0, help='Edge oversubscription (default: 1)')
+
+    two_tier = subparsers.add_parser('leaf-spine', parents=[common], help='Two-tier leaf-spine')
+    two_tier.add_argument('--leaves', type=int, required=True)
+    two_tier.add_argument('--spines', type=int, required=True)
+    two_tier.add_argument('--hosts-per-leaf', type=int, required=True)
+    two_tier.add_argument('--uplinks', type=int, default=None, help='Uplinks per leaf (default: one per spine)')
+    two_tier.add_argument('--oversubscription', type=float, default=None,
+                          help='Derive the uplinks per leaf from this oversubscription ratio')
+
+    multi_tier = subparsers.add_parser('clos', parents=[common], help='Multi-tier Clos')
+    multi_tier.add_argument('--switches', type=int, nargs='+', required=True, help='Switches per tier, leaf first')
+    multi_tier.add_argument('--uplinks', type=int, nargs='*', default=[], help='Uplinks per switch of each tier but the top')
+    multi_tier.add_argument('--pods', type=int, nargs='*', default=None, help='Pods between each pair of adjacent tiers (default: 1)')
+    multi_tier.add_argument('--hosts-per-leaf', type=int, nargs='+', required=True, help='One value, or one per leaf')
+
+    subparsers.add_parser('huawei', parents=[common], help='The original four-tier 160 compute + 8 storage node topology')
+    args = parser.parse_args()
+    if args.kind is None:
+        # 不带子命令时与原来的脚本一样生成 huawei 拓扑
+        args = parser.parse_args(['huawei'])
+
+    try:
+        if args.kind == 'fat-tree':
+            topology = fat_tree(args.k, args.hosts_per_edge, args.oversubscription, args.rates, args.delays, args.error_rate)
+        elif args.kind == 'leaf-spine':
+            topology = leaf_spine(args.leaves, args.spines, args.hosts_per_leaf, args.uplinks, args.oversubscription,
+                                  args.rates, args.delays, args.error_rate)
+        elif args.kind == 'clos':
+            hosts = args.hosts_per_leaf[0] if len(args.hosts_per_leaf) == 1 else args.hosts_per_leaf
+            topology = clos(hosts, args.switches, args.uplinks, args.pods, args.rates, args.delays, args.error_rate)
+        else:
+            topology = huawei()
+    except TopologyError as e:
+        parser.error(str(e))
+    write_topology_file(args.output, topology)
+    print(f"{args.output}: {topology.summary()}")
 
 
 # %%
 if __name__ == "__main__":
-    write_topology_file()
+    main()
 
 # %%
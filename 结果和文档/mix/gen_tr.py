@@ -1,5 +1,15 @@
+import io
+import os
 import re
-import sys
+import argparse
+from multiprocessing import Pool
+from trace_stream import open_trace, trace_compression
+
+# Regular expression pattern for line parsing
+PATTERN = re.compile(r'(\d+)\s+n:(\d+).*?0b(\w+)\s+0b(\w+)\s+(\d+).*?U\s+(\d+)\s+\d+\s+(\d+)')
+
+# 并行模式下每个任务处理的字节数
+CHUNK_BYTES = 16 << 20
 
 def ip_parse(ip_hex):
     """Convert hex format (0b000101) to x.y format"""
@@ -13,26 +23,106 @@ def ip_parse(ip_hex):
     except:
         return "0.0"
 
-def process_trace(input_file, output_file):
-    # Regular expression pattern for line parsing
-    pattern = r'(\d+)\s+n:(\d+).*?0b(\w+)\s+0b(\w+)\s+(\d+).*?U\s+(\d+)\s+\d+\s+(\d+)'
+class IpTable(dict):
+    """ip 十六进制串 -> "x.y" 的缓存, 每个地址只解析一次"""
+    def __missing__(self, ip):
+        value = self[ip] = ip_parse(f'0b{ip}')
+        return value
+
+def split_fields(line):
+    """按空白切分常见格式的行
+        time n:node intf:qidx qlen event ecn:x 0b<sip> 0b<dip> sport dport U seq ts pg ...
+    返回与 PATTERN 相同的 7 个分组; 格式不符时返回 None, 由调用者退回正则匹配
+    """
+    f = line.split()
+    if (len(f) >= 14 and f[0].isdigit() and f[1].startswith('n:') and f[1][2:].isdigit()
+            and f[6].startswith('0b') and f[7].startswith('0b') and f[6][2:].isalnum() and f[7][2:].isalnum()
+            and f[8].isdigit() and f[9].isdigit() and f[10] == 'U'
+            and f[11].isdigit() and f[12].isdigit() and f[13].isdigit()
+            and '0b' not in f[2] + f[3] + f[4] + f[5]):
+        return f[0], f[1][2:], f[6][2:], f[7][2:], f[8], f[11], f[13]
+    return None
+
+def convert_lines(lines, ips):
+    """把若干行原始 trace 转换为 mix.tr 格式的文本"""
+    out = []
+    for line in lines:
+        groups = split_fields(line)
+        if groups is None:
+            # 缺少 PATTERN 中的字面量时一定不匹配, 避免对整行回溯
+            if 'U' not in line or '0b' not in line or 'n:' not in line:
+                continue
+            match = PATTERN.search(line)
+            if not match:
+                continue
+            groups = match.groups()
+        # Extract values from regex match
+        time, node, src_ip, dst_ip, sport, seq, pg = groups
+
+        # Convert time to seconds with 7 decimal places
+        time_s = float(time) / 1e9
+
+        # Write formatted output
+        out.append(f"{time_s:.7f} /{node} {ips[src_ip]}>{ips[dst_ip]} u {sport} {seq} {pg}\n")
+    return ''.join(out)
+
+def line_ranges(input_file, chunk_bytes=CHUNK_BYTES):
+    """把文件切分为若干 [start, end) 字节区间, 每个区间都结束在行尾"""
+    size = os.path.getsize(input_file)
+    ranges = []
+    with open(input_file, 'rb') as file:
+        start = 0
+        while start < size:
+            end = min(start + chunk_bytes, size)
+            if end < size:
+                file.seek(end)
+                file.readline()
+                end = file.tell()
+            ranges.append((start, end))
+            start = end
+    return ranges
+
+_worker_ips = None
+
+def _convert_range(args):
+    global _worker_ips
+    if _worker_ips is None:
+        _worker_ips = IpTable()
+    input_file, start, end = args
+    with open(input_file, 'rb') as file:
+        file.seek(start)
+        data = file.read(end - start)
+    return convert_lines(io.TextIOWrapper(io.BytesIO(data)), _worker_ips)
 
-    with open(input_file, 'r') as fin, open(output_file, 'w', buffering=8192*1024) as fout:
-        for line in fin:
-            match = re.search(pattern, line)
-            if match:
-                # Extract values from regex match
-                time, node, src_ip, dst_ip, sport, seq, pg = match.groups()
+def process_trace(input_file, output_file, workers=1):
+    """workers > 1 时按行边界把输入切块, 在进程池中并行转换并按原顺序写出
 
-                # Convert time to seconds with 7 decimal places
-                time_s = float(time) / 1e9
+    压缩的输入无法按字节区间切分, 总是顺序处理.
+    """
+    with open(output_file, 'w', buffering=8192*1024) as fout:
+        if workers > 1 and trace_compression(input_file) is None:
+            tasks = [(input_file, start, end) for start, end in line_ranges(input_file)]
+            with Pool(workers) as pool:
+                for text in pool.imap(_convert_range, tasks):
+                    fout.write(text)
+            return
 
-                # Write formatted output
-                fout.write(f"{time_s:.7f} /{node} {ip_parse(f'0b{src_ip}')}>{ip_parse(f'0b{dst_ip}')} u {sport} {seq} {pg}\n")
+        # 输入可以是 gzip/zstd 压缩的文件, 边读边解压
+        ips = IpTable()
+        with open_trace(input_file) as raw:
+            fin = io.TextIOWrapper(raw)
+            while True:
+                lines = fin.readlines(CHUNK_BYTES)
+                if not lines:
+                    break
+                fout.write(convert_lines(lines, ips))
 
 if __name__ == "__main__":
-    if len(sys.argv) != 3:
-        print("Usage: python script.py input.tr output.txt")
-        sys.exit(1)
+    parser = argparse.ArgumentParser(description='Convert a raw trace to the mix.tr format')
+    parser.add_argument('input', help='raw trace (may be .gz/.zst compressed)')
+    parser.add_argument('output', help='output file in mix.tr format')
+    parser.add_argument('-j', '--workers', type=int, default=os.cpu_count() or 1,
+                        help='number of worker processes (default: CPU count)')
+    args = parser.parse_args()
 
-    process_trace(sys.argv[1], sys.argv[2])
\ No newline at end of file
+    process_trace(args.input, args.output, args.workers)
@@ -0,0 +1,139 @@
+"""运行目录的任务日志 (只追加的 JSONL)
+
+每行记录一个目录的一次状态变化:
+    {"time", "directory", "state", "returncode", "wall_time", "max_rss_mb", "outputs", "profile"}
+state 为 started / done / failed / cached; outputs 为 {文件: {"size", "mtime_ns", "sha256"}};
+profile 为 run_profile 计算的资源画像 (仿真完成的运行才有).
+每行写入后立即 fsync, 被抢占或 Ctrl-C 时最多丢失正在写的一行, 读取时忽略不完整的行.
+
+同一目录以最后一条记录为准. --resume 时只跳过最后状态为 done / cached 且输出文件
+仍与记录一致 (大小与修改时间, verify 时再比对 sha256) 的目录; 其余 (失败的, 只有 started
+即中途被打断而可能留下半截 mix.tr 的, 输出被改动的) 重新运行.
+"""
+import os
+import json
+import hashlib
+import argparse
+from datetime import datetime
+
+COMPLETE_STATES = ('done', 'cached')
+HASH_CHUNK_BYTES = 1 << 20
+
+
+def file_checksum(path, digest=True):
+    """{'size', 'mtime_ns', 'sha256'}; digest 为 False 时不读取文件, sha256 为 None"""
+    stat = os.stat(path)
+    sha256 = None
+    if digest:
+        hasher = hashlib.sha256()
+        with open(path, 'rb') as file:
+            for block in iter(lambda: file.read(HASH_CHUNK_BYTES), b''):
+                hasher.update(block)
+        sha256 = hasher.hexdigest()
+    return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'sha256': sha256}
+
+
+def output_checksums(directory, names=None, exclude=('config.txt',), unhashed=()):
+    """目录中输出文件的校验信息; names 为 None 时取目录顶层除 exclude 外的全部文件,
+    unhashed 中的文件 (如作为评分输入的大 trace) 只记录大小与修改时间"""
+    if names is None:
+        names = sorted(name for name in os.listdir(directory)
+                       if name not in exclude and os.path.isfile(os.path.join(directory, name)))
+    return {name: file_checksum(os.path.join(directory, name), name not in unhashed)
+            for name in names if os.path.isfile(os.path.join(directory, name))}
+
+
+def outputs_unchanged(directory, outputs, verify=False):
+    """记录中的输出文件是否都还在且未被改动"""
+    for name, recorded in outputs.items():
+        path = os.path.join(directory, name)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return False
+        if stat.st_size != recorded['size']:
+            return False
+        if verify and recorded['sha256'] is not None:
+            if file_checksum(path)['sha256'] != recorded['sha256']:
+                return False
+        elif stat.st_mtime_ns != recorded['mtime_ns']:
+            return False
+    return True
+
+
+class JobJournal:
+    """追加写入的任务日志, 目录以相对于日志文件所在目录的路径记录"""
+    def __init__(self, path):
+        self.path = path
+        self.base = os.path.dirname(os.path.abspath(path))
+
+    def _key(self, directory):
+        return os.path.relpath(os.path.abspath(directory), self.base)
+
+    def record(self, directory, state, returncode=None, wall_time=None, max_rss_mb=None, outputs=None, profile=None):
+        entry = {
+            'time': datetime.now().isoformat(timespec='seconds'),
+            'directory': self._key(directory),
+            'state': state,
+            'returncode': returncode,
+            'wall_time': wall_time,
+            'max_rss_mb': max_rss_mb,
+            'outputs': outputs or {},
+            'profile': profile,
+        }
+        with open(self.path, 'a') as file:
+            file.write(json.dumps(entry) + '\n')
+            file.flush()
+            os.fsync(file.fileno())
+        return entry
+
+    def load(self):
+        """{目录: 最后一条记录}"""
+        latest = {}
+        if not os.path.exists(self.path):
+            return latest
+        with open(self.path, 'r') as file:
+            for line in file:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # 写到一半被打断的行
+                    continue
+                latest[entry['directory']] = entry
+        return latest
+
+    def is_complete(self, directory, latest=None, verify=False):
+        entry = (self.load() if latest is None else latest).get(self._key(directory))
+        if entry is None or entry['state'] not in COMPLETE_STATES:
+            return False
+        return outputs_unchanged(directory, entry['outputs'], verify)
+
+    def pending(self, directories, verify=False):
+        """需要 (重新) 运行的目录, 保持原有顺序"""
+        latest = self.load()
+        return [directory for directory in directories if not self.is_complete(directory, latest, verify)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Show the state of the run directories recorded in a job journal')
+    parser.add_argument('journal', help='Journal file (JSONL)')
+    parser.add_argument('--verify', action='store_true', help='Re-hash the outputs of completed runs')
+    args = parser.parse_args()
+
+    journal = JobJournal(args.journal)
+    latest = journal.load()
+    counts = {}
+    for key, entry in sorted(latest.items()):
+        state = entry['state']
+        directory = os.path.join(journal.base, key)
+        if state in COMPLETE_STATES and not outputs_unchanged(directory, entry['outputs'], args.verify):
+            state = 'modified'
+        counts[state] = counts.get(state, 0) + 1
+        wall = f"{entry['wall_time']:.1f}s" if entry['wall_time'] is not None else '-'
+        rss = f"{entry['max_rss_mb']:.0f} MB" if entry['max_rss_mb'] is not None else '-'
+        print(f"{state:<9} {str(entry['returncode']):>5} {wall:>10} {rss:>9}  {key}")
+    print(', '.join(f'{state}: {count}' for state, count in sorted(counts.items())))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,289 @@
+"""PFC_OUTPUT_FILE 的暂停 (pause storm) 分析
+
+third.cc 的 get_pfc 在端口收到 PFC 帧时输出一行
+    "%lu %u %u %u %u"
+即 time(ns) node nodeType ifIndex type, type 为 1 表示该端口被对端暂停, 0 表示恢复.
+
+按 (node, ifIndex) 重建暂停区间: 未暂停时的第一个 pause 开始一个区间, 之后的第一个 resume 结束它,
+暂停期间重复的 pause 只是刷新. 到仿真结束仍未恢复的区间截止到 SIMULATOR_STOP_TIME (或最后一个事件).
+在此基础上统计每个端口的总暂停时间、每个时隙内的暂停占空比, 并借助拓扑文件找出暂停沿各跳的传播链:
+端口 (A, p) 被对端 B 暂停时, 若 B 自身已有端口处于暂停状态, 则认为这次暂停由 B 上的那次暂停传播而来.
+
+全部计算都在 NumPy 数组上完成, 不逐事件循环.
+"""
+import os
+import csv
+import argparse
+import numpy as np
+
+PFC_COLUMNS = ('time', 'node', 'node_type', 'port', 'type')
+PFC_PAUSE = 1
+PFC_RESUME = 0
+# 占空比时隙的默认宽度 (ns)
+DUTY_SLOT_NS = 100_000
+
+
+def read_pfc(pfc_path):
+    """读取 PFC 文件, 返回 {列名: int64 ndarray}; 字段数不足的行被跳过"""
+    with open(pfc_path, 'rb') as file:
+        data = file.read()
+    tokens = data.split()
+    num_fields = len(PFC_COLUMNS)
+    if len(tokens) != num_fields * len(data.splitlines()):
+        tokens = []
+        for line in data.splitlines():
+            parts = line.split()
+            if len(parts) >= num_fields:
+                tokens.extend(parts[:num_fields])
+    values = np.array(tokens, dtype=np.int64).reshape(-1, num_fields)
+    return {name: values[:, i] for i, name in enumerate(PFC_COLUMNS)}
+
+
+def read_topology(topology_path):
+    """读取拓扑文件, 返回 (各端口对端节点的字典 {(node, ifIndex): peer}, 交换机集合)
+
+    ifIndex 0 为回环接口, 各节点的 QbbNetDevice 按链路在拓扑文件中的顺序从 1 开始编号,
+    与 third.cc 中 qbb.Install 的顺序一致.
+    """
+    with open(topology_path, 'r') as file:
+        node_num, switch_num, link_num = map(int, file.readline().split())
+        switches = set()
+        while len(switches) < switch_num:
+            switches.update(map(int, file.readline().split()))
+        next_index = np.ones(node_num, dtype=np.int64)
+        peers = {}
+        for _ in range(link_num):
+            src, dst = map(int, file.readline().split()[:2])
+            peers[(src, int(next_index[src]))] = dst
+            peers[(dst, int(next_index[dst]))] = src
+            next_index[src] += 1
+            next_index[dst] += 1
+    return peers, switches
+
+
+def pause_intervals(events, stop_time=None):
+    """由 PFC 事件重建暂停区间, 返回按 (node, port, start) 排序的 {node, port, start, end, open}
+
+    stop_time 为仍未恢复的区间的截止时间 (ns), 默认为最后一个事件的时间.
+    """
+    if stop_time is None:
+        stop_time = int(events['time'].max()) if len(events['time']) else 0
+    order = np.lexsort((events['time'], events['port'], events['node']))
+    node, port, time, kind = (events[name][order] for name in ('node', 'port', 'time', 'type'))
+    n = len(time)
+    first = np.ones(n, dtype=bool)
+    first[1:] = (node[1:] != node[:-1]) | (port[1:] != port[:-1])
+    previous = np.full(n, PFC_RESUME, dtype=np.int64)
+    previous[1:] = kind[:-1]
+    previous[first] = PFC_RESUME
+
+    starts = np.flatnonzero((kind == PFC_PAUSE) & (previous == PFC_RESUME))
+    ends = np.flatnonzero((kind == PFC_RESUME) & (previous == PFC_PAUSE))
+    # 每个区间的结束事件是它之后的第一个结束事件, 且必须属于同一端口
+    match = np.searchsorted(ends, starts)
+    end_index = ends[np.minimum(match, max(len(ends) - 1, 0))] if len(ends) else np.zeros(len(starts), dtype=np.int64)
+    closed = (match < len(ends)) & (node[end_index] == node[starts]) & (port[end_index] == port[starts])
+    return {
+        'node': node[starts],
+        'port': port[starts],
+        'start': time[starts],
+        'end': np.where(closed, time[end_index], max(stop_time, int(time.max()) if n else 0)),
+        'open': ~closed,
+    }
+
+
+def port_summary(intervals):
+    """每个端口一行: 暂停次数与总暂停时间 (ns), 按总暂停时间从大到小排序"""
+    n = len(intervals['start'])
+    if n == 0:
+        return {name: np.zeros(0, dtype=np.int64) for name in ('node', 'port', 'pauses', 'paused_ns')}
+    # pause_intervals 的结果已按端口排序, 每个端口是连续的一段
+    bounds = np.flatnonzero(np.concatenate(([True], (intervals['node'][1:] != intervals['node'][:-1])
+                                                     | (intervals['port'][1:] != intervals['port'][:-1]))))
+    paused = np.add.reduceat(intervals['end'] - intervals['start'], bounds)
+    pauses = np.diff(np.append(bounds, n))
+    order = np.argsort(-paused, kind='stable')
+    return {
+        'node': intervals['node'][bounds][order],
+        'port': intervals['port'][bounds][order],
+        'pauses': pauses[order],
+        'paused_ns': paused[order],
+    }
+
+
+def duty_cycle(intervals, slot_ns=DUTY_SLOT_NS, num_ports=None, stop_time=None):
+    """每个时隙内处于暂停状态的端口时间占比, 返回 (时隙起点 ns, 暂停的端口数均值, 占空比)
+
+    暂停端口数是分段常数函数, 用其积分在时隙边界处的差值得到每个时隙的平均值.
+    num_ports 为端口总数 (默认为出现过暂停的端口数), 占空比 = 平均暂停端口数 / num_ports.
+    """
+    starts, ends = intervals['start'], intervals['end']
+    if stop_time is None:
+        stop_time = int(ends.max()) if len(ends) else 0
+    if num_ports is None:
+        num_ports = len(set(zip(intervals['node'].tolist(), intervals['port'].tolist()))) or 1
+    times = np.concatenate((starts, ends))
+    deltas = np.concatenate((np.ones(len(starts), dtype=np.int64), -np.ones(len(ends), dtype=np.int64)))
+    order = np.argsort(times, kind='stable')
+    times, level = times[order], np.cumsum(deltas[order])
+    # 积分 F(t) = 暂停端口数对时间的积分, 在各事件时刻的值
+    integral = np.concatenate(([0], np.cumsum(level[:-1] * np.diff(times)))) if len(times) else np.zeros(0, dtype=np.int64)
+
+    boundaries = np.arange(0, stop_time + slot_ns, slot_ns, dtype=np.int64)
+    last = np.searchsorted(times, boundaries, side='right') - 1
+    valid = last >= 0
+    at = np.zeros(len(boundaries), dtype=np.float64)
+    at[valid] = integral[last[valid]] + level[last[valid]] * (boundaries[valid] - times[last[valid]])
+    average = np.diff(at) / slot_ns
+    return boundaries[:-1], average, average / num_ports
+
+
+def propagation(intervals, peers):
+    """找出每个暂停区间的上游原因, 返回 (parent, depth, root)
+
+    区间 j 在 (A, p) 上, 对端为 B. 在 B 上开始得早于 j 的区间中取结束最晚的一个,
+    若它在 j 开始时仍未结束, 即为 j 的 parent. parent 的开始时间严格更早, 因此不会成环.
+    parent 为 -1 表示源头 (B 自身没有被暂停, 即拥塞点); 拓扑中找不到对端时也记为源头.
+    depth 为沿 parent 到源头的跳数, root 为源头区间的下标, 均用指针倍增求出.
+    """
+    n = len(intervals['start'])
+    node, start, end = intervals['node'], intervals['start'], intervals['end']
+    peer = np.array([peers.get(key, -1) for key in zip(node.tolist(), intervals['port'].tolist())], dtype=np.int64)
+
+    # 按 (node, start) 排序, 每个节点的区间连续; 节点内对结束时间求前缀最大值
+    order = np.lexsort((start, node))
+    sorted_node, sorted_start, sorted_end = node[order], start[order], end[order]
+    group_first = np.concatenate(([True], sorted_node[1:] != sorted_node[:-1])) if n else np.zeros(0, dtype=bool)
+    group = np.cumsum(group_first) - 1
+    stride = int(end.max()) + 1 if n else 1
+    shifted = sorted_end + group * stride
+    prefix_max = np.maximum.accumulate(shifted) if n else shifted
+    record = np.maximum.accumulate(np.where(shifted == prefix_max, np.arange(n), 0)) if n else shifted
+
+    # B 上开始时间严格早于 j 的最后一个区间
+    composite = sorted_node * stride + sorted_start
+    position = np.searchsorted(composite, peer * stride + start, side='left') - 1
+    parent = np.full(n, -1, dtype=np.int64)
+    candidate = (peer >= 0) & (position >= 0)
+    candidate[candidate] &= sorted_node[position[candidate]] == peer[candidate]
+    best = record[position[candidate]]
+    active = (prefix_max[position[candidate]] - group[position[candidate]] * stride) > start[candidate]
+    parent[np.flatnonzero(candidate)[active]] = order[best[active]]
+
+    # 指针倍增: depth[i] 始终为 i 到 link[i] 的跳数, 源头指向自身
+    link = np.where(parent >= 0, parent, np.arange(n))
+    depth = (parent >= 0).astype(np.int64)
+    while n and np.any(link[link] != link):
+        depth = depth + depth[link]
+        link = link[link]
+    return parent, depth, link
+
+
+def pfc_report(events, peers=None, num_ports=None, stop_time=None, slot_ns=DUTY_SLOT_NS):
+    """计算全部统计量, 返回字典"""
+    intervals = pause_intervals(events, stop_time)
+    report = {
+        'events': len(events['time']),
+        'intervals': intervals,
+        'ports': port_summary(intervals),
+        'duty': duty_cycle(intervals, slot_ns, num_ports, stop_time),
+    }
+    if peers is not None:
+        report['propagation'] = propagation(intervals, peers)
+    return report
+
+
+def print_report(report, peers=None, top=10):
+    intervals, ports = report['intervals'], report['ports']
+    durations = intervals['end'] - intervals['start']
+    print(f"PFC events: {report['events']}, pause intervals: {len(durations)}, "
+          f"ports paused: {len(ports['node'])}, still paused at the end: {int(intervals['open'].sum())}")
+    if len(durations) == 0:
+        return
+    print(f"Total paused time: {durations.sum() / 1e3:.3f} us, "
+          f"interval p50 {np.percentile(durations, 50) / 1e3:.3f} us, max {durations.max() / 1e3:.3f} us")
+
+    print(f"\nTop {min(top, len(ports['node']))} paused ports:")
+    print(f"{'node':>6} {'port':>5} {'peer':>6} {'pauses':>8} {'paused(us)':>12}")
+    for i in range(min(top, len(ports['node']))):
+        peer = peers.get((int(ports['node'][i]), int(ports['port'][i])), -1) if peers else -1
+        print(f"{ports['node'][i]:>6} {ports['port'][i]:>5} {peer:>6} {ports['pauses'][i]:>8} "
+              f"{ports['paused_ns'][i] / 1e3:>12.3f}")
+
+    slots, average, duty = report['duty']
+    busiest = np.argsort(-duty, kind='stable')[:top]
+    print(f"\nBusiest {len(busiest)} time slots (pause duty cycle):")
+    for i in sorted(busiest):
+        print(f"  {slots[i] / 1e6:>10.3f} ms  paused ports {average[i]:>8.2f}  duty {duty[i]:.4f}")
+
+    if 'propagation' in report:
+        parent, depth, root = report['propagation']
+        print(f"\nPause propagation: {int((parent < 0).sum())} source intervals, "
+              f"{int((parent >= 0).sum())} propagated, max depth {int(depth.max())}")
+        counts = np.bincount(depth)
+        print('  depth ' + ' '.join(f'{d}:{c}' for d, c in enumerate(counts) if c))
+        # 影响范围最大的源头: 其下游区间数
+        descendants = np.bincount(root, minlength=len(root)) - 1
+        for source in np.argsort(-descendants, kind='stable')[:min(top, len(root))]:
+            if descendants[source] <= 0:
+                break
+            print(f"  source node {intervals['node'][source]} port {intervals['port'][source]} at "
+                  f"{intervals['start'][source] / 1e6:.6f} ms -> {descendants[source]} downstream pauses")
+        deepest = int(np.argmax(depth))
+        if depth[deepest] > 0:
+            chain = [deepest]
+            while parent[chain[-1]] >= 0:
+                chain.append(int(parent[chain[-1]]))
+            print('  deepest chain: ' + ' <- '.join(f"{intervals['node'][j]}:{intervals['port'][j]}" for j in chain))
+
+
+def write_duty_csv(report, path):
+    slots, average, duty = report['duty']
+    with open(path, 'w', newline='') as file:
+        writer = csv.writer(file)
+        writer.writerow(['slot_start_ns', 'paused_ports', 'duty_cycle'])
+        writer.writerows(zip(slots.tolist(), average.tolist(), duty.tolist()))
+
+
+def read_config_value(config_path, key):
+    if not os.path.exists(config_path):
+        return None
+    with open(config_path, 'r') as file:
+        for line in file:
+            parts = line.split()
+            if len(parts) >= 2 and parts[0] == key:
+                return parts[1]
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description='PFC pause interval, duty cycle and propagation analysis')
+    parser.add_argument('--config', type=str, default='config.txt', help='Path to config file')
+    parser.add_argument('--pfc', type=str, default=None, help='PFC file (default: PFC_OUTPUT_FILE of the config)')
+    parser.add_argument('--topology', type=str, default=None,
+                        help='Topology file for propagation chains (default: TOPOLOGY_FILE of the config)')
+    parser.add_argument('--slot', type=float, default=DUTY_SLOT_NS / 1e9, help='Duty cycle slot in seconds (default: 1e-4)')
+    parser.add_argument('--top', type=int, default=10, help='Number of ports / slots / sources to print')
+    parser.add_argument('--duty-output', type=str, default=None, help='Write the per-slot duty cycle to this CSV file')
+    args = parser.parse_args()
+
+    pfc_path = args.pfc or read_config_value(args.config, 'PFC_OUTPUT_FILE') or 'pfc.txt'
+    topology_path = args.topology or read_config_value(args.config, 'TOPOLOGY_FILE')
+    stop_time = read_config_value(args.config, 'SIMULATOR_STOP_TIME')
+    stop_time = int(round(float(stop_time) * 1e9)) if stop_time else None
+
+    peers = None
+    num_ports = None
+    if topology_path and os.path.exists(topology_path):
+        peers, _ = read_topology(topology_path)
+        num_ports = len(peers)
+
+    events = read_pfc(pfc_path)
+    report = pfc_report(events, peers, num_ports, stop_time, max(int(round(args.slot * 1e9)), 1))
+    print_report(report, peers, args.top)
+    if args.duty_output:
+        write_duty_csv(report, args.duty_output)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,7 +1,7 @@
+import os
 import argparse
-import matplotlib.pyplot as plt
 import numpy as np
-from score_calculator import calculate_score
+from score_calculator import calculate_score, BANDWIDTH_ENGINES, SlotIndex
 
 def determine_sample_interval(time_slots, min_samples=100, max_samples=500):
     """
@@ -32,30 +32,131 @@ def determine_sample_interval(time_slots, min_samples=100, max_samples=500):
         # 数据点适中时，使用原始间隔
         return avg_interval
 
-def plot_metrics(time_slots, bandwidths, intervals, show_plot=True):
-    """生成带宽和波动率随时间变化的图"""
-    def calculate_window_metrics(start_time, window_size):
-        """计算窗口内的指标"""
-        try:
-            start_index = next(i for i, t in enumerate(time_slots) if t >= start_time)
-            end_index = next(i for i, t in enumerate(time_slots) if t >= start_time + window_size)
-
-            window_bandwidths = bandwidths[start_index:end_index]
-            if not window_bandwidths:
-                return 0, 0
-
-            avg_bandwidth = sum(window_bandwidths) / len(window_bandwidths)
-            if avg_bandwidth == 0:
-                return 0, 0
-
-            max_bandwidth = max(window_bandwidths)
-            min_bandwidth = min(window_bandwidths)
-            fluctuation_rate = (max_bandwidth - min_bandwidth) / avg_bandwidth
-
-            return avg_bandwidth, fluctuation_rate
-        except StopIteration:
-            return 0, 0
-
+# 关键时间区间的底色
+INTERVAL_COLORS = [
+    'lightblue',    # 浅蓝
+    'lightgreen',   # 浅绿
+    'lightsalmon',  # 浅橙红
+    'lightpink',    # 浅粉
+    'plum',         # 梅红
+    'peachpuff',    # 桃色
+    'paleturquoise',# 淡绿松石
+    'khaki',        # 卡其色
+    'bisque',       # 橘黄
+    'lavender',     # 薰衣草紫
+    'wheat',        # 小麦色
+    'palegreen',    # 淡绿
+    'powderblue',   # 粉蓝
+    'moccasin',     # 鹿皮色
+    'thistle',      # 蓟色
+    'lightyellow',  # 浅黄
+    'azure',        # 天蓝
+    'lemonchiffon', # 柠檬雪纺
+    'mistyrose',    # 玫瑰褐
+    'honeydew'      # 蜜瓜色
+]
+
+PLOT_FORMATS = ('png', 'svg')
+
+def minmax_decimate(x, y, columns):
+    """按像素列降采样: 每列只保留 y 最小和最大的两个点, 折线的外形与逐点绘制相同
+
+    x 需单调不减. 点数不超过 2 * columns 时原样返回.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    if len(x) <= 2 * columns or x[-1] <= x[0]:
+        return x, y
+    column = np.minimum(((x - x[0]) / (x[-1] - x[0]) * columns).astype(np.int64), columns - 1)
+    # 按 (列, y) 排序后, 每列的第一个和最后一个即为最小值和最大值
+    order = np.lexsort((y, column))
+    starts = np.flatnonzero(np.diff(column, prepend=-1))
+    ends = np.append(starts[1:], len(x)) - 1
+    keep = np.unique(np.concatenate((order[starts], order[ends])))
+    return x[keep], y[keep]
+
+class FigureTemplate:
+    """带宽/波动率双子图的模板
+
+    坐标轴, 标题, 网格和折线只创建一次, 每次绘制只替换数据, 平均线和区间底色,
+    批量绘图时同一个进程中的所有目录共用一个模板.
+    不传入 figure 时使用 matplotlib.figure.Figure 与 Agg 画布, 不经过 pyplot 的全局状态.
+    """
+    def __init__(self, figure=None):
+        if figure is None:
+            from matplotlib.figure import Figure
+            from matplotlib.backends.backend_agg import FigureCanvasAgg
+            figure = Figure(figsize=(12, 8))
+            FigureCanvasAgg(figure)
+        self.figure = figure
+        self.spans = []
+
+        # 带宽随时间变化
+        self.bandwidth_axes = figure.add_subplot(2, 1, 1)
+        self.bandwidth_line, = self.bandwidth_axes.plot([], [], 'b-', linewidth=1, label='Bandwidth')
+        self.bandwidth_avg = self.bandwidth_axes.axhline(y=0, color='r', linestyle='--', alpha=0.5)
+        self.bandwidth_axes.set_title('Bandwidth over Time')
+        self.bandwidth_axes.set_xlabel('Time (ms)')
+        self.bandwidth_axes.set_ylabel('Bandwidth (Gbps)')
+        self.bandwidth_axes.grid(True, linestyle='--', alpha=0.7)
+
+        # 波动率随时间变化
+        self.fluctuation_axes = figure.add_subplot(2, 1, 2)
+        self.fluctuation_line, = self.fluctuation_axes.plot([], [], 'r-', linewidth=1, label='Fluctuation Rate')
+        self.fluctuation_avg = self.fluctuation_axes.axhline(y=0, color='b', linestyle='--', alpha=0.5)
+        self.fluctuation_axes.set_title('Fluctuation Rate over Time')
+        self.fluctuation_axes.set_xlabel('Time (ms)')
+        self.fluctuation_axes.set_ylabel('Fluctuation Rate')
+        self.fluctuation_axes.grid(True, linestyle='--', alpha=0.7)
+
+    def pixel_columns(self, dpi):
+        """子图绘图区的像素宽度"""
+        width = self.bandwidth_axes.get_position().width * self.figure.get_figwidth()
+        return max(int(width * dpi), 1)
+
+    def render(self, x, bandwidths, fluctuations, avg_bw, avg_fluct, key_intervals, dpi=300):
+        """填入一个目录的数据, x 的单位为 ms"""
+        columns = self.pixel_columns(dpi)
+        self.bandwidth_line.set_data(*minmax_decimate(x, bandwidths, columns))
+        self.fluctuation_line.set_data(*minmax_decimate(x, fluctuations, columns))
+        self.bandwidth_avg.set_ydata([avg_bw, avg_bw])
+        self.bandwidth_avg.set_label(f'Avg: {avg_bw:.2f} Gbps')
+        self.fluctuation_avg.set_ydata([avg_fluct, avg_fluct])
+        self.fluctuation_avg.set_label(f'Avg: {avg_fluct:.2f}')
+
+        # 突出显示关键时间区间
+        for span in self.spans:
+            span.remove()
+        self.spans = []
+        alpha = 0.2
+        for i, (start, end) in enumerate(key_intervals):
+            self.spans.append(self.bandwidth_axes.axvspan(start, end, color=INTERVAL_COLORS[i], alpha=alpha,
+                                                          label=f'Interval {i+1}: {start:.1f}-{end:.1f}ms'))
+            self.spans.append(self.fluctuation_axes.axvspan(start, end, color=INTERVAL_COLORS[i], alpha=alpha))
+
+        for ax in (self.bandwidth_axes, self.fluctuation_axes):
+            ax.set_autoscale_on(True)
+            ax.relim()
+            ax.autoscale_view()
+            ax.set_ylim(bottom=0)
+            ax.legend(loc='center left', bbox_to_anchor=(1, 0.5))
+        self.figure.tight_layout()
+
+    def save(self, output='bandwidth_fluctuation', formats=('png',), dpi=300):
+        for fmt in formats:
+            self.figure.savefig(f'{output}.{fmt}', dpi=dpi, bbox_inches='tight')
+
+# 无界面绘图时复用的模板, 每个进程一个
+_template = None
+
+def plot_metrics(time_slots, bandwidths, intervals, show_plot=True, formats=('png',), dpi=300,
+                 output='bandwidth_fluctuation'):
+    """生成带宽和波动率随时间变化的图
+
+    show_plot 为 False 时不导入 pyplot, 在 Agg 画布上复用同一个 FigureTemplate 绘制,
+    按 formats 依次保存为 <output>.png / <output>.svg.
+    """
+    global _template
     # 确定采样间隔
     sample_interval = determine_sample_interval(time_slots)
     window_size = sample_interval * 2  # 设置窗口大小为采样间隔的2倍
@@ -72,102 +173,64 @@ def plot_metrics(time_slots, bandwidths, intervals, show_plot=True):
     print(f"Selected sample interval: {sample_interval:.6f}s")
     print(f"Number of sampling points: {len(sample_points)}")
 
-    sample_bandwidths = []
-    sample_fluctuations = []
-
-    for t in sample_points:
-        avg_bw, fluct = calculate_window_metrics(t, window_size)
-        sample_bandwidths.append(avg_bw)
-        sample_fluctuations.append(fluct)
-
-    # 创建图表
-    plt.figure(figsize=(12, 8))
-
-    # 带宽随时间变化
-    plt.subplot(2, 1, 1)
-    plt.plot(sample_points * 1000, sample_bandwidths, 'b-', linewidth=1, label='Bandwidth')
-    plt.title('Bandwidth over Time')
-    plt.xlabel('Time (ms)')
-    plt.ylabel('Bandwidth (Gbps)')
-    plt.grid(True, linestyle='--', alpha=0.7)
-    plt.ylim(bottom=0)
+    # 所有采样窗口通过同一个索引批量查询
+    index = SlotIndex(time_slots, bandwidths)
+    sample_bandwidths, sample_fluctuations = index.window_metrics(sample_points, sample_points + window_size)
 
-    # 添加平均带宽线
+    # 平均带宽线和平均波动率线
     avg_bw = sum(bandwidths) / len(bandwidths)
-    plt.axhline(y=avg_bw, color='r', linestyle='--', alpha=0.5, label=f'Avg: {avg_bw:.2f} Gbps')
-    plt.legend()
-
-    # 波动率随时间变化
-    plt.subplot(2, 1, 2)
-    plt.plot(sample_points * 1000, sample_fluctuations, 'r-', linewidth=1, label='Fluctuation Rate')
-    plt.title('Fluctuation Rate over Time')
-    plt.xlabel('Time (ms)')
-    plt.ylabel('Fluctuation Rate')
-    plt.grid(True, linestyle='--', alpha=0.7)
-    plt.ylim(bottom=0)
-
-    # 添加平均波动率线
     avg_fluct = sum(sample_fluctuations) / len(sample_fluctuations)
-    plt.axhline(y=avg_fluct, color='b', linestyle='--', alpha=0.5, label=f'Avg: {avg_fluct:.2f}')
-    plt.legend()
-
-    # 突出显示三个关键时间区间
-    # key_intervals = [
-    #     (0.1, 5),    # 0.1ms-5ms
-    #     (40, 60),    # 40ms-60ms
-    #     (90, 100)    # 90ms-100ms
-    # ]
     key_intervals = [(start * 1000, end * 1000) for start, end in intervals]
 
-    colors = [
-        'lightblue',    # 浅蓝
-        'lightgreen',   # 浅绿
-        'lightsalmon',  # 浅橙红
-        'lightpink',    # 浅粉
-        'plum',         # 梅红
-        'peachpuff',    # 桃色
-        'paleturquoise',# 淡绿松石
-        'khaki',        # 卡其色
-        'bisque',       # 橘黄
-        'lavender',     # 薰衣草紫
-        'wheat',        # 小麦色
-        'palegreen',    # 淡绿
-        'powderblue',   # 粉蓝
-        'moccasin',     # 鹿皮色
-        'thistle',      # 蓟色
-        'lightyellow',  # 浅黄
-        'azure',        # 天蓝
-        'lemonchiffon', # 柠檬雪纺
-        'mistyrose',    # 玫瑰褐
-        'honeydew'      # 蜜瓜色
-    ]
-    alpha = 0.2
-
-    for (ax1, ax2) in [(plt.subplot(211), plt.subplot(212))]:
-        for i, (start, end) in enumerate(key_intervals):
-            ax1.axvspan(start, end, color=colors[i], alpha=alpha,
-                       label=f'Interval {i+1}: {start:.1f}-{end:.1f}ms')
-            ax2.axvspan(start, end, color=colors[i], alpha=alpha)
-        ax1.legend(loc='center left', bbox_to_anchor=(1, 0.5))
-        ax2.legend(loc='center left', bbox_to_anchor=(1, 0.5))
-
-    plt.tight_layout()
-    plt.savefig('bandwidth_fluctuation.png', dpi=300, bbox_inches='tight')
+    if show_plot:
+        import matplotlib.pyplot as plt
+        figure = plt.figure(figsize=(12, 8))
+        template = FigureTemplate(figure)
+    else:
+        if _template is None:
+            _template = FigureTemplate()
+        template = _template
+    template.render(sample_points * 1000, sample_bandwidths, sample_fluctuations, avg_bw, avg_fluct,
+                    key_intervals, dpi)
+    template.save(output, formats, dpi)
     if show_plot:
         plt.show()
-    plt.close()
+        plt.close(figure)
 
 def main():
     # 创建命令行参数解析器
     parser = argparse.ArgumentParser(description='带宽波动率分析')
     parser.add_argument('--no-show', action='store_true',
                       help='不显示图表界面')
+    parser.add_argument('--engine', choices=BANDWIDTH_ENGINES, default='numpy',
+                      help='时隙带宽计算引擎')
+    parser.add_argument('--no-cache', action='store_true',
+                      help='不读写 trace 的列式缓存')
+    parser.add_argument('--series', type=str, default=None,
+                      help='使用仿真内聚合的时隙序列 (AGG_OUTPUT_FILE) 代替 trace')
+    parser.add_argument('--format', nargs='+', choices=PLOT_FORMATS, default=['png'],
+                      help='图片格式, 可同时输出多种 (默认: png)')
+    parser.add_argument('--dpi', type=int, default=300,
+                      help='PNG 分辨率 (默认: 300)')
+    parser.add_argument('--batch', nargs='+', metavar='DIR', default=None,
+                      help='在同一个进程中依次处理多个结果目录, 复用同一个图模板 (隐含 --no-show)')
     args = parser.parse_args()
 
-    time_slots, bandwidths, intervals = calculate_score()
+    directories = args.batch or [None]
+    show_plot = not args.no_show and args.batch is None
+    original_dir = os.getcwd()
+    for directory in directories:
+        if directory is not None:
+            print(f"\n==== {directory} ====")
+            os.chdir(directory)
+        try:
+            time_slots, bandwidths, intervals = calculate_score(engine=args.engine, use_cache=not args.no_cache,
+                                                                series_path=args.series)
 
-    # 生成图表，根据no-show参数决定是否显示
-    plot_metrics(time_slots, bandwidths, intervals, show_plot=not args.no_show)
+            # 生成图表，根据no-show参数决定是否显示
+            plot_metrics(time_slots, bandwidths, intervals, show_plot=show_plot, formats=args.format, dpi=args.dpi)
+        finally:
+            os.chdir(original_dir)
 
 if __name__ == '__main__':
     main()
\ No newline at end of file
@@ -0,0 +1,349 @@
+"""QLEN_MON_FILE 的队列长度分布分析
+
+third.cc 的 monitor_buffer 每隔 qlen_mon_interval 对每个交换机端口的出队列长度采样一次,
+按 KB 分桶累计, 每隔 qlen_dump_interval 输出一次到目前为止的累计直方图:
+    time: <ns>
+    <switch> <port> <桶 0 的次数> <桶 1 的次数> ...
+桶 i 为队列长度 [i, i+1) KB; 各行的桶数随出现过的最大队列长度增长.
+
+iter_qlen_dumps 逐个 dump 流式解析为 (时间, 端口键, 端口 x 桶 的稠密数组);
+load_qlen 把全部 dump 拼成 (dump 时间 x 端口 x KB 桶) 的三维数组;
+QlenScan 只保留上一个 dump, 由相邻 dump 之差得到每个区间内的分布, 把各端口的平均队列长度
+和分位数逐区间交给 sink, 自身内存只与端口数和桶数有关, 不随运行时长增长.
+IntervalCsvWriter 逐区间把统计量写入 CSV, 同样不保留历史; HeatmapBuffer 为热力图保留逐区间的
+平均值, 列数超过 max_columns 时把相邻两列合并 (区间平均), 内存上限为 max_columns x 端口数.
+"""
+import os
+import csv
+import argparse
+import numpy as np
+
+# 每次读取的字节数
+CHUNK_BYTES = 16 << 20
+DUMP_HEADER = b'time:'
+PERCENTILES = (50, 99)
+
+
+def parse_qlen_dump(body, max_kb=None):
+    """解析一个 dump 的数据行, 返回 (keys, counts)
+
+    keys 为 (端口数, 2) 的 [switch, port]; counts 为 (端口数, 桶数) 的累计次数.
+    max_kb 不为 None 时超过 max_kb 的桶并入最后一个桶, 限制数组宽度.
+    """
+    lines = [line for line in body.split(b'\n') if line.strip()]
+    if not lines:
+        return np.zeros((0, 2), dtype=np.int64), np.zeros((0, 1), dtype=np.int64)
+    lengths = np.array([len(line.split()) for line in lines], dtype=np.int64)
+    values = np.array(b' '.join(lines).split(), dtype=np.int64)
+    starts = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+    keys = np.stack((values[starts], values[starts + 1]), axis=1)
+
+    buckets = lengths - 2
+    row = np.repeat(np.arange(len(lines)), buckets)
+    column = np.arange(len(values) - 2 * len(lines)) - np.repeat(np.cumsum(buckets) - buckets, buckets)
+    is_count = np.ones(len(values), dtype=bool)
+    is_count[starts] = False
+    is_count[starts + 1] = False
+    width = int(buckets.max()) if len(buckets) else 1
+    if max_kb is not None:
+        width = min(width, max_kb + 1)
+        column = np.minimum(column, width - 1)
+    counts = np.zeros((len(lines), max(width, 1)), dtype=np.int64)
+    np.add.at(counts, (row, column), values[is_count])
+    return keys, counts
+
+
+def iter_qlen_dumps(qlen_path, max_kb=None, chunk_bytes=CHUNK_BYTES):
+    """逐个产出 (time, keys, counts), 每次只在内存中保留一个 dump 的文本"""
+    with open(qlen_path, 'rb') as file:
+        buffer = b''
+        eof = False
+        while True:
+            start = buffer.find(DUMP_HEADER)
+            following = buffer.find(DUMP_HEADER, start + 1) if start >= 0 else -1
+            if following < 0 and not eof:
+                block = file.read(chunk_bytes)
+                if block:
+                    buffer += block
+                else:
+                    eof = True
+                continue
+            if start < 0:
+                return
+            end = following if following >= 0 else len(buffer)
+            header_end = buffer.find(b'\n', start)
+            if header_end < 0 or header_end > end:
+                header_end = end
+            time = int(buffer[start + len(DUMP_HEADER):header_end])
+            keys, counts = parse_qlen_dump(buffer[header_end:end], max_kb)
+            yield time, keys, counts
+            buffer = buffer[end:]
+            if following < 0:
+                return
+
+
+def _align(keys, counts, index):
+    """把一个 dump 的行按 index ({(switch, port): 行号}) 排列, 新出现的端口追加到 index"""
+    rows = np.empty(len(keys), dtype=np.int64)
+    for i, key in enumerate(map(tuple, keys.tolist())):
+        rows[i] = index.setdefault(key, len(index))
+    aligned = np.zeros((len(index), counts.shape[1]), dtype=counts.dtype)
+    aligned[rows] = counts
+    return aligned
+
+
+def _pad(counts, width):
+    if counts.shape[1] >= width:
+        return counts
+    return np.pad(counts, ((0, 0), (0, width - counts.shape[1])))
+
+
+def load_qlen(qlen_path, max_kb=None):
+    """返回 (times, keys, cube), cube[d, p, k] 为第 d 个 dump 时端口 p 落在 k KB 桶的累计次数"""
+    index = {}
+    times, dumps = [], []
+    for time, keys, counts in iter_qlen_dumps(qlen_path, max_kb):
+        times.append(time)
+        dumps.append(_align(keys, counts, index))
+    num_ports = len(index)
+    width = max((dump.shape[1] for dump in dumps), default=1)
+    cube = np.zeros((len(dumps), num_ports, width), dtype=np.int64)
+    for d, dump in enumerate(dumps):
+        cube[d, :dump.shape[0], :dump.shape[1]] = dump
+    keys = np.array(sorted(index, key=index.get), dtype=np.int64).reshape(-1, 2)
+    return np.array(times, dtype=np.int64), keys, cube
+
+
+def histogram_percentiles(counts, percentiles=PERCENTILES):
+    """各行直方图的分位数 (KB 桶下界), 返回 (行数, 分位数个数); 没有样本的行为 nan"""
+    total = counts.sum(axis=1)
+    cumulative = np.cumsum(counts, axis=1)
+    result = np.full((len(counts), len(percentiles)), np.nan)
+    valid = total > 0
+    for j, q in enumerate(percentiles):
+        # 第一个累计次数达到 q% 的桶
+        target = np.ceil(total[valid] * q / 100.0)
+        result[valid, j] = np.argmax(cumulative[valid] >= target[:, None], axis=1)
+    return result
+
+
+def histogram_mean(counts):
+    """各行直方图的平均队列长度 (按桶下界, KB); 没有样本的行为 nan"""
+    total = counts.sum(axis=1)
+    weighted = counts @ np.arange(counts.shape[1])
+    return np.divide(weighted, total, out=np.full(len(total), np.nan), where=total > 0)
+
+
+class QlenScan:
+    """逐 dump 计算区间分布的统计量, 只保留上一个 dump 的累计直方图
+
+    sinks 为可调用对象的列表, 每个区间调用一次 sink(time, keys, mean, percentiles):
+    time 为区间结束时间, keys 为到目前为止出现过的端口, mean 与 percentiles 为各端口的
+    区间平均值和分位数 (行与 keys 对应, 区间内没有样本的端口为 nan).
+    """
+    def __init__(self, percentiles=PERCENTILES, sinks=()):
+        self.percentiles = tuple(percentiles)
+        self.sinks = list(sinks)
+        self.index = {}
+        self.dumps = 0
+        self.previous = np.zeros((0, 1), dtype=np.int64)
+
+    def update(self, time, keys, counts):
+        current = _align(keys, counts, self.index)
+        width = max(current.shape[1], self.previous.shape[1])
+        current = _pad(current, width)
+        previous = np.zeros_like(current)
+        previous[:self.previous.shape[0], :self.previous.shape[1]] = self.previous
+        self.previous = current
+        self.dumps += 1
+        if not self.sinks:
+            return
+        interval = current - previous
+        mean = histogram_mean(interval)
+        percentiles = histogram_percentiles(interval, self.percentiles)
+        keys = self.keys
+        for sink in self.sinks:
+            sink(time, keys, mean, percentiles)
+
+    @property
+    def keys(self):
+        return np.array(sorted(self.index, key=self.index.get), dtype=np.int64).reshape(-1, 2)
+
+    @property
+    def total(self):
+        """最后一个 dump 的累计直方图, 即整个监控期间的分布"""
+        return self.previous
+
+    def hot_ports(self, top=20):
+        """按整个监控期间的 p99 (其次平均值) 从高到低排列的端口下标"""
+        total = self.total
+        p99 = histogram_percentiles(total, (99,))[:, 0]
+        mean = histogram_mean(total)
+        order = np.lexsort((-np.nan_to_num(mean, nan=-1), -np.nan_to_num(p99, nan=-1)))
+        return order[:top]
+
+
+class IntervalCsvWriter:
+    """QlenScan 的 sink: 每个 (区间, 端口) 一行, 区间结束时间, switch, port, 平均值与各分位数"""
+    def __init__(self, path, percentiles=PERCENTILES):
+        self.file = open(path, 'w', newline='')
+        self.writer = csv.writer(self.file)
+        self.writer.writerow(['time', 'switch', 'port', 'mean_kb'] + [f'p{q:g}_kb' for q in percentiles])
+
+    def __call__(self, time, keys, mean, percentiles):
+        for p in np.flatnonzero(~np.isnan(mean)):
+            self.writer.writerow([time, keys[p, 0], keys[p, 1], mean[p]] + percentiles[p].tolist())
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class HeatmapBuffer:
+    """QlenScan 的 sink: 为热力图保留逐区间各端口的平均队列长度
+
+    每列累计若干个相邻区间 (nan 不计入), 列数超过 max_columns 时相邻两列合并,
+    每列覆盖的区间数翻倍; 内存上限为 max_columns x 端口数, 与运行时长无关.
+    """
+    def __init__(self, max_columns=2000):
+        self.max_columns = max(1, max_columns)
+        self.stride = 1
+        self.times = []     # 每列最后一个区间的结束时间
+        self.sums = []
+        self.samples = []
+        self.filled = 0     # 最后一列已累计的区间数
+
+    def __call__(self, time, keys, mean, percentiles):
+        valid = ~np.isnan(mean)
+        if self.filled >= self.stride and len(self.times) >= self.max_columns:
+            self._merge()
+        if self.times and self.filled < self.stride:
+            self._accumulate(-1, np.where(valid, mean, 0.0), valid.astype(np.int64))
+            self.times[-1] = time
+            self.filled += 1
+            return
+        self.times.append(time)
+        self.sums.append(np.where(valid, mean, 0.0))
+        self.samples.append(valid.astype(np.int64))
+        self.filled = 1
+
+    def _accumulate(self, column, sums, samples):
+        width = max(len(self.sums[column]), len(sums))
+        self.sums[column] = _pad_row(self.sums[column], width) + _pad_row(sums, width)
+        self.samples[column] = _pad_row(self.samples[column], width) + _pad_row(samples, width)
+
+    def _merge(self):
+        """各列都已累计满时相邻两列合并为一列"""
+        times, sums, samples = [], [], []
+        for c in range(0, len(self.times), 2):
+            if c + 1 < len(self.times):
+                self._accumulate(c, self.sums[c + 1], self.samples[c + 1])
+            times.append(self.times[min(c + 1, len(self.times) - 1)])
+            sums.append(self.sums[c])
+            samples.append(self.samples[c])
+        # 奇数列时最后一列只含原来的一列, 之后的区间继续累计到这一列
+        self.filled = self.stride * (2 if len(self.times) % 2 == 0 else 1)
+        self.stride *= 2
+        self.times, self.sums, self.samples = times, sums, samples
+
+    def matrix(self, num_ports):
+        """(列数, 端口数) 的平均队列长度, 列内没有样本的端口补 nan"""
+        matrix = np.full((len(self.times), num_ports), np.nan)
+        for c, (sums, samples) in enumerate(zip(self.sums, self.samples)):
+            np.divide(sums, samples, out=matrix[c, :len(sums)], where=samples > 0)
+        return matrix
+
+
+def _pad_row(row, width):
+    return row if len(row) >= width else np.pad(row, (0, width - len(row)))
+
+
+def scan_qlen(qlen_path, max_kb=None, percentiles=PERCENTILES, sinks=()):
+    """流式读取 QLEN_MON_FILE 并返回填充好的 QlenScan, 逐区间的统计量交给 sinks"""
+    scan = QlenScan(percentiles, sinks)
+    for time, keys, counts in iter_qlen_dumps(qlen_path, max_kb):
+        scan.update(time, keys, counts)
+    return scan
+
+
+def print_hot_ports(scan, top=20):
+    keys, total = scan.keys, scan.total
+    print(f"Dumps: {scan.dumps}, ports: {len(keys)}, KB buckets: {total.shape[1]}")
+    if len(keys) == 0:
+        return
+    samples = total.sum(axis=1)
+    mean = histogram_mean(total)
+    percentiles = histogram_percentiles(total, (50, 99))
+    nonzero = total > 0
+    maximum = np.where(nonzero.any(axis=1), total.shape[1] - 1 - np.argmax(nonzero[:, ::-1], axis=1), 0)
+    print(f"\nTop {min(top, len(keys))} hot ports (by p99 queue length over the whole run):")
+    print(f"{'switch':>6} {'port':>5} {'samples':>10} {'mean(KB)':>9} {'p50(KB)':>8} {'p99(KB)':>8} {'max(KB)':>8}")
+    for p in scan.hot_ports(top):
+        print(f"{keys[p, 0]:>6} {keys[p, 1]:>5} {samples[p]:>10} {mean[p]:>9.2f} "
+              f"{percentiles[p, 0]:>8.0f} {percentiles[p, 1]:>8.0f} {maximum[p]:>8}")
+
+
+def plot_heatmap(heatmap, keys, path='qlen_heatmap.png', dpi=150):
+    """区间平均队列长度的热力图, 横轴为时间, 纵轴为端口 (按 switch, port 排序)"""
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    matrix = heatmap.matrix(len(keys))
+    order = np.lexsort((keys[:, 1], keys[:, 0]))
+    times = np.array(heatmap.times, dtype=np.float64) / 1e6
+
+    figure = Figure(figsize=(12, 8))
+    FigureCanvasAgg(figure)
+    ax = figure.add_subplot(1, 1, 1)
+    extent = (times[0], times[-1], len(keys), 0) if len(times) > 1 else None
+    image = ax.imshow(matrix[:, order].T, aspect='auto', interpolation='nearest', cmap='viridis', extent=extent)
+    figure.colorbar(image, ax=ax, label='Mean queue length (KB)')
+    ax.set_title('Egress Queue Length per Port')
+    ax.set_xlabel('Time (ms)')
+    ax.set_ylabel('Port (sorted by switch, port)')
+    figure.tight_layout()
+    figure.savefig(path, dpi=dpi)
+
+
+def read_config_QLEN_MON_FILE(config_path):
+    if not os.path.exists(config_path):
+        return None
+    with open(config_path, 'r') as file:
+        for line in file:
+            if line.startswith('QLEN_MON_FILE'):
+                return line.split()[1]
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Queue length distribution analysis of QLEN_MON_FILE')
+    parser.add_argument('--config', type=str, default='config.txt', help='Path to config file')
+    parser.add_argument('--qlen', type=str, default=None, help='Queue length file (default: QLEN_MON_FILE of the config)')
+    parser.add_argument('--max-kb', type=int, default=None, help='Merge buckets above this many KB into one')
+    parser.add_argument('--top', type=int, default=20, help='Number of hot ports to print (default: 20)')
+    parser.add_argument('--csv', type=str, default=None, help='Write per-interval, per-port statistics to this CSV file')
+    parser.add_argument('--heatmap', type=str, default=None, help='Save a heatmap of the per-interval mean queue length')
+    parser.add_argument('--heatmap-columns', type=int, default=2000,
+                        help='Merge adjacent intervals so the heatmap keeps at most this many columns (default: 2000)')
+    args = parser.parse_args()
+
+    qlen_path = args.qlen or read_config_QLEN_MON_FILE(args.config) or 'qlen.txt'
+    csv_writer = IntervalCsvWriter(args.csv) if args.csv else None
+    heatmap = HeatmapBuffer(args.heatmap_columns) if args.heatmap else None
+    sinks = [sink for sink in (csv_writer, heatmap) if sink is not None]
+    try:
+        scan = scan_qlen(qlen_path, args.max_kb, sinks=sinks)
+    finally:
+        if csv_writer is not None:
+            csv_writer.close()
+    print_hot_ports(scan, args.top)
+    if heatmap is not None:
+        plot_heatmap(heatmap, scan.keys, args.heatmap)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,294 @@
+"""按内容寻址的仿真结果缓存
+
+缓存键为以下内容的 sha256:
+    config.txt 中 third.cc 读取的各键 (空白与数值写法归一化, 同一个键以最后一次为准),
+    其中 TOPOLOGY_FILE / FLOW_FILE / TRACE_FILE 替换为所指文件内容的哈希;
+    仿真程序文件的哈希, LD_LIBRARY_PATH 中 ns-3 共享库 (libns3*.so) 的哈希,
+    以及其余命令行参数和环境变量.
+输出文件名 (TRACE_OUTPUT_FILE 等) 属于 config, 因此命中时缓存中的文件名与本次运行一致.
+
+运行成功后, 运行目录中除 config.txt 外的全部文件 (mix.tr 或其压缩/分片/二进制形式, fct/pfc/qlen,
+out.txt, 以及 .cols 列式缓存等派生文件) 存入 <cache>/objects/<键前两位>/<键>/.
+存入与命中时都以 reflink (支持的文件系统上) 或复制放置文件, 不使用硬链接: 仿真以 fopen("w")
+写输出, 会截断与缓存共享的 inode. 缓存中的文件设为只读, 放回运行目录的副本可写.
+每个条目的 manifest.json 的修改时间即最近使用时间, 超过容量上限时按最久未使用淘汰.
+"""
+import os
+import re
+import json
+import stat
+import time
+import shutil
+import hashlib
+import argparse
+from pathlib import Path
+
+# 值为输入文件路径的 config 键, 按文件内容参与缓存键
+INPUT_PATH_KEYS = ('TOPOLOGY_FILE', 'FLOW_FILE', 'TRACE_FILE')
+THIRD_CC = Path(__file__).parent / '../../scratch/third.cc'
+MANIFEST = 'manifest.json'
+HASH_CHUNK_BYTES = 1 << 20
+# 仿真程序动态加载的 ns-3 库, 按内容参与缓存键
+LIBRARY_PATTERN = re.compile(r'libns3.*\.so(\.|$)')
+# Linux 的 FICLONE ioctl, 在 btrfs/xfs 等文件系统上创建写时复制的副本
+FICLONE = 0x40049409
+
+_digests = {}
+
+
+def file_digest(path):
+    """文件内容的 sha256, 同一进程内按 (路径, 大小, 修改时间) 复用"""
+    stat = os.stat(path)
+    memo = (os.path.realpath(path), stat.st_size, stat.st_mtime_ns)
+    if memo not in _digests:
+        digest = hashlib.sha256()
+        with open(path, 'rb') as file:
+            for block in iter(lambda: file.read(HASH_CHUNK_BYTES), b''):
+                digest.update(block)
+        _digests[memo] = digest.hexdigest()
+    return _digests[memo]
+
+
+def third_cc_keys(source=THIRD_CC):
+    """third.cc 读取的 config 键; 找不到源文件时返回 None, 即保留所有键"""
+    try:
+        with open(source, 'r') as file:
+            return frozenset(re.findall(r'key\.compare\("([A-Z0-9_]+)"\)', file.read()))
+    except OSError:
+        return None
+
+
+def _normalize_token(token):
+    try:
+        return repr(float(token))
+    except ValueError:
+        return token
+
+
+def normalize_config(directory, config_name='config.txt', keys=None):
+    """config 的归一化形式 {键: [取值, ...]}, 输入文件以 sha256:<哈希> 表示"""
+    entries = {}
+    with open(os.path.join(directory, config_name), 'r') as file:
+        for line in file:
+            parts = line.split()
+            if not parts or (keys is not None and parts[0] not in keys):
+                continue
+            key, values = parts[0], parts[1:]
+            if key in INPUT_PATH_KEYS and values:
+                values = ['sha256:' + file_digest(os.path.join(directory, values[0]))]
+            else:
+                values = [_normalize_token(value) for value in values]
+            entries[key] = values
+    return dict(sorted(entries.items()))
+
+
+def resolve_program(directory, program):
+    """命令的第一个参数对应的文件, 与 subprocess 在运行目录中的查找方式一致"""
+    if os.sep in program or (os.altsep and os.altsep in program):
+        return os.path.normpath(os.path.join(directory, program))
+    return shutil.which(program)
+
+
+def library_digests(directory, env=None):
+    """LD_LIBRARY_PATH (env 中没有时取当前进程的) 中 ns-3 共享库的 {文件名: sha256}
+
+    相对路径相对于运行目录, 与动态链接器在运行目录中的解释一致; 同名库以先出现的目录为准.
+    """
+    search = (env or {}).get('LD_LIBRARY_PATH', os.environ.get('LD_LIBRARY_PATH', ''))
+    digests = {}
+    for entry in search.split(os.pathsep):
+        if not entry:
+            continue
+        folder = os.path.join(directory, entry)
+        try:
+            names = sorted(os.listdir(folder))
+        except OSError:
+            continue
+        for name in names:
+            path = os.path.join(folder, name)
+            if name not in digests and LIBRARY_PATTERN.match(name) and os.path.isfile(path):
+                digests[name] = file_digest(path)
+    return digests
+
+
+def reflink(src, dst):
+    import fcntl
+    with open(src, 'rb') as source, open(dst, 'wb') as target:
+        try:
+            fcntl.ioctl(target.fileno(), FICLONE, source.fileno())
+            return
+        except OSError:
+            pass
+    os.unlink(dst)
+    raise OSError(f'reflink not supported for {dst}')
+
+
+def link_file(src, dst, read_only=False):
+    """把 src 放到 dst: 先尝试 reflink, 不支持时复制; 返回所用的方式
+
+    dst 与 src 不共享 inode; read_only 为真时 dst 设为只读, 否则保证 dst 可写.
+    """
+    if os.path.lexists(dst):
+        os.unlink(dst)
+    try:
+        reflink(src, dst)
+        method = 'reflink'
+    except (ImportError, OSError):
+        shutil.copy2(src, dst)
+        method = 'copy'
+    mode = stat.S_IMODE(os.stat(dst).st_mode)
+    if read_only:
+        os.chmod(dst, mode & ~(stat.S_IWUSR | stat.S_IWGRP | stat.S_IWOTH))
+    elif not mode & stat.S_IWUSR:
+        os.chmod(dst, mode | stat.S_IWUSR)
+    return method
+
+
+def output_files(directory, exclude=('config.txt',)):
+    """运行目录中除 exclude 外的全部文件, 返回相对路径列表"""
+    files = []
+    for parent, _, names in os.walk(directory):
+        for name in names:
+            path = os.path.relpath(os.path.join(parent, name), directory)
+            if path not in exclude:
+                files.append(path)
+    return sorted(files)
+
+
+class ResultCache:
+    """<root>/objects/ 下按缓存键存放的仿真输出"""
+    def __init__(self, root, max_bytes=None):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.keys = third_cc_keys()
+        os.makedirs(os.path.join(root, 'objects'), exist_ok=True)
+        os.makedirs(os.path.join(root, 'tmp'), exist_ok=True)
+        if max_bytes is not None:
+            self.prune(max_bytes)
+
+    def key(self, directory, command, env=None):
+        """运行的缓存键; 输入文件或程序不存在时返回 None (不缓存)"""
+        try:
+            config = normalize_config(directory, command[-1], self.keys)
+            program = resolve_program(directory, command[0])
+            if program is None:
+                return None
+            description = {
+                'config': config,
+                'program': file_digest(program),
+                'libraries': library_digests(directory, env),
+                'arguments': list(command[1:-1]),
+                'env': dict(sorted((env or {}).items())),
+            }
+        except OSError:
+            return None
+        return hashlib.sha256(json.dumps(description, sort_keys=True).encode()).hexdigest()
+
+    def entry_path(self, key):
+        return os.path.join(self.root, 'objects', key[:2], key)
+
+    def lookup(self, key):
+        """命中时返回条目的 manifest 并刷新其最近使用时间, 否则返回 None"""
+        manifest = os.path.join(self.entry_path(key), MANIFEST)
+        try:
+            with open(manifest, 'r') as file:
+                entry = json.load(file)
+        except (OSError, ValueError):
+            return None
+        os.utime(manifest)
+        return entry
+
+    def restore(self, key, directory):
+        """把缓存的输出放回运行目录, 返回是否命中"""
+        entry = self.lookup(key)
+        if entry is None:
+            return False
+        for path in entry['files']:
+            target = os.path.join(directory, path)
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            link_file(os.path.join(self.entry_path(key), 'files', path), target)
+        return True
+
+    def store(self, key, directory):
+        """把运行目录的输出存为 key 的条目, 已存在时不覆盖"""
+        final = self.entry_path(key)
+        if os.path.exists(final):
+            return
+        staging = os.path.join(self.root, 'tmp', f'{key}.{os.getpid()}')
+        shutil.rmtree(staging, ignore_errors=True)
+        files = output_files(directory)
+        size = 0
+        for path in files:
+            target = os.path.join(staging, 'files', path)
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            link_file(os.path.join(directory, path), target, read_only=True)
+            size += os.path.getsize(target)
+        with open(os.path.join(staging, MANIFEST), 'w') as file:
+            json.dump({'key': key, 'source': os.path.abspath(directory), 'files': files, 'size': size,
+                       'created': time.time()}, file, indent=2)
+        os.makedirs(os.path.dirname(final), exist_ok=True)
+        try:
+            os.rename(staging, final)
+        except OSError:
+            # 其他进程已存入同一个键
+            shutil.rmtree(staging, ignore_errors=True)
+        if self.max_bytes is not None:
+            self.prune(self.max_bytes)
+
+    def entries(self):
+        """[(键, 大小, 最近使用时间)], 按最近使用时间从旧到新排列"""
+        entries = []
+        objects = os.path.join(self.root, 'objects')
+        for prefix in os.listdir(objects):
+            for key in os.listdir(os.path.join(objects, prefix)):
+                manifest = os.path.join(objects, prefix, key, MANIFEST)
+                try:
+                    with open(manifest, 'r') as file:
+                        size = json.load(file)['size']
+                    entries.append((key, size, os.path.getmtime(manifest)))
+                except (OSError, ValueError, KeyError):
+                    continue
+        return sorted(entries, key=lambda entry: entry[2])
+
+    def prune(self, max_bytes):
+        """按最久未使用淘汰条目直到总大小不超过 max_bytes, 返回淘汰的键"""
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        removed = []
+        for key, size, _ in entries:
+            if total <= max_bytes:
+                break
+            shutil.rmtree(self.entry_path(key), ignore_errors=True)
+            total -= size
+            removed.append(key)
+        return removed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Inspect and prune the simulation result cache')
+    parser.add_argument('action', choices=['list', 'key', 'prune'], help='list entries, print keys of run directories, or prune')
+    parser.add_argument('directories', nargs='*', help='Run directories for the key action')
+    parser.add_argument('--cache', type=str, default='result-cache', help='Cache directory (default: result-cache)')
+    parser.add_argument('--command', type=str, nargs='+', default=['../../../build/scratch/third'],
+                        help='Simulator command as run inside the run directory (default: ../../../build/scratch/third)')
+    parser.add_argument('--max-size', type=float, default=None, help='Size cap in GB for the prune action')
+    args = parser.parse_args()
+
+    cache = ResultCache(args.cache)
+    if args.action == 'list':
+        entries = cache.entries()
+        for key, size, used in entries:
+            print(f"{key}  {size / 1e9:10.3f} GB  last used {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(used))}")
+        print(f"{len(entries)} entries, {sum(size for _, size, _ in entries) / 1e9:.3f} GB")
+    elif args.action == 'key':
+        for directory in args.directories:
+            print(f"{cache.key(directory, args.command + ['config.txt'])}  {directory}")
+    else:
+        if args.max_size is None:
+            parser.error('prune needs --max-size')
+        removed = cache.prune(int(args.max_size * 1e9))
+        print(f"Removed {len(removed)} entries")
+
+
+if __name__ == '__main__':
+    main()
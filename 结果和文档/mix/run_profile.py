@@ -0,0 +1,237 @@
+"""仿真运行的资源画像与按配置汇总
+
+每个运行的画像 (profile) 包含:
+    wall_time / cpu_time / cpu_util   墙钟时间, 用户态 + 内核态 CPU 时间 (wait4 的 rusage) 及其比值
+    max_rss_mb                        峰值 RSS (ru_maxrss, 没有 rusage 时为 None)
+    trace_bytes / trace_mb_per_s      TRACE_OUTPUT_FILE (含压缩/二进制形式与分片) 的大小与每秒写入量
+    output_bytes                      运行目录中除 config.txt 外全部输出的大小
+    sim_time / events / event_rate    third.cc 在 out.txt 中最后一行 PROGRESS/DONE 给出的仿真时间,
+                                      已执行事件数与平均事件速率
+    sim_wall_ratio                    仿真时间 / 墙钟时间
+以及用于分组的配置维度: PACKET_PAYLOAD_SIZE (MTU), 流数, CC_MODE 等.
+
+sweep.py 在每个运行结束后计算画像并记入 job_journal; 本脚本从日志 (或直接从运行目录的
+out.txt, 此时没有 CPU 时间与 RSS) 读取画像, 按配置维度分组输出汇总表, 找出开销最大的配置.
+"""
+import os
+import csv
+import json
+import argparse
+from collections import OrderedDict
+
+# 默认的分组维度; flows 为 FLOW_FILE 第一行的流数
+DEFAULT_DIMENSIONS = ('PACKET_PAYLOAD_SIZE', 'flows', 'CC_MODE')
+PROFILE_FIELDS = ('wall_time', 'cpu_time', 'cpu_util', 'max_rss_mb', 'trace_bytes', 'trace_mb_per_s',
+                  'output_bytes', 'sim_time', 'events', 'event_rate', 'sim_wall_ratio')
+# 汇总表中各指标的聚合方式
+SUMMARY_FIELDS = (
+    ('wall_time', 'mean'), ('wall_time', 'max'), ('cpu_time', 'mean'), ('max_rss_mb', 'max'),
+    ('trace_mb_per_s', 'mean'), ('event_rate', 'mean'), ('sim_wall_ratio', 'mean'),
+)
+
+
+def read_config(directory, config_name='config.txt'):
+    """{键: 取值字符串}, 同一个键以最后一次为准"""
+    values = {}
+    try:
+        with open(os.path.join(directory, config_name), 'r') as file:
+            for line in file:
+                parts = line.split(None, 1)
+                if len(parts) == 2:
+                    values[parts[0]] = parts[1].strip()
+    except OSError:
+        pass
+    return values
+
+
+def config_dimensions(directory, config=None, keys=DEFAULT_DIMENSIONS):
+    """运行的配置维度 {维度: 取值}, flows 从 FLOW_FILE 读取"""
+    config = read_config(directory) if config is None else config
+    dimensions = {}
+    for key in keys:
+        if key == 'flows':
+            try:
+                with open(os.path.join(directory, config.get('FLOW_FILE', '')), 'r') as file:
+                    dimensions[key] = file.readline().split()[0]
+            except (OSError, IndexError):
+                dimensions[key] = None
+        else:
+            dimensions[key] = config.get(key)
+    return dimensions
+
+
+def parse_progress(out_path):
+    """out.txt 中最后一行 PROGRESS 或 DONE 的 (仿真时间 s, 事件数, 仿真进程墙钟时间 s); 没有时返回 None"""
+    last = None
+    try:
+        with open(out_path, 'r', errors='replace') as file:
+            for line in file:
+                if line.startswith('PROGRESS ') or line.startswith('DONE '):
+                    last = line
+    except OSError:
+        return None
+    if last is None:
+        return None
+    parts = last.split()
+    try:
+        return float(parts[parts.index('sim') + 1]), int(parts[parts.index('events') + 1]), \
+            float(parts[parts.index('wall') + 1])
+    except (ValueError, IndexError):
+        return None
+
+
+def trace_outputs(directory, config=None):
+    """TRACE_OUTPUT_FILE 的全部输出文件 (压缩/二进制形式与 mix.0000.tr 等分片), 相对于运行目录的路径"""
+    config = read_config(directory) if config is None else config
+    name = config.get('TRACE_OUTPUT_FILE')
+    if not name:
+        return []
+    from trace_stream import trace_files
+    return [os.path.relpath(path, directory) for path in trace_files(os.path.join(directory, name))]
+
+
+def trace_bytes(directory, config):
+    """TRACE_OUTPUT_FILE 的全部输出文件的总大小, 见 trace_outputs"""
+    return sum(os.path.getsize(os.path.join(directory, path)) for path in trace_outputs(directory, config))
+
+
+def output_bytes(directory, exclude=('config.txt',)):
+    total = 0
+    for parent, _, names in os.walk(directory):
+        for name in names:
+            if os.path.relpath(os.path.join(parent, name), directory) not in exclude:
+                total += os.path.getsize(os.path.join(parent, name))
+    return total
+
+
+def _ratio(numerator, denominator):
+    if numerator is None or not denominator:
+        return None
+    return numerator / denominator
+
+
+def profile_run(directory, wall_time=None, usage=None):
+    """运行目录的资源画像; usage 为 wait4 返回的 rusage, wall_time 为空时取 out.txt 中仿真自报的墙钟时间"""
+    config = read_config(directory)
+    progress = parse_progress(os.path.join(directory, 'out.txt'))
+    sim_time, events, sim_wall = progress if progress is not None else (None, None, None)
+    if wall_time is None:
+        wall_time = sim_wall
+    cpu_time = usage.ru_utime + usage.ru_stime if usage is not None else None
+    # Linux 上 ru_maxrss 的单位为 KB
+    max_rss_mb = usage.ru_maxrss / 1024 if usage is not None else None
+    trace = trace_bytes(directory, config)
+    profile = {
+        'wall_time': wall_time,
+        'cpu_time': cpu_time,
+        'cpu_util': _ratio(cpu_time, wall_time),
+        'max_rss_mb': max_rss_mb,
+        'trace_bytes': trace,
+        'trace_mb_per_s': _ratio(trace / 1e6, wall_time),
+        'output_bytes': output_bytes(directory),
+        'sim_time': sim_time,
+        'events': events,
+        # 事件速率以仿真进程自己计时的 Simulator::Run 时间为分母, 不含建拓扑与算路由
+        'event_rate': _ratio(events, sim_wall),
+        'sim_wall_ratio': _ratio(sim_time, wall_time),
+    }
+    profile['config'] = config_dimensions(directory, config)
+    return profile
+
+
+def load_profiles(journal_path):
+    """[(运行目录, 画像)]: 日志中每个目录最后一条带画像的完成记录"""
+    from job_journal import JobJournal
+    journal = JobJournal(journal_path)
+    profiles = []
+    for key, entry in sorted(journal.load().items()):
+        if entry['state'] == 'done' and entry.get('profile'):
+            profiles.append((os.path.join(journal.base, key), entry['profile']))
+    return profiles
+
+
+def summarize(profiles, dimensions=DEFAULT_DIMENSIONS):
+    """按 dimensions 分组汇总画像, 返回按平均墙钟时间从大到小排列的行"""
+    groups = OrderedDict()
+    for directory, profile in profiles:
+        config = profile.get('config') or {}
+        if any(key not in config for key in dimensions):
+            config = dict(config, **config_dimensions(directory, keys=dimensions))
+        groups.setdefault(tuple(config.get(key) for key in dimensions), []).append(profile)
+    rows = []
+    for values, members in groups.items():
+        row = OrderedDict(zip(dimensions, values))
+        row['runs'] = len(members)
+        for field, how in SUMMARY_FIELDS:
+            column = field if field.startswith(how + '_') else f'{how}_{field}'
+            samples = [member[field] for member in members if member.get(field) is not None]
+            if not samples:
+                row[column] = None
+            elif how == 'max':
+                row[column] = max(samples)
+            else:
+                row[column] = sum(samples) / len(samples)
+        rows.append(row)
+    return sorted(rows, key=lambda row: -(row['mean_wall_time'] or 0))
+
+
+def _format_cell(value):
+    if value is None:
+        return '-'
+    if isinstance(value, float):
+        return f'{value:.3g}' if abs(value) < 1000 else f'{value:.0f}'
+    return str(value)
+
+
+def format_table(rows):
+    if not rows:
+        return 'No profiled runs'
+    columns = list(rows[0])
+    cells = [[_format_cell(row[column]) for column in columns] for row in rows]
+    widths = [max(len(column), *(len(line[i]) for line in cells)) for i, column in enumerate(columns)]
+    lines = ['  '.join(column.rjust(width) for column, width in zip(columns, widths))]
+    lines.extend('  '.join(cell.rjust(width) for cell, width in zip(line, widths)) for line in cells)
+    return '\n'.join(lines)
+
+
+def write_summary(rows, path):
+    """汇总表写为 CSV, 扩展名为 .json 时写为 JSON"""
+    if path.endswith('.json'):
+        with open(path, 'w') as file:
+            json.dump(rows, file, indent=2)
+        return
+    with open(path, 'w', newline='') as file:
+        if rows:
+            writer = csv.DictWriter(file, fieldnames=list(rows[0]))
+            writer.writeheader()
+            writer.writerows(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Summarize the resource profiles of simulation runs by config')
+    parser.add_argument('sources', nargs='+',
+                        help='Job journals (.jsonl) written by sweep.py, or run directories to profile from their out.txt')
+    parser.add_argument('--by', nargs='+', default=list(DEFAULT_DIMENSIONS),
+                        help=f"Config keys to group by, 'flows' is the flow count (default: {' '.join(DEFAULT_DIMENSIONS)})")
+    parser.add_argument('--runs', action='store_true', help='Also print the profile of every run')
+    parser.add_argument('--output', type=str, default=None, help='Write the summary table to this .csv or .json file')
+    args = parser.parse_args()
+
+    profiles = []
+    for source in args.sources:
+        if os.path.isdir(source):
+            profiles.append((source, profile_run(source)))
+        else:
+            profiles.extend(load_profiles(source))
+    if args.runs:
+        for directory, profile in profiles:
+            print(f"{os.path.relpath(directory)}: " + ', '.join(
+                f'{field}={_format_cell(profile.get(field))}' for field in PROFILE_FIELDS))
+    rows = summarize(profiles, args.by)
+    print(format_table(rows))
+    if args.output:
+        write_summary(rows, args.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,11 +1,18 @@
 import sys
+import time
 import argparse
+import numpy as np
 from pathlib import Path
+from trace_stream import iter_trace_columns, scan_trace, scan_series, resolve_trace_path, SlotCounter, TraceFollower
+from score_spec import named_spec, spec_windows, theoretical_bandwidth
 
 # 修正相对路径
 from pathlib import Path
 file_dir = Path(__file__).parent
 
+# 时隙宽度, 头部开销, 时隙口径, 理论带宽与采样区间均取自 score_spec.json 中的这个规格
+SCORE_SPEC = 'score_calculator'
+
 def read_config_PACKET_PAYLOAD_SIZE(config_path):
     """读取配置文件"""
     with open(config_path, 'r') as file:
@@ -28,21 +35,17 @@ def read_flow_SIZE(flow_path):
         return int(first_line.split()[0])
     return None
 
-def read_trace(trace_path):
+def read_trace(trace_path, use_cache=True):
     """读取跟踪文件"""
     timestamps = []
     sequence_numbers = []
-    with open(trace_path, 'r') as file:
-        for line in file:
-            parts = line.split()
-            if len(parts) < 7:
-                continue
-            timestamps.append(float(parts[0]))
-            sequence_numbers.append(int(parts[5]))
+    for chunk in iter_trace_columns(trace_path, ('time', 'seq'), use_cache):
+        timestamps.extend(chunk['time'].tolist())
+        sequence_numbers.extend(chunk['seq'].tolist())
     return timestamps, sequence_numbers
 
-def calculate_bandwidths(timestamps, packet_size, time_slot_duration=1e-4):
-    """计算每个时隙的带宽"""
+def calculate_bandwidths(timestamps, packet_size, time_slot_duration=1e-4, carry=True, include_last=True):
+    """计算每个时隙的带宽, carry / include_last 的含义见 calculate_bandwidths_numpy"""
     time_slots = []
     bandwidths = []
     current_slot_start = timestamps[0]
@@ -59,34 +62,115 @@ def calculate_bandwidths(timestamps, packet_size, time_slot_duration=1e-4):
 
             # 移动到下一个时隙
             current_slot_start += time_slot_duration
-            current_slot_packets = 1
+            current_slot_packets = 1 if carry else 0
 
     # 处理最后一个时隙
-    if current_slot_packets > 0:
+    if include_last and current_slot_packets > 0:
         throughput = (current_slot_packets * packet_size * 8) / time_slot_duration / 1e9
         time_slots.append(current_slot_start)
         bandwidths.append(throughput)
 
     return time_slots, bandwidths
 
-def calculate_interval_metrics(time_slots, bandwidths, start_time, end_time):
-    """计算指定时间区间的指标"""
-    try:
-        start_index = next(i for i, t in enumerate(time_slots) if t >= start_time)
-        end_index = next(i for i, t in enumerate(time_slots) if t >= end_time)
-
-        specified_bandwidths = bandwidths[start_index:end_index]
-        if not specified_bandwidths:
+def calculate_bandwidths_numpy(timestamps, packet_size, time_slot_duration=1e-4, carry=True, include_last=True):
+    """calculate_bandwidths 的 NumPy 向量化版本, 返回 (time_slots, bandwidths) 两个 ndarray
+
+    与逐包循环的结果逐位一致, 推导见 trace_stream.SlotCounter.
+    carry: 触发换槽的包是否计入新时隙 (score_calculator 为 True, gen_result.py 为 False)
+    include_last: 是否输出最后一个未关闭的时隙 (gen_result.py 为 False)
+    """
+    ts = np.asarray(timestamps, dtype=np.float64)
+    if len(ts) == 0:
+        raise IndexError('empty trace')
+    counter = SlotCounter(time_slot_duration)
+    counter.update(ts)
+    return counter.result(packet_size, carry, include_last)
+
+BANDWIDTH_ENGINES = {
+    'python': calculate_bandwidths,
+    'numpy': calculate_bandwidths_numpy,
+}
+
+class SlotIndex:
+    """时隙序列上的区间查询索引
+
+    区间边界通过对有序的 time_slots 二分查找定位 (O(log n)),
+    批量窗口 (window_metrics) 的均值由前缀和得到, 最值由稀疏表得到 (均为 O(1)),
+    边界语义与原先的 next(i for i, t in enumerate(time_slots) if t >= ...) 一致.
+    """
+    def __init__(self, time_slots, bandwidths):
+        self.time_slots = np.asarray(time_slots, dtype=np.float64)
+        self.bandwidths = np.asarray(bandwidths, dtype=np.float64)
+        self.prefix = np.concatenate(([0.0], np.cumsum(self.bandwidths)))
+        self.max_table = self._build_sparse_table(self.bandwidths, np.maximum)
+        self.min_table = self._build_sparse_table(self.bandwidths, np.minimum)
+
+    @staticmethod
+    def _build_sparse_table(values, op):
+        """table[l, i] 为 values[i:i + 2**l] 的最值, 仅 i <= n - 2**l 的部分有效"""
+        n = len(values)
+        levels = max(n, 1).bit_length()
+        table = np.empty((levels, n), dtype=np.float64)
+        table[0] = values
+        for level in range(1, levels):
+            half = 1 << (level - 1)
+            valid = n - (1 << level) + 1
+            table[level, :valid] = op(table[level - 1, :valid], table[level - 1, half:half + valid])
+        return table
+
+    def locate(self, start_times, end_times):
+        """返回区间在时隙数组中的 [start_index, end_index) 以及是否找到边界"""
+        start_index = np.searchsorted(self.time_slots, start_times, side='left')
+        end_index = np.searchsorted(self.time_slots, end_times, side='left')
+        n = len(self.time_slots)
+        found = (start_index < n) & (end_index < n)
+        return start_index, end_index, found
+
+    def range_metrics(self, start_index, end_index):
+        """批量计算 [start_index, end_index) 的均值/最大值/最小值, 要求区间非空"""
+        length = end_index - start_index
+        average = (self.prefix[end_index] - self.prefix[start_index]) / length
+        level = np.frexp(length)[1] - 1
+        tail = end_index - (1 << level)
+        maximum = np.maximum(self.max_table[level, start_index], self.max_table[level, tail])
+        minimum = np.minimum(self.min_table[level, start_index], self.min_table[level, tail])
+        return average, maximum, minimum
+
+    def window_metrics(self, start_times, end_times):
+        """批量计算多个时间窗口的平均带宽和波动率, 空窗口或均值为 0 的窗口记为 (0, 0)"""
+        start_times = np.atleast_1d(np.asarray(start_times, dtype=np.float64))
+        end_times = np.broadcast_to(np.asarray(end_times, dtype=np.float64), start_times.shape)
+        start_index, end_index, found = self.locate(start_times, end_times)
+        valid = found & (end_index > start_index)
+
+        averages = np.zeros(len(start_times))
+        fluctuations = np.zeros(len(start_times))
+        if np.any(valid):
+            average, maximum, minimum = self.range_metrics(start_index[valid], end_index[valid])
+            nonzero = average != 0
+            averages[valid] = np.where(nonzero, average, 0)
+            fluctuations[valid] = np.where(nonzero, (maximum - minimum) / np.where(nonzero, average, 1), 0)
+        return averages, fluctuations
+
+    def interval_metrics(self, start_time, end_time):
+        """计算单个时间区间的平均带宽和波动率
+
+        评分区间只有几个, 按原先的 sum(切片) / len 逐项求和, 与原实现逐位一致;
+        前缀和的差在末位可能有约 1e-15 的相对误差, 只用于 window_metrics 的批量窗口.
+        """
+        start_index, end_index, found = self.locate(start_time, end_time)
+        if not found or end_index <= start_index:
             return 0, 0
-
+        specified_bandwidths = self.bandwidths[start_index:end_index].tolist()
         average_bandwidth = sum(specified_bandwidths) / len(specified_bandwidths)
-        max_bandwidth = max(specified_bandwidths)
-        min_bandwidth = min(specified_bandwidths)
-        fluctuation_rate = (max_bandwidth - min_bandwidth) / average_bandwidth
-
+        fluctuation_rate = (max(specified_bandwidths) - min(specified_bandwidths)) / average_bandwidth
         return average_bandwidth, fluctuation_rate
-    except StopIteration:
-        return 0, 0
+
+def calculate_interval_metrics(time_slots, bandwidths, start_time, end_time, index=None):
+    """计算指定时间区间的指标, 多次查询时传入同一个 SlotIndex 以复用索引"""
+    if index is None:
+        index = SlotIndex(time_slots, bandwidths)
+    return index.interval_metrics(start_time, end_time)
 
 # def get_intervals(timestamps, origin_6400 = False):
 #     """根据trace文件的行数确定时间区间"""
@@ -109,9 +193,11 @@ def calculate_interval_metrics(time_slots, bandwidths, start_time, end_time):
 #             (max_time * 0.75, max_time * 0.833)    # 约对应 90ms-100ms
 #         ]
 
-def get_intervals(timestamps, origin_6400 = False):
-    """根据trace文件的时间戳确定采样区间"""
-    max_time = timestamps[-1]
+def get_intervals(max_time, origin_6400 = False, exponent = 0.8):
+    """根据trace文件的最后一个时间戳确定采样区间, exponent < 1 时后期区间更密集
+
+    评分时 exponent 取自 score_spec.json 中 score_calculator 规格的 adaptive 窗口.
+    """
 
     if origin_6400:  # 原始6400行数据的硬编码情况
         return [
@@ -139,7 +225,7 @@ def get_intervals(timestamps, origin_6400 = False):
         # 在整个时间范围内均匀分布区间，但后半段区间更密集
         for i in range(num_intervals):
             # 使用非线性分布，让后面的区间更密集
-            progress = (i / (num_intervals - 1)) ** 0.8  # 指数0.8使得后期区间更密集
+            progress = (i / (num_intervals - 1)) ** exponent  # 指数0.8使得后期区间更密集
             start_time = max_time * progress
             end_time = start_time + interval_size
 
@@ -151,40 +237,54 @@ def get_intervals(timestamps, origin_6400 = False):
                 intervals.append((start_time, end_time))
 
         return intervals
-def calculate_score(config_path = 'config.txt', trace_path = 'mix.tr'):
-    # 读取配置和数据
-    packet_payload_size = read_config_PACKET_PAYLOAD_SIZE(config_path)
-    packet_size = packet_payload_size + 18
-    timestamps, sequence_numbers = read_trace(trace_path)
-
-    # 计算带宽
-    time_slots, bandwidths = calculate_bandwidths(timestamps, packet_size)
+def counter_bandwidths(counter, packet_payload_size, spec=None):
+    """按规格的头部开销与时隙口径, 由 SlotCounter 得到 (time_slots, bandwidths)"""
+    spec = spec or named_spec(SCORE_SPEC)
+    return counter.result(packet_payload_size + spec['header_bytes'], spec['carry'], spec['include_last'])
+
+def score_bandwidths(time_slots, bandwidths, completion_time, origin_6400=False, config_path='config.txt'):
+    """由时隙带宽计算各采样区间的指标与最终得分"""
+    spec = named_spec(SCORE_SPEC)
     average_bandwidth = sum(bandwidths) / len(bandwidths)
 
-    # 根据行数获取适当的时间区间
-    intervals = get_intervals(timestamps, read_flow_SIZE(read_config_FLOW_FILE(config_path)) == 6400)
+    # 根据行数获取适当的时间区间, 窗口定义见 score_spec.json
+    intervals, weights = spec_windows(spec, completion_time, origin_6400)
 
     # 存储每个区间的结果
     results = {}
+    index = SlotIndex(time_slots, bandwidths)
     for i, (start_time, end_time) in enumerate(intervals, 1):
-        avg_bw, fluct = calculate_interval_metrics(time_slots, bandwidths, start_time, end_time)
+        avg_bw, fluct = calculate_interval_metrics(time_slots, bandwidths, start_time, end_time, index)
         results[f'interval_{i}'] = {
             'average_bandwidth': avg_bw,
             'fluctuation_rate': fluct
         }
 
     # 计算最终得分
-    theoretical_bandwidth = 8 * 12 * 25
-    bandwidth_utilization = average_bandwidth / theoretical_bandwidth
+    bandwidth_utilization = average_bandwidth / theoretical_bandwidth(spec, config_path)
 
     num_intervals = len(intervals)
-    total_fluctuation = sum(results[f'interval_{i}']['fluctuation_rate'] for i in range(1, num_intervals + 1)) / num_intervals
+    fluctuation_rates = [results[f'interval_{i}']['fluctuation_rate'] for i in range(1, num_intervals + 1)]
+    if all(weight == 1.0 / num_intervals for weight in weights):
+        # 等权时按原先的 sum / n 计算, 保证结果逐位不变
+        total_fluctuation = sum(fluctuation_rates) / num_intervals
+    else:
+        total_fluctuation = sum(weight * rate for weight, rate in zip(weights, fluctuation_rates))
 
     final_score = (bandwidth_utilization - total_fluctuation) * 100
-
-    # 输出结果
+    return {
+        'completion_time': completion_time,
+        'average_bandwidth': average_bandwidth,
+        'intervals': intervals,
+        'results': results,
+        'bandwidth_utilization': bandwidth_utilization,
+        'final_score': final_score,
+    }
+
+def print_score(score, packet_payload_size):
+    intervals, results = score['intervals'], score['results']
     print(f"The value of PACKET_PAYLOAD_SIZE is: {packet_payload_size}")
-    print(f"Average Bandwidth: {average_bandwidth:.6f} Gbps")
+    print(f"Average Bandwidth: {score['average_bandwidth']:.6f} Gbps")
 
     for i in range(1, len(intervals) + 1):
         interval = results[f'interval_{i}']
@@ -193,29 +293,125 @@ def calculate_score(config_path = 'config.txt', trace_path = 'mix.tr'):
         print(f"Fluctuation Rate from {intervals[i-1][0]:.6f} s to {intervals[i-1][1]:.6f} s: "
               f"{interval['fluctuation_rate']:.6f}")
 
-    print(f"\nBandwidth Utilization: {bandwidth_utilization:.6f}")
-    print(f"Final Score: {final_score:.2f}")
+    print(f"\nBandwidth Utilization: {score['bandwidth_utilization']:.6f}")
+    print(f"Final Score: {score['final_score']:.2f}")
 
-    # 保存结果
-    with open('plot-result.txt', 'w') as file:
-        file.write(f'flow_completion_time {timestamps[-1]}\n')
-        file.write(f'average_bandwidth {average_bandwidth}\n')
+def write_plot_result(score, path='plot-result.txt'):
+    intervals, results = score['intervals'], score['results']
+    with open(path, 'w') as file:
+        file.write(f'flow_completion_time {score["completion_time"]}\n')
+        file.write(f'average_bandwidth {score["average_bandwidth"]}\n')
         for i in range(1, len(intervals) + 1):
             file.write(f'fluctuation_rate_{i} {results[f"interval_{i}"]["fluctuation_rate"]}\n')
-        file.write(f"\nBandwidth Utilization: {bandwidth_utilization:.6f}\n")
-        file.write(f"Final Score: {final_score:.2f}")
+        file.write(f"\nBandwidth Utilization: {score['bandwidth_utilization']:.6f}\n")
+        file.write(f"Final Score: {score['final_score']:.2f}")
+
+def calculate_score(config_path = 'config.txt', trace_path = 'mix.tr', engine = 'numpy', use_cache = True, series_path = None):
+    # 读取配置和数据
+    spec = named_spec(SCORE_SPEC)
+    packet_payload_size = read_config_PACKET_PAYLOAD_SIZE(config_path)
+    # 只有二进制 trace (mix.trb) 时直接读取它
+    trace_path = resolve_trace_path(trace_path)
+
+    # 计算带宽
+    if series_path:
+        # 仿真内聚合的时隙序列 (AGG_OUTPUT_FILE), 不读取逐包 trace
+        counter = scan_series(series_path, spec['slot'])
+        time_slots, bandwidths = counter_bandwidths(counter, packet_payload_size, spec)
+        completion_time = counter.last_time
+    elif engine == 'python':
+        timestamps, sequence_numbers = read_trace(trace_path, use_cache)
+        time_slots, bandwidths = calculate_bandwidths(timestamps, packet_payload_size + spec['header_bytes'],
+                                                      spec['slot'], spec['carry'], spec['include_last'])
+        completion_time = timestamps[-1]
+    else:
+        # 分块流式统计, 不保留逐包数据
+        counter = scan_trace(trace_path, spec['slot'], use_cache=use_cache)
+        time_slots, bandwidths = counter_bandwidths(counter, packet_payload_size, spec)
+        completion_time = counter.last_time
+
+    score = score_bandwidths(time_slots, bandwidths, completion_time,
+                             read_flow_SIZE(read_config_FLOW_FILE(config_path)) == 6400, config_path)
+
+    # 输出结果
+    print_score(score, packet_payload_size)
+
+    # 保存结果
+    write_plot_result(score)
 
     # 返回数据供绘图使用
-    return time_slots, bandwidths, intervals
+    return time_slots, bandwidths, score['intervals']
+
+def follow_score(config_path = 'config.txt', trace_path = 'mix.tr', report_interval = 5.0, idle_timeout = 60.0):
+    """跟随仿真仍在写入的 trace 增量评分
+
+    每 report_interval 秒输出一次当前的部分得分并重写 plot-result.txt, 便于提前终止参数扫描中
+    明显不好的运行. trace 连续 idle_timeout 秒没有增长 (或 Ctrl-C) 时视为结束, 输出完整结果.
+    已读取的字节不会重复读取, 每次报告只需在时隙数组上重新计算区间指标.
+    """
+    spec = named_spec(SCORE_SPEC)
+    packet_payload_size = read_config_PACKET_PAYLOAD_SIZE(config_path)
+    origin_6400 = read_flow_SIZE(read_config_FLOW_FILE(config_path)) == 6400
+
+    follower = TraceFollower(trace_path)
+    counter = SlotCounter(spec['slot'])
+    score = None
+    last_growth = time.monotonic()
+    next_report = last_growth + report_interval
+    try:
+        while True:
+            grew = False
+            while True:
+                chunk = follower.poll()
+                if chunk is None:
+                    break
+                counter.update(chunk['time'])
+                grew = True
+            now = time.monotonic()
+            if grew:
+                last_growth = now
+            finished = now - last_growth >= idle_timeout
+            if counter.num_packets and (now >= next_report or finished):
+                time_slots, bandwidths = counter_bandwidths(counter, packet_payload_size, spec)
+                if len(bandwidths):
+                    score = score_bandwidths(time_slots, bandwidths, counter.last_time, origin_6400, config_path)
+                    write_plot_result(score)
+                    print(f"[{counter.last_time:.6f} s, {counter.num_packets} packets] "
+                          f"Average Bandwidth: {score['average_bandwidth']:.6f} Gbps, "
+                          f"Final Score: {score['final_score']:.2f}", flush=True)
+                next_report = now + report_interval
+            if finished:
+                break
+            time.sleep(min(1.0, report_interval))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        follower.close()
+
+    if counter.num_packets:
+        time_slots, bandwidths = counter_bandwidths(counter, packet_payload_size, spec)
+        score = score_bandwidths(time_slots, bandwidths, counter.last_time, origin_6400, config_path)
+        print_score(score, packet_payload_size)
+        write_plot_result(score)
+    return score
 
 def main():
     # 参数解析
     parser = argparse.ArgumentParser(description='Score Calculator for Network Performance')
     parser.add_argument('--config', type=str, default='config.txt', help='Path to config file')
     parser.add_argument('--trace', type=str, default='mix.tr', help='Path to trace file')
+    parser.add_argument('--engine', choices=BANDWIDTH_ENGINES, default='numpy', help='Slot bandwidth engine')
+    parser.add_argument('--no-cache', action='store_true', help='Do not read or write the columnar trace cache')
+    parser.add_argument('--series', type=str, default=None, help='Score from the AGG_OUTPUT_FILE series instead of the trace')
+    parser.add_argument('--follow', action='store_true', help='Follow a trace that is still being written and report partial scores')
+    parser.add_argument('--report-interval', type=float, default=5.0, help='Seconds between partial reports in --follow mode')
+    parser.add_argument('--idle-timeout', type=float, default=60.0, help='Stop following after the trace has not grown for this many seconds')
     args = parser.parse_args()
 
-    calculate_score(args.config, args.trace)
+    if args.follow:
+        follow_score(args.config, args.trace, args.report_interval, args.idle_timeout)
+        return
+    calculate_score(args.config, args.trace, args.engine, not args.no_cache, args.series)
 
 if __name__ == '__main__':
     main()
\ No newline at end of file
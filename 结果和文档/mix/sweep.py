@@ -0,0 +1,427 @@
+"""参数扫描调度
+
+扫描文件 (JSON / TOML / YAML) 描述 config.txt 的覆盖网格 x 流文件 x 仿真程序:
+    base_config   模板 config.txt, 其中的输入文件路径相对于它所在的目录
+    root          运行目录的根, 默认为扫描文件所在目录
+    flows         流文件列表, 每个流文件放在 <root>/<流数>/flow.txt
+    binaries      [{"name", "command", "env"}], command 与 env 在运行目录中解释 (与 run.sh 相同),
+                  config.txt 作为最后一个参数追加
+    grid          {config 键: [取值, ...]}, 展开为笛卡尔积
+    memory_mb     每次运行的内存估计 (MB), 运行完成后用实测的峰值 RSS 修正
+
+每个组合得到运行目录 <root>/<流数>/<name>[-<键>=<值>...]/, 目录结构与手工建立的 6400/hpcc 一致.
+调度器每个 CPU 同时只运行一个仿真并用 sched_setaffinity 绑定到该 CPU; 可用内存
+(/proc/meminfo 的 MemAvailable 减去运行中的仿真尚未用到的估计值) 不足时推迟启动.
+仿真的标准输出直接写入运行目录的 out.txt, 每完成一个运行报告进度与预计剩余时间.
+指定 --cache 时, 输入与程序都相同的运行直接从 result_cache 放回输出, 不再仿真.
+每个运行的状态, 退出码, 用时, 峰值 RSS 与输出校验和记入 job_journal, --resume 时跳过已完成的运行.
+每个仿真完成后由 run_profile 计算资源画像 (CPU 时间, trace 写入速率, 事件速率等) 一并记入日志,
+全部完成后按 PACKET_PAYLOAD_SIZE / 流数 / CC_MODE 与扫描网格的键汇总, 写入日志旁的 sweep_profile.csv.
+"""
+import os
+import re
+import sys
+import time
+import shutil
+import signal
+import logging
+import argparse
+import itertools
+import subprocess
+from collections import deque
+from datetime import datetime
+from pathlib import Path
+
+LOG_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+# 以下 config 键的值是输入文件路径, 写入运行目录时改为相对于运行目录
+INPUT_PATH_KEYS = ('TOPOLOGY_FILE', 'TRACE_FILE')
+# 为系统和其他进程保留的内存 (MB)
+RESERVE_MB = 1024
+# 运行目录名中需要替换的字符
+UNSAFE_NAME_CHARS = re.compile(r'[\s/\\]+')
+
+
+class SweepError(ValueError):
+    pass
+
+
+def read_flow_count(flow_path):
+    with open(flow_path, 'r') as file:
+        return int(file.readline().split()[0])
+
+
+def format_value(value):
+    if isinstance(value, (list, tuple)):
+        return ' '.join(format_value(item) for item in value)
+    return str(value)
+
+
+def read_config_lines(config_path):
+    with open(config_path, 'r') as file:
+        return file.read().splitlines()
+
+
+def override_config(lines, overrides):
+    """替换 config.txt 各行中 overrides 里的键的取值, 模板中没有的键追加到末尾"""
+    lines = list(lines)
+    remaining = dict(overrides)
+    for i, line in enumerate(lines):
+        parts = line.split(None, 1)
+        if parts and parts[0] in remaining:
+            lines[i] = f'{parts[0]} {format_value(remaining.pop(parts[0]))}'
+    lines.extend(f'{key} {format_value(value)}' for key, value in remaining.items())
+    return lines
+
+
+def variant_name(name, overrides):
+    """运行目录名: 程序名后依次接 -<键>=<值>, 值中的空白与路径分隔符替换为 _"""
+    parts = [name]
+    for key, value in overrides.items():
+        parts.append(f"{key}={UNSAFE_NAME_CHARS.sub('_', format_value(value))}")
+    return '-'.join(parts)
+
+
+class Job:
+    """一次仿真运行"""
+    def __init__(self, directory, command, env=None, memory_mb=0):
+        self.directory = directory
+        self.command = command
+        self.env = env or {}
+        self.memory_mb = memory_mb
+        self.cpu = None
+        self.process = None
+        self.start_time = None
+        self.wall_time = None
+        self.returncode = None
+        self.max_rss_mb = None
+        self.usage = None
+        self.profile = None
+        self.cache_key = None
+        self.cached = False
+
+    @property
+    def name(self):
+        return os.path.relpath(self.directory)
+
+
+def expand_sweep(sweep, sweep_dir):
+    """把扫描描述展开为 [(运行目录, 流文件, 程序, overrides)]"""
+    for key in ('base_config', 'flows', 'binaries'):
+        if not sweep.get(key):
+            raise SweepError(f'sweep description needs {key!r}')
+    root = os.path.join(sweep_dir, sweep.get('root', '.'))
+    grid = sweep.get('grid', {})
+    keys = list(grid)
+    combinations = [dict(zip(keys, values)) for values in itertools.product(*(grid[key] for key in keys))]
+
+    flows = [os.path.join(sweep_dir, flow) for flow in sweep['flows']]
+    counts = [read_flow_count(flow) for flow in flows]
+    runs = []
+    for flow, count in zip(flows, counts):
+        flow_dir = str(count) if counts.count(count) == 1 else f'{count}-{Path(flow).stem}'
+        for binary in sweep['binaries']:
+            for overrides in combinations:
+                directory = os.path.join(root, flow_dir, variant_name(binary['name'], overrides))
+                runs.append((os.path.normpath(directory), flow, binary, overrides))
+    return runs
+
+
+def materialize(sweep, sweep_dir, dry_run=False):
+    """建立各运行目录与其中的 config.txt, 返回 Job 列表"""
+    base_config = os.path.join(sweep_dir, sweep['base_config'])
+    base_dir = os.path.dirname(os.path.abspath(base_config))
+    template = read_config_lines(base_config)
+    jobs = []
+    for directory, flow, binary, overrides in expand_sweep(sweep, sweep_dir):
+        flow_copy = os.path.join(os.path.dirname(directory), 'flow.txt')
+        values = {'FLOW_FILE': '../flow.txt'}
+        for line in template:
+            parts = line.split()
+            if len(parts) >= 2 and parts[0] in INPUT_PATH_KEYS:
+                values[parts[0]] = os.path.relpath(os.path.join(base_dir, parts[1]), directory)
+        values.update(overrides)
+        if not dry_run:
+            os.makedirs(directory, exist_ok=True)
+            if not os.path.exists(flow_copy) or not os.path.samefile(flow, flow_copy):
+                shutil.copyfile(flow, flow_copy)
+            with open(os.path.join(directory, 'config.txt'), 'w') as file:
+                file.write('\n'.join(override_config(template, values)) + '\n')
+        command = list(binary['command']) + ['config.txt']
+        jobs.append(Job(directory, command, binary.get('env'), sweep.get('memory_mb', 0)))
+    return jobs
+
+
+def available_memory_mb():
+    """/proc/meminfo 的 MemAvailable (MB), 无法读取时返回 None"""
+    try:
+        with open('/proc/meminfo', 'r') as file:
+            for line in file:
+                if line.startswith('MemAvailable:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+def process_rss_mb(pid):
+    """进程当前的 RSS (MB), 无法读取时返回 0"""
+    try:
+        with open(f'/proc/{pid}/status', 'r') as file:
+            for line in file:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return 0
+
+
+def parse_cpu_list(text):
+    """'0-3,6' 形式的 CPU 列表"""
+    cpus = []
+    for part in text.split(','):
+        if '-' in part:
+            low, high = map(int, part.split('-'))
+            cpus.extend(range(low, high + 1))
+        elif part:
+            cpus.append(int(part))
+    return cpus
+
+
+def default_cpus():
+    if hasattr(os, 'sched_getaffinity'):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def format_duration(seconds):
+    seconds = int(seconds)
+    return f'{seconds // 3600}:{seconds // 60 % 60:02d}:{seconds % 60:02d}'
+
+
+class SweepRunner:
+    """按 CPU 与内存调度 Job, 每个运行绑定到一个独占的 CPU"""
+    def __init__(self, jobs, cpus=None, reserve_mb=RESERVE_MB, cache=None, journal=None):
+        self.jobs = list(jobs)
+        self.cpus = list(cpus) if cpus else default_cpus()
+        self.reserve_mb = reserve_mb
+        self.cache = cache  # result_cache.ResultCache
+        self.journal = journal  # job_journal.JobJournal
+        self.running = {}  # pid -> Job
+        self.finished = []
+        self.started_at = None
+
+    def estimate_mb(self, job):
+        """运行的内存估计: 配置的估计值与已完成运行的最大峰值 RSS 中的较大者"""
+        observed = max((done.max_rss_mb or 0 for done in self.finished), default=0)
+        return max(job.memory_mb, observed)
+
+    def admit(self, job):
+        if not self.running:
+            return True
+        available = available_memory_mb()
+        if available is None:
+            return True
+        # 运行中的仿真还会继续增长到估计值
+        committed = sum(max(0, self.estimate_mb(other) - process_rss_mb(pid)) for pid, other in self.running.items())
+        return available - committed - self.reserve_mb >= self.estimate_mb(job)
+
+    def start(self, job, cpu):
+        env = dict(os.environ)
+        env.update({key: str(value) for key, value in job.env.items()})
+        preexec_fn = None
+        if hasattr(os, 'sched_setaffinity'):
+            preexec_fn = lambda: os.sched_setaffinity(0, {cpu})
+        job.cpu = cpu
+        job.start_time = time.monotonic()
+        with open(os.path.join(job.directory, 'out.txt'), 'w') as log:
+            job.process = subprocess.Popen(job.command, cwd=job.directory, env=env, stdout=log,
+                                           stderr=subprocess.STDOUT, preexec_fn=preexec_fn)
+        self.running[job.process.pid] = job
+        if self.journal is not None:
+            self.journal.record(job.directory, 'started')
+        logging.info(f"Started {job.name} on CPU {cpu}: {' '.join(job.command)}")
+
+    def wait(self):
+        """等待任意一个运行结束并返回它, 同时记录 rusage 与峰值 RSS"""
+        if hasattr(os, 'wait4'):
+            while True:
+                pid, status, usage = os.wait4(-1, 0)
+                if pid in self.running:
+                    break
+            job = self.running.pop(pid)
+            job.returncode = os.waitstatus_to_exitcode(status)
+            job.process.returncode = job.returncode
+            job.usage = usage
+            # Linux 上 ru_maxrss 的单位为 KB
+            job.max_rss_mb = usage.ru_maxrss / 1024
+        else:
+            while True:
+                done = [pid for pid, job in self.running.items() if job.process.poll() is not None]
+                if done:
+                    break
+                time.sleep(0.5)
+            job = self.running.pop(done[0])
+            job.returncode = job.process.returncode
+        job.wall_time = time.monotonic() - job.start_time
+        return job
+
+    def restore_cached(self, job, remaining):
+        """结果缓存命中时直接放回输出并记为完成, 返回是否命中"""
+        if self.cache is None:
+            return False
+        job.cache_key = self.cache.key(job.directory, job.command, job.env)
+        if job.cache_key is None or not self.cache.restore(job.cache_key, job.directory):
+            return False
+        job.returncode, job.wall_time, job.cached = 0, 0.0, True
+        self.report(job, remaining)
+        return True
+
+    def report(self, job, remaining):
+        self.finished.append(job)
+        if job.process is not None:
+            from run_profile import profile_run
+            job.profile = profile_run(job.directory, job.wall_time, job.usage)
+        if self.journal is not None:
+            from job_journal import output_checksums
+            from run_profile import trace_outputs
+            state = 'cached' if job.cached else 'done' if job.returncode == 0 else 'failed'
+            # trace 可能有几十 GB, 与 gen_results 一样只记录大小与修改时间
+            outputs = output_checksums(job.directory, unhashed=trace_outputs(job.directory)) \
+                if job.returncode == 0 else None
+            self.journal.record(job.directory, state, job.returncode, job.wall_time, job.max_rss_mb, outputs,
+                                job.profile)
+        done, total = len(self.finished), len(self.jobs)
+        simulated = [finished.wall_time for finished in self.finished if not finished.cached]
+        mean_wall = sum(simulated) / len(simulated) if simulated else 0.0
+        eta = mean_wall * remaining / max(1, len(self.cpus))
+        if job.cached:
+            outcome = 'restored from the result cache'
+        else:
+            rss = f', peak RSS {job.max_rss_mb:.0f} MB' if job.max_rss_mb is not None else ''
+            outcome = f'exit {job.returncode} after {format_duration(job.wall_time)}{rss}'
+            if job.profile is not None and job.profile['cpu_time'] is not None:
+                outcome += f", CPU {job.profile['cpu_time']:.1f}s, trace {job.profile['trace_mb_per_s']:.1f} MB/s"
+            if job.profile is not None and job.profile['event_rate'] is not None:
+                outcome += f", {job.profile['event_rate']:.3g} events/s, sim/wall {job.profile['sim_wall_ratio']:.3g}"
+        level = logging.INFO if job.returncode == 0 else logging.ERROR
+        logging.log(level, f"[{done}/{total}] {job.name}: {outcome}; elapsed "
+                           f"{format_duration(time.monotonic() - self.started_at)}, ETA {format_duration(eta)}")
+
+    def run(self):
+        """运行全部 Job, 返回失败的 Job 列表"""
+        pending = deque(self.jobs)
+        free_cpus = list(self.cpus)
+        self.started_at = time.monotonic()
+        try:
+            while pending or self.running:
+                while pending and free_cpus and self.admit(pending[0]):
+                    job = pending.popleft()
+                    if self.restore_cached(job, len(pending) + len(self.running)):
+                        continue
+                    cpu = free_cpus.pop(0)
+                    try:
+                        self.start(job, cpu)
+                    except OSError as e:
+                        logging.error(f"Could not start {job.name}: {e}")
+                        free_cpus.insert(0, cpu)
+                        job.returncode, job.wall_time = -1, 0.0
+                        self.report(job, len(pending) + len(self.running))
+                if not self.running:
+                    continue
+                job = self.wait()
+                free_cpus.append(job.cpu)
+                if job.returncode == 0 and job.cache_key is not None:
+                    self.cache.store(job.cache_key, job.directory)
+                self.report(job, len(pending) + len(self.running))
+        except KeyboardInterrupt:
+            logging.warning(f"Interrupted, terminating {len(self.running)} running simulations")
+            for job in self.running.values():
+                job.process.send_signal(signal.SIGTERM)
+            raise
+        return [job for job in self.finished if job.returncode != 0]
+
+
+def write_profile_summary(journal, directories, dimensions, path):
+    """把日志中这些运行目录的资源画像按 dimensions 汇总, 写入 path 并记录到日志"""
+    from run_profile import summarize, format_table, write_summary
+    latest = journal.load()
+    profiles = []
+    for directory in directories:
+        entry = latest.get(journal._key(directory))
+        if entry is not None and entry['state'] == 'done' and entry.get('profile'):
+            profiles.append((directory, entry['profile']))
+    rows = summarize(profiles, dimensions)
+    write_summary(rows, path)
+    logging.info(f"Cost by config ({len(profiles)} profiled runs, written to {path}):\n{format_table(rows)}")
+
+
+def setup_logging(log_level):
+    """设置日志记录, 与 gen_results.py 一样同时写入 logs/ 与控制台"""
+    if not os.path.exists('logs'):
+        os.makedirs('logs')
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    logging.basicConfig(
+        level=log_level,
+        format=LOG_FORMAT,
+        handlers=[
+            logging.FileHandler(f'logs/sweep_{timestamp}.log'),
+            logging.StreamHandler()
+        ]
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Expand a parameter sweep into run directories and run the simulations')
+    parser.add_argument('sweep', help='Sweep description (.json, .toml, .yaml)')
+    parser.add_argument('--cpus', type=str, default=None, help='CPUs to run on, e.g. 0-7,12 (default: all CPUs of this process)')
+    parser.add_argument('--reserve-mb', type=int, default=RESERVE_MB, help=f'Memory to leave free in MB (default: {RESERVE_MB})')
+    parser.add_argument('--dry-run', action='store_true', help='Only list the runs, do not create directories or run anything')
+    parser.add_argument('--setup-only', action='store_true', help='Create the run directories without running the simulations')
+    parser.add_argument('--cache', type=str, default=None,
+                        help='Result cache directory; runs whose inputs were simulated before are restored from it')
+    parser.add_argument('--cache-size', type=float, default=None, help='Size cap of the result cache in GB (least recently used entries are evicted)')
+    parser.add_argument('--journal', type=str, default=None,
+                        help='Job journal file (default: sweep_journal.jsonl next to the sweep description)')
+    parser.add_argument('--resume', action='store_true',
+                        help='Skip runs the journal records as finished with unchanged outputs; re-run failed or interrupted ones')
+    parser.add_argument('--verify', action='store_true', help='With --resume, re-hash the outputs of finished runs')
+    parser.add_argument('--profile', type=str, default=None,
+                        help='Cost-by-config summary table, .csv or .json (default: sweep_profile.csv next to the sweep description)')
+    parser.add_argument('--log-level', default='INFO', choices=['DEBUG', 'INFO', 'WARNING', 'ERROR', 'CRITICAL'],
+                        help='Set the logging level (default: INFO)')
+    args = parser.parse_args()
+
+    setup_logging(args.log_level)
+    from score_spec import read_spec_file
+    from job_journal import JobJournal
+    sweep_dir = os.path.dirname(os.path.abspath(args.sweep))
+    sweep = read_spec_file(args.sweep)
+    jobs = materialize(sweep, sweep_dir, args.dry_run)
+    all_directories = [job.directory for job in jobs]
+    journal = JobJournal(args.journal or os.path.join(sweep_dir, 'sweep_journal.jsonl'))
+    if args.resume:
+        pending = set(journal.pending([job.directory for job in jobs], args.verify))
+        logging.info(f"Resuming: {len(jobs) - len(pending)} of {len(jobs)} runs already finished")
+        jobs = [job for job in jobs if job.directory in pending]
+    for job in jobs:
+        logging.info(f"{'[DRY RUN] ' if args.dry_run else ''}{job.name}: {' '.join(job.command)}")
+    if args.dry_run or args.setup_only:
+        return
+
+    cpus = parse_cpu_list(args.cpus) if args.cpus else None
+    cache = None
+    if args.cache:
+        from result_cache import ResultCache
+        cache = ResultCache(args.cache, int(args.cache_size * 1e9) if args.cache_size is not None else None)
+    failed = SweepRunner(jobs, cpus, args.reserve_mb, cache, journal).run()
+    from run_profile import DEFAULT_DIMENSIONS
+    dimensions = list(DEFAULT_DIMENSIONS) + [key for key in sweep.get('grid', {}) if key not in DEFAULT_DIMENSIONS]
+    write_profile_summary(journal, all_directories, dimensions, args.profile or os.path.join(sweep_dir, 'sweep_profile.csv'))
+    if failed:
+        logging.error(f"{len(failed)} of {len(jobs)} runs failed: {', '.join(job.name for job in failed)}")
+        sys.exit(1)
+    logging.info(f"All {len(jobs)} runs finished")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,57 @@
+"""把共享的分析模块同步到 Windows 目录
+
+windows/ns-3-dev/x64/Release/mix 与 submit/ 需要能在 Windows 上单独使用, 因此各自带有
+本目录中共享模块与 gen_result.py 的副本. 副本只由本脚本生成, 不要直接修改:
+    python sync_windows.py          把 SHARED_FILES 复制到各 Windows 目录
+    python sync_windows.py --check  只检查, 有副本与本目录不一致时列出并以状态 1 退出
+test_sync_windows.py 在测试中执行同样的检查.
+"""
+import sys
+import shutil
+import filecmp
+import argparse
+from pathlib import Path
+
+SOURCE_DIR = Path(__file__).parent
+WINDOWS_RELEASE = SOURCE_DIR / '../../windows/ns-3-dev/x64/Release'
+TARGET_DIRS = (WINDOWS_RELEASE / 'mix', WINDOWS_RELEASE / 'submit')
+# 在各 Windows 目录中保持与本目录完全一致的文件; score_spec.py / score_spec.json 供 gen_result.py 读取评分规格,
+# score_spec.py 自身的多规格评分需要本目录的 score_calculator.py, 不在 Windows 目录中使用
+SHARED_FILES = ('trace_stream.py', 'score_spec.py', 'score_spec.json', 'gen_result.py')
+
+
+def copies():
+    """[(源文件, 副本)]"""
+    return [(SOURCE_DIR / name, target / name) for target in TARGET_DIRS for name in SHARED_FILES]
+
+
+def stale_copies():
+    """与源文件不一致 (或不存在) 的副本"""
+    return [copy for source, copy in copies() if not copy.exists() or not filecmp.cmp(source, copy, shallow=False)]
+
+
+def sync():
+    """复制不一致的副本, 返回复制的路径"""
+    stale = stale_copies()
+    for source, copy in copies():
+        if copy in stale:
+            shutil.copyfile(source, copy)
+    return stale
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Copy the shared analysis modules into the Windows directories')
+    parser.add_argument('--check', action='store_true', help='Only report copies that differ from this directory')
+    args = parser.parse_args()
+
+    if args.check:
+        stale = stale_copies()
+        for copy in stale:
+            print(f"{copy.resolve()} is out of date, run sync_windows.py")
+        sys.exit(1 if stale else 0)
+    for copy in sync():
+        print(f"Updated {copy.resolve()}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+"""fct_report 的 FCT 文件解析与分桶 slowdown 统计"""
+import numpy as np
+import pytest
+
+import fct_report
+
+
+def make_fct(num_flows=500, seed=0):
+    rng = np.random.default_rng(seed)
+    table = {
+        'sip': rng.integers(0, 1 << 32, num_flows, dtype=np.int64),
+        'dip': rng.integers(0, 1 << 32, num_flows, dtype=np.int64),
+        'sport': rng.integers(10000, 60000, num_flows),
+        'dport': np.full(num_flows, 100),
+        'size': (10 ** rng.uniform(3, 8, num_flows)).astype(np.int64),
+        'start': np.sort(rng.integers(2_000_000_000, 2_100_000_000, num_flows)),
+    }
+    table['standalone_fct'] = table['size'] * 8 // 25 + 2000
+    table['fct'] = (table['standalone_fct'] * rng.uniform(0.99, 30, num_flows)).astype(np.int64)
+    return table
+
+
+def write_fct(path, table, extra=''):
+    """按 qp_finish 的 "%08x %08x %u %u %lu %lu %lu %lu" 格式写出"""
+    with open(path, 'w') as file:
+        for row in zip(*(table[name].tolist() for name in fct_report.FCT_COLUMNS)):
+            file.write('%08x %08x %u %u %u %u %u %u\n' % row)
+        file.write(extra)
+    return str(path)
+
+
+def test_read_fct_round_trip(tmp_path):
+    table = make_fct()
+    path = write_fct(tmp_path / 'fct.txt', table)
+    parsed = fct_report.read_fct(path)
+    for name in fct_report.FCT_COLUMNS:
+        assert parsed[name].tolist() == table[name].tolist(), name
+
+
+def test_read_fct_skips_partial_lines(tmp_path):
+    table = make_fct(20)
+    # 仿真被中断时最后一行可能不完整, 也可能有空行
+    path = write_fct(tmp_path / 'fct.txt', table, '\n0b000101 0b000201 10000\n')
+    parsed = fct_report.read_fct(path)
+    assert parsed['fct'].tolist() == table['fct'].tolist()
+    assert all(len(values) == 0 for values in fct_report.read_fct(write_fct(tmp_path / 'empty.txt', make_fct(0))).values())
+
+
+def test_parse_hex_mixed_width():
+    column = np.array([b'0b000101', b'ABCDEF12', b'ff', b'0'])
+    assert fct_report._parse_hex(column).tolist() == [0x0b000101, 0xabcdef12, 0xff, 0]
+    column = np.array([b'0b000101', b'ABCDEF12', b'deadbeef'])
+    assert fct_report._parse_hex(column).tolist() == [0x0b000101, 0xabcdef12, 0xdeadbeef]
+
+
+def test_slowdown_report_matches_per_bucket_percentiles():
+    table = make_fct(seed=1)
+    rows = fct_report.slowdown_report(table)
+    values = np.maximum(table['fct'] / table['standalone_fct'], 1.0)
+    bounds = (0,) + fct_report.SIZE_BUCKETS + (np.inf,)
+    assert [row['bucket'] for row in rows] == fct_report.bucket_labels() + ['all']
+    for row, low, high in zip(rows, bounds[:-1], bounds[1:]):
+        mask = (table['size'] >= low) & (table['size'] < high)
+        assert row['count'] == mask.sum()
+        if not mask.any():
+            assert np.isnan(row['p50'])
+            continue
+        assert row['mean_fct_us'] == pytest.approx(table['fct'][mask].mean() / 1e3)
+        for q in fct_report.PERCENTILES:
+            assert row[f'p{q:g}'] == pytest.approx(np.percentile(values[mask], q))
+    assert rows[-1]['count'] == len(values)
+    assert rows[-1]['p99'] == pytest.approx(np.percentile(values, 99))
+
+
+def test_slowdown_histogram():
+    table = make_fct(seed=2)
+    counts = fct_report.slowdown_histogram(table)
+    values = fct_report.slowdown(table)
+    assert counts.sum() == len(values)
+    assert counts[0] == ((values >= 1) & (values < 1.5)).sum()
+    assert counts[-1] == (values >= fct_report.HISTOGRAM_EDGES[-1]).sum()
+
+
+def test_fct_path_of(tmp_path):
+    assert fct_report.fct_path_of(str(tmp_path)) == str(tmp_path / 'fct.txt')
+    (tmp_path / 'config.txt').write_text('FLOW_FILE flow.txt\nFCT_OUTPUT_FILE fct_hpcc.txt\n')
+    assert fct_report.fct_path_of(str(tmp_path)) == str(tmp_path / 'fct_hpcc.txt')
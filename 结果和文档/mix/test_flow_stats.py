@@ -0,0 +1,98 @@
+"""flow_stats 的向量化逐流统计与逐包参照实现一致, 且与分块方式无关"""
+import numpy as np
+import pytest
+
+import flow_stats
+from conftest import make_times
+
+PAYLOAD = 1000
+
+
+def make_flow_chunk(num_packets=3000, num_flows=12, seed=0):
+    """按时间有序的记录, 各流的 seq 以 PAYLOAD 递增, 夹杂跳跃 (丢包) 与回退 (重传)"""
+    rng = np.random.default_rng(seed)
+    flows = rng.integers(0, num_flows, num_packets)
+    next_seq = np.zeros(num_flows, dtype=np.int64)
+    seq = np.empty(num_packets, dtype=np.int64)
+    for i, flow in enumerate(flows.tolist()):
+        event = rng.random()
+        if event < 0.03:
+            next_seq[flow] += PAYLOAD * rng.integers(1, 4)
+        elif event < 0.06:
+            next_seq[flow] = max(0, next_seq[flow] - PAYLOAD * rng.integers(1, 4))
+        seq[i] = next_seq[flow]
+        next_seq[flow] += PAYLOAD
+    return {
+        'time': make_times(num_packets, seed, duration=0.01),
+        'node': 320 + flows % 3,
+        'sip': flows,
+        'dip': 1000 + flows,
+        'sport': 10000 + flows // 3,
+        'seq': seq,
+    }
+
+
+def reference_stats(chunk, slot_ticks=1000):
+    """逐包计算每条流的统计量, 以及 {(流键, 时隙): 新数据包数}"""
+    flows, series = {}, {}
+    for i in range(len(chunk['time'])):
+        key = tuple(int(chunk[name][i]) for name in flow_stats.FLOW_KEYS)
+        t, seq = float(chunk['time'][i]), int(chunk['seq'][i])
+        flow = flows.setdefault(key, {'packets': 0, 'delivered': 0, 'first_time': t, 'max_seq': -1, 'last_seq': None,
+                                      'seq_gaps': 0, 'missing_bytes': 0, 'retransmits': 0})
+        flow['packets'] += 1
+        if flow['last_seq'] is not None and seq - flow['last_seq'] > PAYLOAD:
+            flow['seq_gaps'] += 1
+            flow['missing_bytes'] += seq - flow['last_seq'] - PAYLOAD
+        if seq > flow['max_seq']:
+            flow['delivered'] += 1
+            flow['max_seq'] = seq
+            slot = int(round(t * 1e7)) // slot_ticks
+            series[key, slot] = series.get((key, slot), 0) + 1
+        else:
+            flow['retransmits'] += 1
+        flow['last_seq'] = seq
+        flow['last_time'] = t
+    return flows, series
+
+
+@pytest.mark.parametrize('splits', [1, 5, 37])
+def test_flow_stats_match_reference(splits):
+    chunk = make_flow_chunk(seed=splits)
+    stats = flow_stats.FlowStats(PAYLOAD)
+    for part in range(splits):
+        index = np.array_split(np.arange(len(chunk['time'])), splits)[part]
+        stats.update({name: values[index] for name, values in chunk.items()})
+    flows, series = reference_stats(chunk)
+
+    table = stats.table()
+    assert stats.num_flows == len(flows)
+    for i in range(stats.num_flows):
+        key = tuple(int(table[name][i]) for name in flow_stats.FLOW_KEYS)
+        for name in ('packets', 'delivered', 'first_time', 'last_time', 'seq_gaps', 'missing_bytes', 'retransmits'):
+            assert table[name][i] == flows[key][name], (key, name)
+        duration = flows[key]['last_time'] - flows[key]['first_time']
+        assert table['goodput'][i] == pytest.approx(flows[key]['delivered'] * PAYLOAD * 8 / 1e9 / duration)
+
+    ids, slots, goodput = stats.goodput_series()
+    keys = [tuple(stats.keys[flow].tolist()) for flow in ids.tolist()]
+    assert {(key, slot): value for key, slot, value in zip(keys, slots.tolist(), goodput.tolist())} == {
+        item: packets * PAYLOAD * 8 / 1e-4 / 1e9 for item, packets in series.items()}
+
+
+def test_stragglers_and_table(tmp_path):
+    stats = flow_stats.FlowStats(PAYLOAD)
+    stats.update(make_flow_chunk(seed=7))
+    stragglers = stats.stragglers(3)
+    assert stats.last_time[stragglers].tolist() == sorted(stats.last_time.tolist(), reverse=True)[:3]
+
+    path = tmp_path / 'flows.csv'
+    flow_stats.write_flow_table(stats, str(path))
+    lines = path.read_text().splitlines()
+    assert lines[0].split(',')[:4] == list(flow_stats.FLOW_KEYS)
+    assert len(lines) == stats.num_flows + 1
+
+
+def test_scan_flows_reads_trace(run_dir):
+    stats = flow_stats.scan_flows('mix.tr', use_cache=False)
+    assert stats.packets.sum() == 20000
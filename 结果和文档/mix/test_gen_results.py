@@ -0,0 +1,85 @@
+"""gen_results 的进程内评分与逐目录运行两个脚本的输出一致, 以及汇总表与 --resume"""
+import os
+import csv
+import json
+import subprocess
+import sys
+
+import pytest
+
+import gen_results
+from conftest import write_run
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+@pytest.fixture
+def results(tmp_path, monkeypatch):
+    """results/100/{a,b}: 两个 trace 相同的运行目录, results/100/c 的 trace 不同"""
+    root = tmp_path / 'results'
+    for name, seed in (('a', 0), ('b', 0), ('c', 1)):
+        write_run(root / '100' / name, num_packets=20000, flows=100, seed=seed)
+    monkeypatch.chdir(root)
+    return root
+
+
+def run_scripts(directory):
+    """按 CommandRunner.run_commands_in_directory 的方式在目录中运行两个脚本"""
+    for script in ('plot_generator.py', 'gen_result.py'):
+        args = [sys.executable, os.path.join(HERE, script)] + (['--no-show'] if script == 'plot_generator.py' else [])
+        subprocess.run(args, cwd=directory, check=True, capture_output=True,
+                       env=dict(os.environ, MPLBACKEND='Agg'))
+
+
+def test_score_directory_matches_scripts(results):
+    row, output = gen_results.score_directory(str(results / '100' / 'a'))
+    run_scripts(results / '100' / 'b')
+    for name in gen_results.SCORE_OUTPUTS:
+        assert (results / '100' / 'a' / name).read_text() == (results / '100' / 'b' / name).read_text(), name
+    assert (results / '100' / 'a' / 'output.txt').read_text() in output
+    assert sorted(os.listdir(results / '100' / 'a')) == sorted(os.listdir(results / '100' / 'b'))
+
+    assert (row['directory'], row['flows'], row['variant']) == (os.path.join('100', 'a'), '100', 'a')
+    # plot-result.txt 前几行为 "<名称> <取值>", 之后是空行与利用率, 得分
+    lines = (results / '100' / 'a' / 'plot-result.txt').read_text().split('\n\n')[0].splitlines()
+    plot_result = dict(line.split() for line in lines)
+    assert float(plot_result['average_bandwidth']) == row['average_bandwidth']
+    assert [float(plot_result[f'fluctuation_rate_{i}']) for i in range(1, len(row['fluctuation_rates']) + 1)] == \
+        row['fluctuation_rates']
+    assert f"Final Score: {row['final_score']:.2f}" in output
+
+
+def test_write_summary(results):
+    rows = [gen_results.score_directory(str(results / '100' / name), use_cache=False)[0] for name in ('c', 'a')]
+    gen_results.write_summary(rows, 'summary')
+    with open('summary.csv', newline='') as file:
+        table = list(csv.DictReader(file))
+    assert [line['directory'] for line in table] == [os.path.join('100', 'a'), os.path.join('100', 'c')]
+    for line, row in zip(table, sorted(rows, key=lambda row: row['directory'])):
+        assert float(line['final_score']) == row['final_score']
+        assert float(line['result_final_score']) == row['result']['final_score']
+        assert float(line['fluctuation_rate_1']) == row['fluctuation_rates'][0]
+    with open('summary.json') as file:
+        assert [row['variant'] for row in json.load(file)] == ['a', 'c']
+
+
+def test_score_directories_resume(results):
+    runner = gen_results.CommandRunner(in_process=True, use_cache=False, summary_prefix='summary',
+                                       plot_formats=(), journal_path='journal.jsonl')
+    runner.process_directories()
+    with open('summary.json') as file:
+        first = {row['directory']: row for row in json.load(file)}
+    assert sorted(first) == [os.path.join('100', name) for name in ('a', 'b', 'c')]
+    assert first[os.path.join('100', 'a')]['final_score'] == first[os.path.join('100', 'b')]['final_score']
+
+    # 重新仿真过的目录 (trace 改变) 重新评分, 其余沿用上一次汇总表中的行
+    write_run(results / '100' / 'b', num_packets=20000, flows=100, seed=2)
+    resumed = gen_results.CommandRunner(in_process=True, use_cache=False, summary_prefix='summary',
+                                        plot_formats=(), journal_path='journal.jsonl', resume=True)
+    assert resumed.journal.pending(resumed.find_trace_directories()) == [str(results / '100' / 'b')]
+    resumed.process_directories()
+    with open('summary.json') as file:
+        second = {row['directory']: row for row in json.load(file)}
+    assert sorted(second) == sorted(first)
+    assert second[os.path.join('100', 'a')] == first[os.path.join('100', 'a')]
+    assert second[os.path.join('100', 'b')]['final_score'] != first[os.path.join('100', 'b')]['final_score']
@@ -0,0 +1,139 @@
+"""gen_topology 的 Clos 连线规则, fat-tree / leaf-spine 特例与 topology.txt 输出"""
+from collections import Counter
+
+import pytest
+
+import gen_topology
+import pfc_report
+
+
+def links(topology):
+    """[(src, dst)], 按层依次排列"""
+    return [(src, dst) for level in topology.levels for src, dst in zip(level[0].tolist(), level[1].tolist())]
+
+
+def reference_clos(hosts_per_leaf, switches, uplinks, pods):
+    """逐条链路按模块文档中的规则连线"""
+    per_leaf = list(hosts_per_leaf) if isinstance(hosts_per_leaf, (list, tuple)) else [hosts_per_leaf] * switches[0]
+    offsets = [sum(per_leaf)]
+    for count in switches[:-1]:
+        offsets.append(offsets[-1] + count)
+    result = []
+    host = 0
+    for leaf, count in enumerate(per_leaf):
+        for _ in range(count):
+            result.append((host, offsets[0] + leaf))
+            host += 1
+    for tier in range(len(switches) - 1):
+        lower_per_pod, upper_per_pod = switches[tier] // pods[tier], switches[tier + 1] // pods[tier]
+        for i in range(switches[tier]):
+            pod, local = divmod(i, lower_per_pod)
+            for j in range(uplinks[tier]):
+                target = pod * upper_per_pod + (local * uplinks[tier] + j) % upper_per_pod
+                result.append((offsets[tier] + i, offsets[tier + 1] + target))
+    return result
+
+
+@pytest.mark.parametrize('hosts_per_leaf, switches, uplinks, pods', [
+    (3, [4], [], []),
+    (2, [6, 4], [3], [1]),
+    ([1, 2, 3, 0, 4, 5], [6, 6, 3], [2, 2], [3, 1]),
+    ([16] * 20 + [12] * 8, [28, 28, 24, 12], [16, 8, 8], [7, 4, 4]),
+])
+def test_clos_matches_reference(hosts_per_leaf, switches, uplinks, pods):
+    topology = gen_topology.clos(hosts_per_leaf, switches, uplinks, pods)
+    expected = reference_clos(hosts_per_leaf, switches, uplinks, pods)
+    assert links(topology) == expected
+    assert topology.links == len(expected)
+    assert topology.nodes == topology.hosts + sum(switches)
+    assert topology.switch_ids().tolist() == list(range(topology.hosts, topology.nodes))
+
+
+def test_huawei_preset():
+    topology = gen_topology.huawei()
+    assert (topology.nodes, sum(topology.switches), topology.links) == (508, 92, 1280)
+    edges = links(topology)
+    # 计算节点端口每 16 个接一台 L1, 存储节点端口每 12 个接 L1 20..27
+    assert edges[:320] == [(port, 416 + port // 16) for port in range(320)]
+    assert edges[320:416] == [(port, 416 + 20 + (port - 320) // 12) for port in range(320, 416)]
+    # 每层的上行链路尽量均匀地分到上一层 (L2-L3 每组 7 台 L2 的 56 条链路分到 6 台 L3)
+    down = Counter(dst for _, dst in edges[416:])
+    for low, high, total in ((444, 472, 28 * 16), (472, 496, 28 * 8), (496, 508, 24 * 8)):
+        counts = [down[node] for node in range(low, high)]
+        assert sum(counts) == total and max(counts) - min(counts) <= 1
+    assert topology.oversubscription() == [1.0, 2.0, 1.25]
+    assert gen_topology.generate_topology() == topology.to_text()
+
+
+def test_fat_tree():
+    k = 4
+    topology = gen_topology.fat_tree(k)
+    assert topology.hosts == k ** 3 // 4
+    assert topology.switches == [k * k // 2, k * k // 2, k * k // 4]
+    assert topology.links == 3 * k ** 3 // 4
+    assert topology.oversubscription() == [1.0, 1.0]
+    edge, agg, core = topology.offsets
+    edges = set(links(topology))
+    half = k // 2
+    for pod in range(k):
+        # pod 内 edge 与 aggregation 全连接
+        for e in range(half):
+            for a in range(half):
+                assert (edge + pod * half + e, agg + pod * half + a) in edges
+    # 每台 core 与每个 pod 恰有一条链路
+    for c in range(half * half):
+        pods = [(src - agg) // half for src, dst in edges if dst == core + c]
+        assert sorted(pods) == list(range(k))
+    assert gen_topology.fat_tree(4, oversubscription=2).oversubscription() == [2.0, 1.0]
+
+
+def test_leaf_spine_oversubscription():
+    topology = gen_topology.leaf_spine(8, 4, 12, oversubscription=3, rates=['25Gbps', '100Gbps'])
+    # 12 x 25Gbps / (3 x 100Gbps) 向上取整为 1 条上行链路
+    assert topology.links == 8 * 12 + 8
+    assert topology.oversubscription() == [3.0]
+    assert gen_topology.leaf_spine(4, 2, 3).links == 4 * 3 + 4 * 2
+
+
+@pytest.mark.parametrize('rate, gbps', [('25Gbps', 25), ('400Mbps', 0.4), ('1.6Tbps', 1600), ('10Kbps', 1e-5)])
+def test_parse_rate(rate, gbps):
+    assert gen_topology.parse_rate(rate) == pytest.approx(gbps)
+
+
+@pytest.mark.parametrize('call', [
+    lambda: gen_topology.parse_rate('25GB'),
+    lambda: gen_topology.clos(2, [4, 3], [1], [2]),
+    lambda: gen_topology.clos(2, [4, 2], [1, 1]),
+    lambda: gen_topology.clos([1, 2], [3], []),
+    lambda: gen_topology.clos(2, [4, 2], [0]),
+    lambda: gen_topology.clos(2, [4, 2], [1], rates=['25Gbps', '25Gbps', '25Gbps']),
+    lambda: gen_topology.fat_tree(5),
+])
+def test_invalid_topologies(call):
+    with pytest.raises(gen_topology.TopologyError):
+        call()
+
+
+def test_write_topology_file(tmp_path, monkeypatch):
+    # 多个写出块
+    monkeypatch.setattr(gen_topology, 'WRITE_CHUNK_LINKS', 7)
+    topology = gen_topology.clos([1, 2, 3, 0, 4, 5], [6, 6, 3], [2, 2], [3, 1], rates=['25Gbps', '100Gbps', '400Gbps'],
+                                 delays='2us')
+    path = str(tmp_path / 'topology.txt')
+    gen_topology.write_topology_file(path, topology)
+    lines = open(path).read().split('\n')
+    assert lines[0] == f'{topology.nodes} 15 {topology.links}'
+    assert lines[1] == ' '.join(map(str, range(15, 30)))
+    body = [line.split() for line in lines[2:2 + topology.links]]
+    assert [(int(src), int(dst)) for src, dst, *_ in body] == links(topology)
+    assert Counter(rate for _, _, rate, _, _ in body) == {'25Gbps': 15, '100Gbps': 12, '400Gbps': 12}
+    assert {(delay, error) for _, _, _, delay, error in body} == {('2us', '0')}
+    assert '\n'.join(lines[2 + topology.links:]) == gen_topology.TRAILER
+
+    # pfc_report 等脚本按同样的格式读取
+    peers, switches = pfc_report.read_topology(path)
+    assert switches == set(topology.switch_ids().tolist())
+    assert len(peers) == 2 * topology.links
+    assert Counter((node, peer) for (node, _), peer in peers.items()) == Counter(
+        pair for src, dst in links(topology) for pair in ((src, dst), (dst, src)))
+    assert all(peers[host, 1] == dst for host, dst in links(topology)[:topology.hosts])
@@ -0,0 +1,93 @@
+"""job_journal 的记录读取与 --resume 时需要重新运行的目录"""
+import os
+import hashlib
+
+import pytest
+
+import job_journal
+
+
+@pytest.fixture
+def runs(tmp_path):
+    """四个运行目录, 各有 config.txt 与两个输出文件"""
+    directories = []
+    for name in ('a', 'b', 'c', 'd'):
+        directory = tmp_path / 'runs' / name
+        directory.mkdir(parents=True)
+        (directory / 'config.txt').write_text('FLOW_FILE flow.txt\n')
+        (directory / 'mix.tr').write_bytes(os.urandom(3000))
+        (directory / 'fct.txt').write_text(f'{name}\n')
+        directories.append(str(directory))
+    return directories
+
+
+def complete(journal, directory, state='done', unhashed=()):
+    journal.record(directory, 'started')
+    return journal.record(directory, state, returncode=0, wall_time=1.5,
+                          outputs=job_journal.output_checksums(directory, unhashed=unhashed))
+
+
+def test_output_checksums(runs):
+    outputs = job_journal.output_checksums(runs[0], unhashed=('mix.tr',))
+    assert sorted(outputs) == ['fct.txt', 'mix.tr']
+    path = os.path.join(runs[0], 'fct.txt')
+    assert outputs['fct.txt'] == {'size': os.path.getsize(path), 'mtime_ns': os.stat(path).st_mtime_ns,
+                                  'sha256': hashlib.sha256(open(path, 'rb').read()).hexdigest()}
+    assert outputs['mix.tr']['sha256'] is None
+    assert job_journal.output_checksums(runs[0], names=['fct.txt', 'missing.txt']).keys() == {'fct.txt'}
+
+
+def test_pending_after_interrupted_sweep(tmp_path, runs):
+    journal = job_journal.JobJournal(str(tmp_path / 'journal.jsonl'))
+    assert journal.pending(runs) == runs
+    complete(journal, runs[0])
+    complete(journal, runs[1], state='cached')
+    journal.record(runs[2], 'started')
+    complete(journal, runs[3])
+    journal.record(runs[3], 'failed', returncode=1)
+    # 被打断时写了一半的行
+    with open(journal.path, 'a') as file:
+        file.write('{"time": "2026-01-01T00:00:00", "directory": "runs/a", "sta')
+
+    latest = journal.load()
+    assert {key: entry['state'] for key, entry in latest.items()} == {
+        os.path.join('runs', 'a'): 'done', os.path.join('runs', 'b'): 'cached',
+        os.path.join('runs', 'c'): 'started', os.path.join('runs', 'd'): 'failed'}
+    assert journal.pending(runs) == runs[2:]
+
+
+def test_pending_when_outputs_change(tmp_path, runs):
+    journal = job_journal.JobJournal(str(tmp_path / 'journal.jsonl'))
+    for directory in runs:
+        complete(journal, directory, unhashed=('mix.tr',))
+    assert journal.pending(runs) == []
+
+    os.remove(os.path.join(runs[0], 'fct.txt'))
+    with open(os.path.join(runs[1], 'mix.tr'), 'ab') as file:
+        file.write(b'\n')
+    # 大小与修改时间不变, 只有 verify 时比对 sha256 才能发现
+    path = os.path.join(runs[2], 'fct.txt')
+    stat = os.stat(path)
+    with open(path, 'w') as file:
+        file.write('x\n')
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+
+    assert journal.pending(runs) == runs[:2]
+    assert journal.pending(runs, verify=True) == runs[:3]
+    # 只记录大小与修改时间的 trace, verify 时不重新计算 sha256
+    path = os.path.join(runs[3], 'mix.tr')
+    stat = os.stat(path)
+    with open(path, 'r+b') as file:
+        file.write(b'x')
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    assert journal.pending(runs, verify=True) == runs[:3]
+
+
+def test_journal_paths_relative_to_journal(tmp_path, runs, monkeypatch):
+    journal = job_journal.JobJournal(str(tmp_path / 'journal.jsonl'))
+    complete(journal, runs[0])
+    # 从其他工作目录打开同一个日志
+    monkeypatch.chdir(runs[1])
+    reopened = job_journal.JobJournal(os.path.relpath(journal.path))
+    assert reopened.is_complete(os.path.relpath(runs[0]))
+    assert not reopened.is_complete('.')
@@ -0,0 +1,106 @@
+"""pfc_report 的暂停区间重建, 占空比与传播链和逐事件参照实现一致"""
+import numpy as np
+import pytest
+
+import pfc_report
+
+
+def make_events(num_events=400, num_nodes=4, seed=0):
+    """各端口上随机的 pause / resume 序列 (含重复的 pause 与多余的 resume), 时间互不相同"""
+    rng = np.random.default_rng(seed)
+    times = rng.choice(np.arange(1, 2_000_000), num_events, replace=False)
+    node = rng.integers(0, num_nodes, num_events)
+    port = rng.integers(1, 3, num_events)
+    kind = (rng.random(num_events) < 0.55).astype(np.int64)
+    order = np.argsort(times)
+    return {'time': times[order], 'node': node[order], 'node_type': np.ones(num_events, dtype=np.int64),
+            'port': port[order], 'type': kind[order]}
+
+
+def reference_intervals(events, stop_time):
+    """逐事件重建每个端口的暂停区间, 返回按 (node, port, start) 排序的 [(node, port, start, end, open)]"""
+    paused, intervals = {}, []
+    for t, node, port, kind in zip(*(events[name].tolist() for name in ('time', 'node', 'port', 'type'))):
+        key = (node, port)
+        if kind == pfc_report.PFC_PAUSE and key not in paused:
+            paused[key] = t
+        elif kind == pfc_report.PFC_RESUME and key in paused:
+            intervals.append((node, port, paused.pop(key), t, False))
+    intervals.extend((node, port, start, stop_time, True) for (node, port), start in paused.items())
+    return sorted(intervals)
+
+
+def as_rows(intervals):
+    return list(zip(*(intervals[name].tolist() for name in ('node', 'port', 'start', 'end', 'open'))))
+
+
+@pytest.mark.parametrize('seed', range(4))
+def test_pause_intervals_match_reference(seed):
+    events = make_events(seed=seed)
+    intervals = pfc_report.pause_intervals(events, stop_time=3_000_000)
+    assert as_rows(intervals) == reference_intervals(events, 3_000_000)
+
+    summary = pfc_report.port_summary(intervals)
+    paused = {}
+    for node, port, start, end, _ in as_rows(intervals):
+        paused[node, port] = paused.get((node, port), 0) + end - start
+    assert dict(zip(zip(summary['node'].tolist(), summary['port'].tolist()), summary['paused_ns'].tolist())) == paused
+    assert summary['paused_ns'].tolist() == sorted(paused.values(), reverse=True)
+
+
+def test_duty_cycle_matches_overlap():
+    events = make_events(seed=5)
+    intervals = pfc_report.pause_intervals(events, stop_time=2_000_000)
+    slot_ns = 100_000
+    starts, average, duty = pfc_report.duty_cycle(intervals, slot_ns, num_ports=8, stop_time=2_000_000)
+    assert starts.tolist() == list(range(0, 2_000_000, slot_ns))
+    for slot_start, value in zip(starts.tolist(), average.tolist()):
+        overlap = sum(max(0, min(end, slot_start + slot_ns) - max(start, slot_start))
+                      for _, _, start, end, _ in as_rows(intervals))
+        assert value == pytest.approx(overlap / slot_ns)
+    assert duty.tolist() == pytest.approx((average / 8).tolist())
+
+
+def write_line_topology(path, num_nodes=4):
+    """0 - 1 - 2 - 3 的链, 节点 0 的端口 1 连到 1, 节点 1 的端口 1 连到 0、端口 2 连到 2, 以此类推"""
+    with open(path, 'w') as file:
+        file.write(f'{num_nodes} {num_nodes - 2} {num_nodes - 1}\n')
+        file.write(' '.join(str(node) for node in range(1, num_nodes - 1)) + '\n')
+        for node in range(num_nodes - 1):
+            file.write(f'{node} {node + 1} 100Gbps 0.001ms 0\n')
+    return str(path)
+
+
+def test_read_topology(tmp_path):
+    peers, switches = pfc_report.read_topology(write_line_topology(tmp_path / 'topology.txt'))
+    assert switches == {1, 2}
+    assert peers == {(0, 1): 1, (1, 1): 0, (1, 2): 2, (2, 1): 1, (2, 2): 3, (3, 1): 2}
+
+
+@pytest.mark.parametrize('seed', range(4))
+def test_propagation_matches_reference(tmp_path, seed):
+    peers, _ = pfc_report.read_topology(write_line_topology(tmp_path / 'topology.txt'))
+    intervals = pfc_report.pause_intervals(make_events(seed=seed), stop_time=3_000_000)
+    parent, depth, root = pfc_report.propagation(intervals, peers)
+
+    rows = as_rows(intervals)
+    for j, (node, port, start, end, _) in enumerate(rows):
+        peer = peers.get((node, port), -1)
+        earlier = [(e, s, i) for i, (n, _, s, e, _) in enumerate(rows) if n == peer and s < start]
+        cause = max(earlier, key=lambda item: (item[0], item[1]))[2] if earlier else -1
+        if cause >= 0 and rows[cause][3] <= start:
+            cause = -1
+        assert parent[j] == cause, j
+    for j in range(len(rows)):
+        hops, i = 0, j
+        while parent[i] >= 0:
+            i, hops = parent[i], hops + 1
+        assert (depth[j], root[j]) == (hops, i)
+
+
+def test_read_pfc_skips_partial_lines(tmp_path):
+    path = tmp_path / 'pfc.txt'
+    path.write_text('2000000100 5 1 2 1\n\n2000000200 5 1 2 0\n2000000300 5')
+    events = pfc_report.read_pfc(str(path))
+    assert events['time'].tolist() == [2000000100, 2000000200]
+    assert events['type'].tolist() == [1, 0]
@@ -0,0 +1,171 @@
+"""qlen_report 的 dump 解析, 区间统计与热力图合并和逐行参照实现一致"""
+import csv
+
+import numpy as np
+import pytest
+
+import qlen_report
+
+PORTS = [(416, 1), (416, 2), (417, 1), (417, 3), (418, 2)]
+
+
+def make_dumps(num_dumps=12, seed=0):
+    """各端口的累计直方图序列 [(time, {(switch, port): [counts]})], 端口陆续出现, 桶数随时间增长"""
+    rng = np.random.default_rng(seed)
+    totals, dumps = {}, []
+    for d in range(num_dumps):
+        for i, key in enumerate(PORTS):
+            if d < i or (key in totals and rng.random() < 0.2):
+                # 尚未出现, 或本区间没有新样本
+                continue
+            counts = totals.setdefault(key, [])
+            width = int(rng.integers(1, 4 + 2 * d))
+            counts.extend([0] * (width - len(counts)))
+            for bucket in rng.integers(0, width, int(rng.integers(1, 30))).tolist():
+                counts[bucket] += 1
+        dumps.append((2_000_000_000 + 1_000_000 * d, {key: list(counts) for key, counts in totals.items()}))
+    return dumps
+
+
+def write_dumps(path, dumps):
+    with open(path, 'w') as file:
+        for time, ports in dumps:
+            file.write(f'time: {time}\n')
+            for (switch, port), counts in ports.items():
+                file.write(f'{switch} {port} ' + ' '.join(map(str, counts)) + '\n')
+    return str(path)
+
+
+def reference_percentile(counts, q):
+    """逐样本展开后取第 ceil(n * q%) 个样本所在的桶"""
+    samples = [bucket for bucket, count in enumerate(counts) for _ in range(count)]
+    if not samples:
+        return np.nan
+    return samples[max(int(np.ceil(len(samples) * q / 100.0)), 1) - 1]
+
+
+def reference_mean(counts):
+    total = sum(counts)
+    return sum(bucket * count for bucket, count in enumerate(counts)) / total if total else np.nan
+
+
+def interval(current, previous):
+    width = max(len(current), len(previous))
+    return [a - b for a, b in zip(current + [0] * (width - len(current)), previous + [0] * (width - len(previous)))]
+
+
+@pytest.mark.parametrize('chunk_bytes', [7, 64, qlen_report.CHUNK_BYTES])
+def test_iter_qlen_dumps_matches_file(tmp_path, chunk_bytes):
+    dumps = make_dumps()
+    path = write_dumps(tmp_path / 'qlen.txt', dumps)
+    parsed = list(qlen_report.iter_qlen_dumps(path, chunk_bytes=chunk_bytes))
+    assert [time for time, _, _ in parsed] == [time for time, _ in dumps]
+    for (_, keys, counts), (_, ports) in zip(parsed, dumps):
+        assert [tuple(key) for key in keys.tolist()] == list(ports)
+        for row, expected in zip(counts.tolist(), ports.values()):
+            assert row == expected + [0] * (counts.shape[1] - len(expected))
+
+
+def test_parse_qlen_dump_max_kb():
+    keys, counts = qlen_report.parse_qlen_dump(b'\n416 1 1 2 3 4 5\n416 2 7\n', max_kb=2)
+    assert keys.tolist() == [[416, 1], [416, 2]]
+    assert counts.tolist() == [[1, 2, 12], [7, 0, 0]]
+    keys, counts = qlen_report.parse_qlen_dump(b'\n')
+    assert keys.shape == (0, 2) and counts.shape == (0, 1)
+
+
+def test_load_qlen_cube(tmp_path):
+    dumps = make_dumps(seed=1)
+    times, keys, cube = qlen_report.load_qlen(write_dumps(tmp_path / 'qlen.txt', dumps))
+    assert times.tolist() == [time for time, _ in dumps]
+    assert [tuple(key) for key in keys.tolist()] == PORTS
+    for d, (_, ports) in enumerate(dumps):
+        for p, key in enumerate(PORTS):
+            expected = ports.get(key, [])
+            assert cube[d, p].tolist() == expected + [0] * (cube.shape[2] - len(expected))
+
+
+def test_histogram_statistics():
+    rng = np.random.default_rng(2)
+    counts = rng.integers(0, 5, (20, 9)) * (rng.random((20, 9)) < 0.4)
+    counts[0] = 0
+    percentiles = qlen_report.histogram_percentiles(counts, (1, 50, 90, 99, 100))
+    mean = qlen_report.histogram_mean(counts)
+    for row, p, m in zip(counts.tolist(), percentiles.tolist(), mean.tolist()):
+        assert p == pytest.approx([reference_percentile(row, q) for q in (1, 50, 90, 99, 100)], nan_ok=True)
+        assert m == pytest.approx(reference_mean(row), nan_ok=True)
+
+
+@pytest.mark.parametrize('seed', range(3))
+def test_scan_intervals_match_reference(tmp_path, seed):
+    dumps = make_dumps(seed=seed)
+    path = write_dumps(tmp_path / 'qlen.txt', dumps)
+    seen = []
+    scan = qlen_report.scan_qlen(path, sinks=[lambda *args: seen.append(args)])
+
+    previous = {}
+    assert len(seen) == len(dumps)
+    for (time, keys, mean, percentiles), (expected_time, ports) in zip(seen, dumps):
+        assert time == expected_time
+        assert [tuple(key) for key in keys.tolist()] == list(ports)
+        for p, key in enumerate(ports):
+            counts = interval(ports[key], previous.get(key, []))
+            assert mean[p] == pytest.approx(reference_mean(counts), nan_ok=True)
+            assert percentiles[p].tolist() == pytest.approx(
+                [reference_percentile(counts, q) for q in qlen_report.PERCENTILES], nan_ok=True)
+        previous = ports
+
+    assert scan.dumps == len(dumps)
+    for row, key in zip(scan.total.tolist(), PORTS):
+        assert row[:len(previous[key])] == previous[key]
+    p99 = [reference_percentile(previous[key], 99) for key in PORTS]
+    assert [p99[p] for p in scan.hot_ports()] == sorted(p99, reverse=True)
+
+
+def test_interval_csv_writer(tmp_path):
+    dumps = make_dumps(seed=3)
+    path = tmp_path / 'intervals.csv'
+    seen = []
+    with qlen_report.IntervalCsvWriter(str(path)) as writer:
+        qlen_report.scan_qlen(write_dumps(tmp_path / 'qlen.txt', dumps),
+                              sinks=[writer, lambda *args: seen.append(args)])
+
+    with open(path, newline='') as file:
+        rows = list(csv.reader(file))
+    assert rows[0] == ['time', 'switch', 'port', 'mean_kb', 'p50_kb', 'p99_kb']
+    expected = []
+    for time, keys, mean, percentiles in seen:
+        for p in np.flatnonzero(~np.isnan(mean)).tolist():
+            expected.append([time, *keys[p].tolist(), mean[p], *percentiles[p].tolist()])
+    assert len(rows) - 1 == len(expected)
+    for row, values in zip(rows[1:], expected):
+        assert [float(value) for value in row] == pytest.approx(values)
+
+
+@pytest.mark.parametrize('max_columns', [1, 3, 4, 100])
+def test_heatmap_buffer_block_means(max_columns):
+    rng = np.random.default_rng(max_columns)
+    num_intervals, num_ports = 37, 4
+    times = list(range(num_intervals))
+    means = []
+    heatmap = qlen_report.HeatmapBuffer(max_columns)
+    for t in times:
+        # 端口陆续出现, 部分区间没有样本
+        width = min(num_ports, 1 + t // 5)
+        mean = np.where(rng.random(width) < 0.3, np.nan, rng.uniform(0, 50, width))
+        means.append(np.pad(mean, (0, num_ports - width), constant_values=np.nan))
+        heatmap(t, None, mean, None)
+
+    matrix = heatmap.matrix(num_ports)
+    assert len(heatmap.times) <= max_columns
+    assert heatmap.times[-1] == times[-1]
+    # 每列覆盖上一列之后到本列结束时间的区间, 其值为这些区间的 nan 忽略平均
+    start = 0
+    for column, end in enumerate(heatmap.times):
+        block = np.array(means[start:end + 1])
+        with np.errstate(invalid='ignore'):
+            expected = np.nansum(block, axis=0) / (~np.isnan(block)).sum(axis=0)
+        assert matrix[column].tolist() == pytest.approx(expected.tolist(), nan_ok=True)
+        start = end + 1
+    if max_columns >= num_intervals:
+        np.testing.assert_allclose(matrix, np.array(means))
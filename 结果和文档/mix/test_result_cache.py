@@ -0,0 +1,95 @@
+"""result_cache 的缓存键, 存入/放回与淘汰"""
+import os
+
+import pytest
+
+import result_cache
+from conftest import write_run
+
+COMMAND = ['./sim', 'config.txt']
+
+
+@pytest.fixture
+def run(tmp_path):
+    directory = write_run(tmp_path / 'run', num_packets=200)
+    with open(os.path.join(directory, 'sim'), 'w') as file:
+        file.write('#!/bin/sh\n')
+    os.makedirs(tmp_path / 'lib')
+    with open(tmp_path / 'lib' / 'libns3-core.so', 'wb') as file:
+        file.write(b'core')
+    return directory
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return result_cache.ResultCache(str(tmp_path / 'cache'))
+
+
+def key(cache, directory):
+    return cache.key(directory, COMMAND, {'LD_LIBRARY_PATH': '../lib'})
+
+
+def test_key_ignores_formatting(run, cache):
+    before = key(cache, run)
+    with open(os.path.join(run, 'config.txt')) as file:
+        config = file.read()
+    with open(os.path.join(run, 'config.txt'), 'w') as file:
+        file.write(config.replace('PACKET_PAYLOAD_SIZE 1000', 'PACKET_PAYLOAD_SIZE   1000.0'))
+    assert key(cache, run) == before
+
+
+@pytest.mark.parametrize('path, content', [
+    ('config.txt', 'PACKET_PAYLOAD_SIZE 1400\n'),
+    ('flow.txt', '7\n'),
+    ('topology.txt', '\n'),
+    ('sim', 'echo\n'),
+    ('../lib/libns3-core.so', 'rebuilt'),
+])
+def test_key_changes_with_inputs(run, cache, path, content):
+    before = key(cache, run)
+    with open(os.path.join(run, path), 'a') as file:
+        file.write(content)
+    assert key(cache, run) != before
+
+
+def test_key_missing_program(run, cache):
+    assert cache.key(run, ['./missing', 'config.txt']) is None
+
+
+def test_store_and_restore(run, cache, tmp_path):
+    entry = key(cache, run)
+    assert not cache.restore(entry, str(tmp_path / 'empty'))
+    cache.store(entry, run)
+
+    target = tmp_path / 'copy'
+    target.mkdir()
+    assert cache.restore(entry, str(target))
+    for name in ('flow.txt', 'mix.tr', 'sim', 'topology.txt'):
+        restored, original = target / name, os.path.join(run, name)
+        assert restored.read_bytes() == open(original, 'rb').read()
+        # 放回的文件可写, 且不与缓存或运行目录共享 inode
+        assert os.stat(restored).st_nlink == 1
+        assert os.access(restored, os.W_OK)
+    assert not (target / 'config.txt').exists()
+
+    cached = os.path.join(cache.entry_path(entry), 'files', 'mix.tr')
+    with open(target / 'mix.tr', 'w') as file:
+        file.write('rerun\n')
+    assert open(cached).read() == open(os.path.join(run, 'mix.tr')).read()
+
+
+def test_prune_least_recently_used(run, cache):
+    keys = []
+    for payload in (1000, 1100, 1200):
+        with open(os.path.join(run, 'config.txt'), 'a') as file:
+            file.write(f'PACKET_PAYLOAD_SIZE {payload}\n')
+        keys.append(key(cache, run))
+        cache.store(keys[-1], run)
+        # 最近使用时间按存入顺序递增
+        manifest = os.path.join(cache.entry_path(keys[-1]), result_cache.MANIFEST)
+        os.utime(manifest, (payload, payload))
+    cache.lookup(keys[0])
+
+    size = cache.entries()[0][1]
+    assert cache.prune(2 * size) == [keys[1]]
+    assert [entry[0] for entry in cache.entries()] == [keys[2], keys[0]]
@@ -0,0 +1,104 @@
+"""run_profile 的进度解析, 单个运行的画像与按配置维度的汇总"""
+import os
+import csv
+import json
+from types import SimpleNamespace
+
+import pytest
+
+import run_profile
+from job_journal import JobJournal
+
+
+def write_profiled_run(directory, cc_mode=1, flows=3, events=5000, shards=()):
+    """运行目录: config.txt, flow.txt, out.txt 与 trace; shards 不为空时 trace 为这些大小的分片"""
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, 'config.txt'), 'w') as file:
+        file.write(f'PACKET_PAYLOAD_SIZE 1000\nFLOW_FILE ../flow.txt\nTRACE_OUTPUT_FILE mix.tr\nCC_MODE {cc_mode}\n')
+    with open(os.path.join(directory, '..', 'flow.txt'), 'w') as file:
+        file.write(f'{flows}\n')
+    with open(os.path.join(directory, 'out.txt'), 'w') as file:
+        file.write('Running Simulation.\n')
+        file.write('PROGRESS sim 2.010000 s events 100 rate 1000 ev/s wall 0.100 s sim/wall 20.1\n')
+        file.write(f'DONE sim 2.100000 s events {events} rate 1 ev/s wall 0.500 s\n')
+    if shards:
+        for i, size in enumerate(shards):
+            with open(os.path.join(directory, f'mix.{i:04d}.tr'), 'wb') as file:
+                file.write(b'x' * size)
+    else:
+        with open(os.path.join(directory, 'mix.tr'), 'wb') as file:
+            file.write(b'x' * 3000)
+    return str(directory)
+
+
+@pytest.mark.parametrize('text, expected', [
+    ('PROGRESS sim 2.01 s events 100 rate 1 ev/s wall 0.1 s\nDONE sim 2.1 s events 900 rate 1 ev/s wall 0.5 s\n',
+     (2.1, 900, 0.5)),
+    ('DONE sim 2.1 s events 900 rate 1 ev/s wall 0.5 s\nPROGRESS sim 2.2 s events 1000 rate 1 ev/s wall 0.6 s\n',
+     (2.2, 1000, 0.6)),
+    ('Running Simulation.\n', None),
+    ('PROGRESS sim 2.2 s events\n', None),
+])
+def test_parse_progress(tmp_path, text, expected):
+    path = tmp_path / 'out.txt'
+    path.write_text(text)
+    assert run_profile.parse_progress(str(path)) == expected
+    assert run_profile.parse_progress(str(tmp_path / 'missing.txt')) is None
+
+
+def test_profile_run(tmp_path):
+    directory = write_profiled_run(tmp_path / '3' / 'hpcc', cc_mode=3, shards=(1000, 2500))
+    usage = SimpleNamespace(ru_utime=1.5, ru_stime=0.5, ru_maxrss=2048 * 1024)
+    profile = run_profile.profile_run(directory, wall_time=4.0, usage=usage)
+    assert run_profile.trace_outputs(directory) == ['mix.0000.tr', 'mix.0001.tr']
+    assert profile['cpu_time'] == 2.0 and profile['cpu_util'] == 0.5
+    assert profile['max_rss_mb'] == 2048
+    assert profile['trace_bytes'] == 3500
+    assert profile['trace_mb_per_s'] == pytest.approx(3500 / 1e6 / 4.0)
+    assert profile['output_bytes'] == 3500 + os.path.getsize(os.path.join(directory, 'out.txt'))
+    assert (profile['sim_time'], profile['events']) == (2.1, 5000)
+    # 事件速率用仿真自报的墙钟时间, 仿真时间比用整个进程的墙钟时间
+    assert profile['event_rate'] == 10000
+    assert profile['sim_wall_ratio'] == pytest.approx(2.1 / 4.0)
+    assert profile['config'] == {'PACKET_PAYLOAD_SIZE': '1000', 'flows': '3', 'CC_MODE': '3'}
+
+    # 没有 rusage 时 (直接读取运行目录) 墙钟时间取 out.txt 中的值
+    profile = run_profile.profile_run(directory)
+    assert profile['wall_time'] == 0.5 and profile['cpu_time'] is None and profile['max_rss_mb'] is None
+
+
+def test_summarize_and_write(tmp_path):
+    profiles = []
+    for i, (cc_mode, events) in enumerate([(1, 1000), (3, 4000), (1, 3000), (3, 2000)]):
+        directory = write_profiled_run(tmp_path / 'runs' / f'r{i}', cc_mode=cc_mode, events=events)
+        usage = SimpleNamespace(ru_utime=i, ru_stime=0, ru_maxrss=(i + 1) * 1024)
+        profiles.append((directory, run_profile.profile_run(directory, wall_time=i + 1.0, usage=usage)))
+
+    rows = run_profile.summarize(profiles, ['CC_MODE'])
+    assert [(row['CC_MODE'], row['runs']) for row in rows] == [('3', 2), ('1', 2)]
+    assert rows[0]['mean_wall_time'] == 3.0 and rows[0]['max_wall_time'] == 4.0
+    assert rows[0]['max_rss_mb'] == 4 and rows[1]['mean_cpu_time'] == 1.0
+    assert rows[1]['mean_event_rate'] == pytest.approx((1000 + 3000) / 0.5 / 2)
+    # 画像中没有的维度从运行目录读取
+    rows = run_profile.summarize(profiles, ['flows', 'U_TARGET'])
+    assert [(row['flows'], row['U_TARGET'], row['runs']) for row in rows] == [('3', None, 4)]
+
+    path = str(tmp_path / 'summary.csv')
+    run_profile.write_summary(run_profile.summarize(profiles, ['CC_MODE']), path)
+    with open(path, newline='') as file:
+        assert [row['CC_MODE'] for row in csv.DictReader(file)] == ['3', '1']
+    path = str(tmp_path / 'summary.json')
+    run_profile.write_summary(run_profile.summarize(profiles, ['CC_MODE']), path)
+    assert [row['runs'] for row in json.load(open(path))] == [2, 2]
+    assert run_profile.format_table([]) == 'No profiled runs'
+
+
+def test_load_profiles(tmp_path):
+    journal = JobJournal(str(tmp_path / 'journal.jsonl'))
+    done = write_profiled_run(tmp_path / 'runs' / 'done')
+    failed = write_profiled_run(tmp_path / 'runs' / 'failed')
+    journal.record(done, 'done', 0, 1.0, profile=run_profile.profile_run(done, 1.0))
+    journal.record(failed, 'done', 0, 1.0, profile=run_profile.profile_run(failed, 1.0))
+    journal.record(failed, 'failed', 1)
+    assert [(os.path.relpath(path, tmp_path), profile['events']) for path, profile in
+            run_profile.load_profiles(journal.path)] == [(os.path.join('runs', 'done'), 5000)]
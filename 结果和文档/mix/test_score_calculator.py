@@ -0,0 +1,147 @@
+"""score_calculator 的两种带宽引擎与原始逐包循环逐位一致"""
+import contextlib
+import io
+
+import numpy as np
+import pytest
+
+import score_calculator
+from conftest import make_times
+
+
+def baseline_score(config_path='config.txt', trace_path='mix.tr'):
+    """原始 score_calculator.calculate_score 的逐包循环, 返回 (标准输出, plot-result.txt 的内容)"""
+    with open(config_path) as file:
+        config = dict(line.split(' ', 1) for line in file.read().splitlines())
+    packet_size = int(config['PACKET_PAYLOAD_SIZE']) + 18
+    with open(config['FLOW_FILE'].strip()) as file:
+        origin_6400 = int(file.readline().split()[0]) == 6400
+    with open(trace_path) as file:
+        timestamps = [float(line.split()[0]) for line in file]
+
+    time_slots, bandwidths = [], []
+    current_slot_start, current_slot_packets = timestamps[0], 0
+    for t in timestamps:
+        if t < current_slot_start + 1e-4:
+            current_slot_packets += 1
+        else:
+            time_slots.append(current_slot_start)
+            bandwidths.append((current_slot_packets * packet_size * 8) / 1e-4 / 1e9)
+            current_slot_start += 1e-4
+            current_slot_packets = 1
+    if current_slot_packets > 0:
+        time_slots.append(current_slot_start)
+        bandwidths.append((current_slot_packets * packet_size * 8) / 1e-4 / 1e9)
+    average_bandwidth = sum(bandwidths) / len(bandwidths)
+
+    intervals = score_calculator.get_intervals(timestamps[-1], origin_6400)
+    rates, lines = [], []
+    for start_time, end_time in intervals:
+        try:
+            start_index = next(i for i, t in enumerate(time_slots) if t >= start_time)
+            end_index = next(i for i, t in enumerate(time_slots) if t >= end_time)
+            specified = bandwidths[start_index:end_index]
+            average = sum(specified) / len(specified) if specified else 0
+            rate = (max(specified) - min(specified)) / average if specified else 0
+        except StopIteration:
+            average, rate = 0, 0
+        rates.append(rate)
+        lines.append(f"\nAverage Bandwidth from {start_time:.6f} s to {end_time:.6f} s: {average:.6f} Gbps\n"
+                     f"Fluctuation Rate from {start_time:.6f} s to {end_time:.6f} s: {rate:.6f}\n")
+    utilization = average_bandwidth / (8 * 12 * 25)
+    final_score = (utilization - sum(rates) / len(rates)) * 100
+
+    stdout = (f"The value of PACKET_PAYLOAD_SIZE is: {packet_size - 18}\n"
+              f"Average Bandwidth: {average_bandwidth:.6f} Gbps\n" + ''.join(lines) +
+              f"\nBandwidth Utilization: {utilization:.6f}\nFinal Score: {final_score:.2f}\n")
+    plot_result = (f'flow_completion_time {timestamps[-1]}\naverage_bandwidth {average_bandwidth}\n' +
+                   ''.join(f'fluctuation_rate_{i} {rate}\n' for i, rate in enumerate(rates, 1)) +
+                   f"\nBandwidth Utilization: {utilization:.6f}\nFinal Score: {final_score:.2f}")
+    return stdout, plot_result
+
+
+@pytest.mark.parametrize('flows', [6400, 100])
+@pytest.mark.parametrize('engine', sorted(score_calculator.BANDWIDTH_ENGINES))
+def test_calculate_score_matches_baseline(run_dir, engine, flows):
+    with open('flow.txt', 'w') as file:
+        file.write(f'{flows}\n')
+    expected_stdout, expected_plot_result = baseline_score()
+    stdout = io.StringIO()
+    with contextlib.redirect_stdout(stdout):
+        score_calculator.calculate_score(engine=engine, use_cache=False)
+    with open('plot-result.txt') as file:
+        assert file.read() == expected_plot_result
+    assert stdout.getvalue() == expected_stdout
+
+
+@pytest.mark.parametrize('carry, include_last', [(True, True), (False, False), (True, False), (False, True)])
+@pytest.mark.parametrize('seed', range(5))
+def test_numpy_engine_matches_loop(seed, carry, include_last):
+    times = make_times(3000, seed, duration=0.01).tolist()
+    packet_size = 1018
+    # 原始循环的两种口径: score_calculator (carry) 与 gen_result.py (换槽的包不计入新时隙)
+    time_slots, bandwidths = [], []
+    current_slot_start, current_slot_packets = times[0], 0
+    for t in times:
+        if t < current_slot_start + 1e-4:
+            current_slot_packets += 1
+        else:
+            time_slots.append(current_slot_start)
+            bandwidths.append((current_slot_packets * packet_size * 8) / 1e-4 / 1e9)
+            current_slot_start += 1e-4
+            current_slot_packets = 1 if carry else 0
+    if include_last and current_slot_packets > 0:
+        time_slots.append(current_slot_start)
+        bandwidths.append((current_slot_packets * packet_size * 8) / 1e-4 / 1e9)
+
+    slots, values = score_calculator.calculate_bandwidths_numpy(times, packet_size, carry=carry, include_last=include_last)
+    assert slots.tolist() == time_slots
+    assert values.tolist() == bandwidths
+
+
+def test_slot_index_matches_linear_scan():
+    rng = np.random.default_rng(7)
+    time_slots = np.cumsum(np.full(500, 1e-4)).tolist()
+    bandwidths = rng.integers(1, 50, 500).astype(float).tolist()
+    index = score_calculator.SlotIndex(time_slots, bandwidths)
+    starts = rng.uniform(0, 0.06, 200)
+    ends = starts + rng.uniform(0, 0.01, 200)
+    averages, fluctuations = index.window_metrics(starts, ends)
+    for start, end, average, fluctuation in zip(starts, ends, averages, fluctuations):
+        exact = index.interval_metrics(start, end)
+        assert average == pytest.approx(exact[0], rel=1e-12, abs=1e-12)
+        assert fluctuation == pytest.approx(exact[1], rel=1e-12, abs=1e-12)
+
+
+def linear_metrics(time_slots, bandwidths, start_time, end_time):
+    """原始 calculate_interval_metrics 的线性扫描"""
+    try:
+        start_index = next(i for i, t in enumerate(time_slots) if t >= start_time)
+        end_index = next(i for i, t in enumerate(time_slots) if t >= end_time)
+    except StopIteration:
+        return 0, 0
+    specified = bandwidths[start_index:end_index]
+    if not specified:
+        return 0, 0
+    average = sum(specified) / len(specified)
+    return average, (max(specified) - min(specified)) / average
+
+
+def test_slot_index_edges():
+    time_slots = [i * 1e-4 for i in range(20)]
+    bandwidths = [float(i % 5 + 1) for i in range(20)]
+    index = score_calculator.SlotIndex(time_slots, bandwidths)
+    # 起点在首个时隙之前, 终点恰在时隙起点, 空区间, 终点超出最后一个时隙 (原实现为 StopIteration)
+    for start, end in [(-1.0, 5e-4), (2e-4, 2e-4), (3e-4, 2.5e-4), (0.0, 1.9e-3), (0.0, 1.95e-3), (0.5, 0.6),
+                       (1.2e-4, 7.7e-4)]:
+        assert index.interval_metrics(start, end) == linear_metrics(time_slots, bandwidths, start, end)
+        averages, fluctuations = index.window_metrics([start], [end])
+        assert (averages[0], fluctuations[0]) == pytest.approx(linear_metrics(time_slots, bandwidths, start, end))
+
+
+def test_window_metrics_zero_average():
+    index = score_calculator.SlotIndex([0.0, 1e-4, 2e-4, 3e-4], [0.0, 0.0, 4.0, 0.0])
+    averages, fluctuations = index.window_metrics([0.0, 0.0], [2e-4, 3e-4])
+    # 均值为 0 的窗口记为 (0, 0), 不除以 0
+    assert averages.tolist() == pytest.approx([0.0, 4 / 3])
+    assert fluctuations.tolist() == pytest.approx([0.0, 3.0])
@@ -0,0 +1,78 @@
+"""score_spec 的规格读取, 理论带宽, 以及与 gen_result.py / score_calculator.py 的一致性"""
+import contextlib
+import copy
+import io
+import json
+
+import pytest
+
+import gen_result
+import score_calculator
+import score_spec
+from conftest import write_topology
+
+
+def test_topology_bandwidth(tmp_path):
+    topology = write_topology(tmp_path / 'topology.txt')
+    assert score_spec.topology_bandwidth(topology, (320, 416)) == 8 * 12 * 25
+    assert score_spec.topology_bandwidth(topology) == 416 * 25
+
+
+def test_theoretical_bandwidth_from_config(run_dir):
+    spec = score_spec.named_spec(gen_result.RESULT_SPEC)
+    assert score_spec.theoretical_bandwidth(spec, 'config.txt') == 8 * 12 * 25
+    assert score_spec.theoretical_bandwidth(dict(spec, theoretical_bandwidth=1200)) == 1200
+
+
+def test_expand_specs_variants():
+    specs = score_spec.expand_specs({'slot': 1e-3, 'variants': [{'name': 'a'}, {'name': 'b', 'carry': True}]})
+    assert [spec['name'] for spec in specs] == ['a', 'b']
+    assert all(spec['slot'] == 1e-3 for spec in specs)
+    assert [spec['carry'] for spec in specs] == [False, True]
+    with pytest.raises(score_spec.SpecError):
+        score_spec.expand_specs({'slots': 1e-3})
+    with pytest.raises(score_spec.SpecError):
+        score_spec.expand_specs({'windows': [{'start': 0.1, 'end': 0.1}]})
+
+
+def test_load_json_and_toml(tmp_path):
+    with open(tmp_path / 'a.json', 'w') as file:
+        json.dump({'header_bytes': 0}, file)
+    with open(tmp_path / 'b.toml', 'w') as file:
+        file.write('name = "b"\nslot = 0.001\n')
+    specs = score_spec.load_specs([tmp_path / 'a.json', tmp_path / 'b.toml'])
+    assert [(spec['name'], spec['header_bytes'], spec['slot']) for spec in specs] == [
+        ('a', 0, 1e-4), ('b', 18, 1e-3)]
+
+
+@pytest.mark.parametrize('flows', [6400, 100])
+def test_named_specs_match_scripts(run_dir, flows):
+    with open('flow.txt', 'w') as file:
+        file.write(f'{flows}\n')
+    specs = [score_spec.named_spec(gen_result.RESULT_SPEC), score_spec.named_spec(score_calculator.SCORE_SPEC)]
+    counters = score_spec.scan_slot_counters('mix.tr', {spec['slot'] for spec in specs}, use_cache=False)
+    by_result, by_calculator = score_spec.score_specs(specs, counters, 1000)
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        result = gen_result.compute_result(*gen_result.slot_bandwidths('mix.tr', 1000, use_cache=False), 1000)
+        time_slots, bandwidths = score_calculator.counter_bandwidths(counters[specs[1]['slot']], 1000)
+        score = score_calculator.score_bandwidths(time_slots, bandwidths, counters[specs[1]['slot']].last_time,
+                                                  flows == 6400)
+
+    assert by_result['final_score'] == pytest.approx(result['final_score'], rel=1e-9)
+    assert [window['fluctuation_rate'] for window in by_result['windows']] == pytest.approx(result['fluctuation_rates'])
+    assert by_calculator['final_score'] == pytest.approx(score['final_score'], rel=1e-9)
+    assert [window['start'] for window in by_calculator['windows']] == [start for start, _ in score['intervals']]
+
+
+def test_scripts_follow_spec_values(run_dir):
+    """头部开销与理论带宽来自传入的规格, 而不是脚本中的常量"""
+    spec = score_spec.named_spec(gen_result.RESULT_SPEC)
+    halved = copy.deepcopy(spec)
+    halved.update(header_bytes=0, theoretical_bandwidth=1200)
+    with contextlib.redirect_stdout(io.StringIO()):
+        result = gen_result.compute_result(*gen_result.slot_bandwidths('mix.tr', 1000, use_cache=False), 1000)
+        changed = gen_result.compute_result(
+            *gen_result.slot_bandwidths('mix.tr', 1000, use_cache=False, spec=halved), 1000, spec=halved)
+    assert changed['average_bandwidth'] == pytest.approx(result['average_bandwidth'] * 1000 / 1018)
+    assert changed['bandwidth_utilization'] == pytest.approx(result['bandwidth_utilization'] * 2 * 1000 / 1018)
@@ -0,0 +1,159 @@
+"""sweep 的网格展开, 运行目录建立, 以及调度器与结果缓存和任务日志的配合"""
+import os
+import csv
+import sys
+import stat
+
+import pytest
+
+import sweep
+from job_journal import JobJournal
+from result_cache import ResultCache
+
+# 代替仿真程序: 读取 config.txt, U_TARGET 为 0.5 时失败, 否则写出 mix.tr 并按 third.cc 的格式报告进度
+FAKE_SIM = '''#!{python}
+import os, sys
+config = dict(line.split(None, 1) for line in open(sys.argv[-1]).read().splitlines() if line.strip())
+print("tag", os.environ.get("SWEEP_TAG"))
+if config["U_TARGET"].strip() == "0.5":
+    sys.exit(3)
+with open(config["TRACE_OUTPUT_FILE"].strip(), "w") as file:
+    file.write("x" * 1000 * int(config["CC_MODE"]))
+print("PROGRESS sim 2.010000 s events 100 rate 1000 ev/s wall 0.100 s sim/wall 20.1")
+print("DONE sim 2.100000 s events %d rate 1 ev/s wall 0.200 s" % (1000 * int(config["CC_MODE"])))
+'''
+
+
+def write_flows(path, count):
+    with open(path, 'w') as file:
+        file.write(f'{count}\n')
+        for i in range(count):
+            file.write(f'{i} {i + 1} 3 100 {1000 * (i + 1)} 2.0\n')
+    return path
+
+
+@pytest.fixture
+def sweep_dir(tmp_path):
+    """扫描目录: base/ 下的模板 config.txt 与拓扑, 两个流文件, 以及代替仿真程序的 sim.py"""
+    base = tmp_path / 'base'
+    base.mkdir()
+    (base / 'topology.txt').write_text('2 1 1\n1\n0 1 100Gbps 0.001ms 0\n')
+    (base / 'config.txt').write_text(
+        'PACKET_PAYLOAD_SIZE 1000\nTOPOLOGY_FILE topology.txt\nFLOW_FILE flow.txt\n'
+        'TRACE_OUTPUT_FILE mix.tr\nCC_MODE 1\nU_TARGET 0.95\n')
+    write_flows(tmp_path / 'small.txt', 3)
+    write_flows(tmp_path / 'large.txt', 8)
+    program = tmp_path / 'sim.py'
+    program.write_text(FAKE_SIM.format(python=sys.executable))
+    program.chmod(program.stat().st_mode | stat.S_IXUSR)
+    return str(tmp_path)
+
+
+def description(**changes):
+    spec = {
+        'base_config': 'base/config.txt',
+        'flows': ['small.txt', 'large.txt'],
+        'binaries': [{'name': 'fake', 'command': ['../../../sim.py'], 'env': {'SWEEP_TAG': 'grid'}}],
+        'grid': {'CC_MODE': [1, 3], 'U_TARGET': [0.5, 0.9]},
+        'root': 'runs',
+    }
+    spec.update(changes)
+    return spec
+
+
+def test_override_config_and_variant_name():
+    lines = ['CC_MODE 1', '', 'KMAX_MAP 3 25000000000 400', 'U_TARGET 0.95']
+    assert sweep.override_config(lines, {'CC_MODE': 3, 'KMAX_MAP': [2, 100, 4], 'RATE_AI': '5Mb/s'}) == [
+        'CC_MODE 3', '', 'KMAX_MAP 2 100 4', 'U_TARGET 0.95', 'RATE_AI 5Mb/s']
+    assert sweep.variant_name('hpcc', {'CC_MODE': 3, 'KMAX_MAP': [2, 100], 'TRACE_FILE': 'a/b.txt'}) == \
+        'hpcc-CC_MODE=3-KMAX_MAP=2_100-TRACE_FILE=a_b.txt'
+
+
+def test_parse_cpu_list_and_duration():
+    assert sweep.parse_cpu_list('0-3,6,,8-9') == [0, 1, 2, 3, 6, 8, 9]
+    assert sweep.format_duration(3725.9) == '1:02:05'
+
+
+def test_expand_sweep_directories(sweep_dir):
+    write_flows(os.path.join(sweep_dir, 'other.txt'), 3)
+    spec = description(flows=['small.txt', 'other.txt', 'large.txt'], grid={'CC_MODE': [1, 3]})
+    spec['binaries'].append({'name': 'hpcc', 'command': ['../../../sim.py']})
+    runs = sweep.expand_sweep(spec, sweep_dir)
+    names = [os.path.relpath(directory, sweep_dir) for directory, _, _, _ in runs]
+    # 流数相同的流文件以文件名区分
+    assert names == [os.path.join('runs', flows, name)
+                     for flows in ('3-small', '3-other', '8')
+                     for name in ('fake-CC_MODE=1', 'fake-CC_MODE=3', 'hpcc-CC_MODE=1', 'hpcc-CC_MODE=3')]
+    assert [overrides for _, _, _, overrides in runs[:2]] == [{'CC_MODE': 1}, {'CC_MODE': 3}]
+    with pytest.raises(sweep.SweepError):
+        sweep.expand_sweep(description(flows=[]), sweep_dir)
+
+
+def test_materialize_run_directories(sweep_dir):
+    jobs = sweep.materialize(description(), sweep_dir, dry_run=True)
+    assert len(jobs) == 8
+    assert not os.path.exists(os.path.join(sweep_dir, 'runs'))
+
+    jobs = sweep.materialize(description(), sweep_dir)
+    job = jobs[3]
+    assert os.path.relpath(job.directory, sweep_dir) == os.path.join('runs', '3', 'fake-CC_MODE=3-U_TARGET=0.9')
+    assert job.command == ['../../../sim.py', 'config.txt']
+    assert job.env == {'SWEEP_TAG': 'grid'}
+    config = open(os.path.join(job.directory, 'config.txt')).read().splitlines()
+    assert config == ['PACKET_PAYLOAD_SIZE 1000', 'TOPOLOGY_FILE ../../../base/topology.txt', 'FLOW_FILE ../flow.txt',
+                      'TRACE_OUTPUT_FILE mix.tr', 'CC_MODE 3', 'U_TARGET 0.9']
+    # 输入路径相对于运行目录仍指向原文件
+    assert os.path.samefile(os.path.join(job.directory, '../../../base/topology.txt'),
+                            os.path.join(sweep_dir, 'base', 'topology.txt'))
+    for flows, source in (('3', 'small.txt'), ('8', 'large.txt')):
+        copy = os.path.join(sweep_dir, 'runs', flows, 'flow.txt')
+        assert open(copy).read() == open(os.path.join(sweep_dir, source)).read()
+
+
+def test_runner_journal_cache_and_resume(sweep_dir):
+    journal = JobJournal(os.path.join(sweep_dir, 'sweep_journal.jsonl'))
+    cache = ResultCache(os.path.join(sweep_dir, 'cache'))
+    cpus = sweep.default_cpus()[:2]
+    jobs = sweep.materialize(description(), sweep_dir)
+    failed = sweep.SweepRunner(jobs, cpus, reserve_mb=0, cache=cache, journal=journal).run()
+
+    failing = [job.directory for job in jobs if job.directory.endswith('U_TARGET=0.5')]
+    assert sorted(job.directory for job in failed) == sorted(failing)
+    assert all(job.returncode == 3 for job in failed)
+    latest = journal.load()
+    for job in jobs:
+        entry = latest[journal._key(job.directory)]
+        assert open(os.path.join(job.directory, 'out.txt')).readline() == 'tag grid\n'
+        if job.directory in failing:
+            assert entry['state'] == 'failed' and entry['outputs'] == {}
+            continue
+        assert entry['state'] == 'done' and entry['returncode'] == 0
+        # mix.tr 只记录大小与修改时间
+        assert entry['outputs']['mix.tr']['sha256'] is None
+        assert entry['outputs']['out.txt']['sha256'] is not None
+        mode = int(job.directory.split('CC_MODE=')[1][0])
+        assert entry['profile']['events'] == 1000 * mode
+        assert entry['profile']['trace_bytes'] == 1000 * mode
+    assert journal.pending([job.directory for job in jobs]) == failing
+
+    summary = os.path.join(sweep_dir, 'sweep_profile.csv')
+    sweep.write_profile_summary(journal, [job.directory for job in jobs], ['CC_MODE'], summary)
+    with open(summary, newline='') as file:
+        rows = list(csv.DictReader(file))
+    # 失败的运行没有画像; event_rate 以仿真自报的 wall 0.2 s 为分母
+    assert sorted((row['CC_MODE'], row['runs'], float(row['mean_event_rate'])) for row in rows) == [
+        ('1', '2', 5000.0), ('3', '2', 15000.0)]
+
+    # 重新建立的目录: 成功过的运行从缓存放回, 失败的再次运行
+    for job in jobs:
+        if job.directory not in failing:
+            os.remove(os.path.join(job.directory, 'mix.tr'))
+    jobs = sweep.materialize(description(), sweep_dir)
+    runner = sweep.SweepRunner(jobs, cpus, reserve_mb=0, cache=cache, journal=journal)
+    assert len(runner.run()) == len(failing)
+    latest = journal.load()
+    for job in jobs:
+        if job.directory not in failing:
+            assert job.cached and latest[journal._key(job.directory)]['state'] == 'cached'
+            assert os.path.getsize(os.path.join(job.directory, 'mix.tr')) == latest[journal._key(job.directory)][
+                'outputs']['mix.tr']['size']
@@ -0,0 +1,7 @@
+"""Windows 目录中的共享模块副本与本目录一致"""
+import sync_windows
+
+
+def test_windows_copies_are_in_sync():
+    stale = sync_windows.stale_copies()
+    assert not stale, f"run sync_windows.py: {[str(copy) for copy in stale]}"
@@ -0,0 +1,402 @@
+"""trace_stream 的各种读取方式与逐行解析一致, SlotCounter 与逐包循环一致"""
+import os
+import shutil
+import subprocess
+
+import numpy as np
+import pytest
+
+import trace_stream
+from conftest import make_times, trace_lines, write_trace
+
+COLUMNS = tuple(trace_stream.TRACE_COLUMNS)
+
+
+def parse_lines(lines):
+    """逐行解析 TraceFormat::Serialize 的文本, 作为各读取方式的参照"""
+    rows = {name: [] for name in COLUMNS}
+    for line in lines:
+        parts = line.split()
+        if len(parts) < trace_stream.TRACE_FIELDS:
+            continue
+        src, dst = parts[2].split('>')
+        rows['time'].append(float(parts[0]))
+        rows['node'].append(int(parts[1][1:]))
+        for name, address in (('sip', src), ('dip', dst)):
+            second, fourth = map(int, address.split('.'))
+            rows[name].append(second << 16 | fourth)
+        rows['sport'].append(int(parts[4]))
+        rows['seq'].append(int(parts[5]))
+        rows['pg'].append(int(parts[6]))
+    return {name: np.array(values, dtype=trace_stream.TRACE_COLUMNS[name][1]) for name, values in rows.items()}
+
+
+def concatenate(chunks, columns=COLUMNS):
+    return trace_stream._concatenate_chunks(list(chunks), columns)
+
+
+def assert_columns_equal(actual, expected, columns=COLUMNS):
+    for name in columns:
+        assert actual[name].dtype == expected[name].dtype, name
+        assert actual[name].tolist() == expected[name].tolist(), name
+
+
+@pytest.fixture
+def trace(tmp_path):
+    times = make_times(5000, seed=3)
+    path = write_trace(tmp_path / 'mix.tr', times, seed=3)
+    with open(path) as file:
+        return path, parse_lines(file.readlines())
+
+
+@pytest.mark.parametrize('chunk_bytes', [97, 4096, trace_stream.CHUNK_BYTES])
+def test_chunks_match_line_parser(trace, chunk_bytes):
+    path, expected = trace
+    chunks = list(trace_stream.iter_trace_chunks(path, COLUMNS, chunk_bytes))
+    assert_columns_equal(concatenate(chunks), expected)
+
+
+def test_irregular_lines_are_skipped(tmp_path):
+    lines = trace_lines(make_times(50, seed=4), seed=4)
+    lines[10] = '\n'
+    lines[20] = 'truncated line\n'
+    lines[-1] = lines[-1].rstrip('\n')
+    path = tmp_path / 'mix.tr'
+    path.write_text(''.join(lines))
+    chunks = trace_stream.iter_trace_chunks(str(path), COLUMNS, 256)
+    assert_columns_equal(concatenate(chunks), parse_lines(lines))
+
+
+def slot_loop(times, duration=1e-4):
+    """score_calculator 原始循环 (carry) 中每个时隙的起点与包数"""
+    starts, counts = [times[0]], [0]
+    for t in times:
+        if t < starts[-1] + duration:
+            counts[-1] += 1
+        else:
+            starts.append(starts[-1] + duration)
+            counts.append(1)
+    return starts, counts
+
+
+@pytest.mark.parametrize('seed', range(3))
+@pytest.mark.parametrize('splits', [1, 7, 100])
+def test_slot_counter_chunks_match_loop(seed, splits):
+    times = make_times(4000, seed, duration=0.02)
+    counter = trace_stream.SlotCounter()
+    for chunk in np.array_split(times, splits):
+        counter.update(chunk)
+    starts, counts = slot_loop(times.tolist())
+    time_slots, bandwidths = counter.result(1000)
+    assert time_slots.tolist() == starts
+    assert bandwidths.tolist() == [(count * 1000 * 8) / 1e-4 / 1e9 for count in counts]
+    assert counter.num_packets == len(times)
+    assert counter.last_time == times[-1]
+
+
+def test_slot_counter_out_of_order_times():
+    """时间戳回退 (如分片未归并) 时退回逐包循环, 结果仍与循环一致"""
+    times = make_times(2000, seed=5, duration=0.01)
+    times[500:560] = times[500:560][::-1]
+    counter = trace_stream.SlotCounter()
+    for chunk in np.array_split(times, 4):
+        counter.update(chunk)
+    starts, counts = slot_loop(times.tolist())
+    time_slots, _ = counter.result(1000)
+    assert time_slots.tolist() == starts
+    assert counter.counts[:counter.last_slot + 1].tolist() == counts
+
+
+def test_cache_matches_parser(trace):
+    path, expected = trace
+    assert trace_stream.load_trace_cache(path) is None
+    first = concatenate(trace_stream.iter_trace_columns(path, COLUMNS))
+    cached = trace_stream.load_trace_cache(path)
+    assert cached is not None
+    second = concatenate(trace_stream.iter_trace_columns(path, COLUMNS))
+    loaded = trace_stream.load_trace_columns(path, COLUMNS)
+    for columns in (first, second, loaded):
+        assert_columns_equal({name: np.asarray(values, dtype=expected[name].dtype) for name, values in columns.items()},
+                             expected)
+
+
+def test_cache_invalidated_when_trace_changes(trace, tmp_path):
+    path, _ = trace
+    concatenate(trace_stream.iter_trace_columns(path), ('time',))
+    assert trace_stream.load_trace_cache(path) is not None
+
+    # 重新仿真写出的 trace: 大小或修改时间变化都使缓存作废
+    lines = trace_lines(make_times(3000, seed=9), seed=9)
+    with open(path, 'w') as file:
+        file.writelines(lines)
+    assert trace_stream.load_trace_cache(path) is None
+    assert_columns_equal(concatenate(trace_stream.iter_trace_columns(path, COLUMNS)), parse_lines(lines))
+
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1))
+    assert trace_stream.load_trace_cache(path) is None
+
+
+def test_no_cache_leaves_no_files(trace, tmp_path):
+    path, expected = trace
+    assert_columns_equal(concatenate(trace_stream.iter_trace_columns(path, COLUMNS, use_cache=False)), expected)
+    assert sorted(p.name for p in tmp_path.iterdir()) == ['mix.tr']
+
+
+def test_partial_read_does_not_commit_cache(trace):
+    path, _ = trace
+    chunks = trace_stream.iter_trace_columns(path)
+    next(chunks)
+    chunks.close()
+    assert trace_stream.load_trace_cache(path) is None
+
+
+@pytest.mark.parametrize('window_bytes', [64, 1000, trace_stream.MMAP_WINDOW_BYTES])
+def test_mmap_matches_parser(trace, window_bytes):
+    path, expected = trace
+    chunks = trace_stream.iter_trace_mmap(path, COLUMNS, window_bytes)
+    assert_columns_equal(concatenate(chunks), expected)
+
+
+def test_mmap_irregular_window_falls_back(tmp_path):
+    lines = trace_lines(make_times(300, seed=6), seed=6)
+    lines[100] = 'garbage\n'
+    lines[200] = lines[200].replace(' u ', ' u  ')
+    path = tmp_path / 'mix.tr'
+    path.write_text(''.join(lines))
+    assert trace_stream._parse_fixed_layout(np.frombuffer(path.read_bytes(), dtype=np.uint8), COLUMNS) is None
+    for window_bytes in (500, 1 << 20):
+        chunks = trace_stream.iter_trace_mmap(str(path), COLUMNS, window_bytes)
+        assert_columns_equal(concatenate(chunks), parse_lines(lines))
+
+
+def test_mmap_time_is_exact():
+    """定点组合出的时间与 float() 解析文本逐位一致"""
+    rng = np.random.default_rng(11)
+    times = ['%.7f' % t for t in rng.uniform(0, 10, 2000)] + ['0.0000001', '9.9999999', '2.0000000']
+    data = ''.join(f'{t} /1 0.1>0.2 u 10000 1 3\n' for t in times).encode()
+    chunk = trace_stream._parse_fixed_layout(np.frombuffer(data, dtype=np.uint8), ('time',))
+    assert chunk['time'].tolist() == [float(t) for t in times]
+
+
+def test_count_trace_lines(tmp_path):
+    path = tmp_path / 'mix.tr'
+    path.write_text('a\nb\n')
+    assert trace_stream.count_trace_lines(str(path), 1) == 2
+    path.write_text('a\nb')
+    assert trace_stream.count_trace_lines(str(path)) == 2
+    path.write_text('')
+    assert trace_stream.count_trace_lines(str(path)) == 1
+
+
+RECORD = np.dtype([('time', '<u8'), ('node', '<u2'), ('sip', '<u4'), ('dip', '<u4'), ('sport', '<u2'),
+                   ('seq', '<u4'), ('pg', '<u2')], align=False)
+
+
+def write_binary_trace(path, records):
+    """按 TraceFormat::WriteBinaryHeader 的布局写出二进制 trace"""
+    fields = np.zeros(len(RECORD.names), dtype=trace_stream.BINARY_FIELD)
+    for i, name in enumerate(RECORD.names):
+        fields[i] = (name.encode(), RECORD.fields[name][0].str.encode(), RECORD.fields[name][1])
+    header = np.zeros(1, dtype=trace_stream.BINARY_HEADER)
+    header[0] = (trace_stream.BINARY_MAGIC, trace_stream.BINARY_VERSION,
+                 trace_stream.BINARY_HEADER.itemsize + fields.nbytes, RECORD.itemsize, len(fields))
+    with open(path, 'wb') as file:
+        file.write(header.tobytes() + fields.tobytes() + records.tobytes())
+    return str(path)
+
+
+def binary_records(num_records, seed=0):
+    rng = np.random.default_rng(seed)
+    records = np.zeros(num_records, dtype=RECORD)
+    records['time'] = np.sort(rng.integers(0, 200_000_000, num_records))
+    # 恰好余 50ns 的时间需要按文本格式逐个换算
+    records['time'][::17] = records['time'][::17] // 100 * 100 + 50
+    records['node'] = rng.integers(0, 416, num_records)
+    records['sip'] = rng.integers(0, 1 << 32, num_records, dtype=np.uint64)
+    records['dip'] = rng.integers(0, 1 << 32, num_records, dtype=np.uint64)
+    records['sport'] = rng.integers(10000, 10050, num_records)
+    records['seq'] = rng.integers(0, 1 << 32, num_records, dtype=np.uint64)
+    records['pg'] = 3
+    return records
+
+
+def text_lines(records):
+    """同一组记录按 TraceFormat::Serialize 的文本格式输出"""
+    return ['%.7f /%u %u.%u>%u.%u u %u %u %u\n' % (
+        int(r['time']) / 1e9, r['node'], (r['sip'] >> 16) & 0xff, r['sip'] & 0xff,
+        (r['dip'] >> 16) & 0xff, r['dip'] & 0xff, r['sport'], r['seq'], r['pg']) for r in records]
+
+
+def test_binary_matches_text(tmp_path):
+    records = binary_records(3000, seed=2)
+    path = write_binary_trace(tmp_path / 'mix.trb', records)
+    expected = parse_lines(text_lines(records))
+    assert trace_stream.resolve_trace_path(str(tmp_path / 'mix.tr')) == path
+    assert trace_stream.is_binary_trace(path)
+
+    chunks = concatenate(trace_stream.iter_trace_columns(path, COLUMNS))
+    loaded = trace_stream.load_trace_columns(path, COLUMNS)
+    for columns in (chunks, loaded):
+        columns = {name: np.asarray(values, dtype=np.int64 if name != 'time' else np.float64)
+                   for name, values in columns.items()}
+        for name in ('sip', 'dip'):
+            # 文本只保留 IP 的第二和第四个字节
+            columns[name] = columns[name] & 0x00ff00ff
+        assert_columns_equal(columns, expected)
+    # 二进制 trace 直接映射, 不写列式缓存
+    assert not os.path.exists(trace_stream.cache_path(path))
+
+
+def test_binary_time_seconds_ties():
+    ns = np.array([50, 150, 250, 1_000_000_050, 123_456_789, 99_999_999_950])
+    assert trace_stream.binary_time_seconds(ns).tolist() == [float('%.7f' % (t / 1e9)) for t in ns.tolist()]
+
+
+def test_binary_partial_record_is_ignored(tmp_path):
+    records = binary_records(100, seed=3)
+    path = write_binary_trace(tmp_path / 'mix.trb', records)
+    with open(path, 'ab') as file:
+        file.write(b'\0' * (RECORD.itemsize // 2))
+    assert len(trace_stream.load_binary_trace(path)) == 100
+
+
+@pytest.mark.parametrize('rows_per_chunk', [None, 37])
+def test_shards_merge_in_time_order(trace, tmp_path, monkeypatch, rows_per_chunk):
+    path, expected = trace
+    if rows_per_chunk:
+        # 小块使归并跨越多个块边界
+        iter_columns = trace_stream.iter_trace_columns
+
+        def small_chunks(*args, **kwargs):
+            for chunk in iter_columns(*args, **kwargs):
+                for start in range(0, len(chunk['time']), rows_per_chunk):
+                    yield {name: values[start:start + rows_per_chunk] for name, values in chunk.items()}
+        monkeypatch.setattr(trace_stream, 'iter_trace_columns', small_chunks)
+    with open(path) as file:
+        lines = file.readlines()
+    shard_dir = tmp_path / 'shards'
+    shard_dir.mkdir()
+    # 每 100 个节点一个分片, 各分片内保持时间顺序
+    for shard in range(5):
+        with open(shard_dir / f'mix.{shard:04d}.tr', 'w') as file:
+            file.writelines(line for line in lines if int(line.split()[1][1:]) // 100 == shard)
+    merged_path = str(shard_dir / 'mix.tr')
+    assert [name.rsplit('/', 1)[-1] for name in trace_stream.trace_shards(merged_path)] == [
+        f'mix.{shard:04d}.tr' for shard in range(5)]
+
+    merged = concatenate(trace_stream.merge_trace_columns(trace_stream.trace_shards(merged_path), COLUMNS, False))
+    assert merged['time'].tolist() == sorted(expected['time'].tolist())
+    rows = lambda columns: sorted(zip(*(columns[name].tolist() for name in COLUMNS)))
+    assert rows(merged) == rows(expected)
+    # 同一时刻的记录按分片顺序排列
+    order = np.lexsort((merged['node'] // 100, merged['time']))
+    assert np.array_equal(order, np.arange(len(order)))
+    # mix.tr 不存在时读取接口自动归并分片
+    assert_columns_equal(concatenate(trace_stream.iter_trace_columns(merged_path, COLUMNS, use_cache=False)), merged)
+
+
+def compress(path, compression):
+    """用命令行工具压缩, 与仿真通过管道写出的压缩 trace 相同"""
+    if shutil.which(compression) is None:
+        pytest.skip(f'{compression} not installed')
+    subprocess.run([compression, '-q', '-k', path], check=True)
+    return path + ('.gz' if compression == 'gzip' else '.zst')
+
+
+@pytest.mark.parametrize('compression', ['gzip', 'zstd'])
+def test_compressed_text_trace(trace, compression):
+    path, expected = trace
+    compressed = compress(path, compression)
+    os.unlink(path)
+    assert trace_stream.resolve_trace_path(path) == compressed
+    assert trace_stream.trace_compression(compressed) == compression
+    assert_columns_equal(concatenate(trace_stream.iter_trace_mmap(compressed, COLUMNS)), expected)
+    # 第一次读取后写入列式缓存, 之后不再解压
+    assert_columns_equal(concatenate(trace_stream.iter_trace_columns(compressed, COLUMNS)), expected)
+    assert trace_stream.load_trace_cache(compressed) is not None
+    loaded = trace_stream.load_trace_columns(compressed, COLUMNS)
+    assert loaded['time'].tolist() == expected['time'].tolist()
+
+
+@pytest.mark.parametrize('compression', ['gzip', 'zstd'])
+def test_compressed_binary_trace(tmp_path, compression):
+    records = binary_records(500, seed=4)
+    path = write_binary_trace(tmp_path / 'mix.trb', records)
+    expected = concatenate(trace_stream.iter_binary_trace(path, COLUMNS))
+    compressed = compress(path, compression)
+    assert trace_stream.is_binary_trace(compressed)
+    assert_columns_equal(concatenate(trace_stream.iter_binary_trace(compressed, COLUMNS)), expected)
+
+
+@pytest.mark.parametrize('scope', ['total', 'node'])
+def test_series_matches_trace(trace, tmp_path, scope):
+    """100ns 时隙的聚合序列 (ThroughputSink::Dump) 与逐包 trace 得到相同的 SlotCounter"""
+    path, expected = trace
+    slots = np.round(expected['time'] * 1e7).astype(np.int64)
+    keys = expected['node'] if scope == 'node' else np.zeros(len(slots), dtype=np.int64)
+    series = {}
+    for key, slot in zip(keys.tolist(), slots.tolist()):
+        series[key, slot] = series.get((key, slot), 0) + 1
+    series_path = tmp_path / 'agg.txt'
+    with open(series_path, 'w') as file:
+        file.write(f'# slot_ns 100 scope {scope}\n')
+        for (key, slot), packets in sorted(series.items()):
+            file.write((f'{key} ' if scope == 'node' else '') + f'{slot} {packets} {packets * 1018}\n')
+
+    counter = trace_stream.scan_series(str(series_path))
+    reference = trace_stream.scan_trace(path, use_cache=False)
+    for carry, include_last in ((True, True), (False, False)):
+        for actual, wanted in zip(counter.result(1018, carry, include_last), reference.result(1018, carry, include_last)):
+            assert actual.tolist() == wanted.tolist()
+    assert counter.last_time == reference.last_time
+
+
+def follow(follower, data, path, piece_bytes):
+    """把 data 分成 piece_bytes 字节的小段逐段追加到 path, 每次追加后读取新记录"""
+    chunks = []
+    for start in range(0, len(data), piece_bytes):
+        with open(path, 'ab') as file:
+            file.write(data[start:start + piece_bytes])
+        while True:
+            chunk = follower.poll()
+            if chunk is None:
+                break
+            chunks.append(chunk)
+    return chunks
+
+
+@pytest.mark.parametrize('piece_bytes', [5, 333, 1 << 20])
+def test_follower_text(trace, tmp_path, piece_bytes):
+    path, expected = trace
+    with open(path, 'rb') as file:
+        data = file.read()
+    growing = str(tmp_path / 'growing.tr')
+    follower = trace_stream.TraceFollower(growing, COLUMNS)
+    assert follower.poll() is None
+    chunks = follow(follower, data, growing, piece_bytes)
+    follower.close()
+    assert_columns_equal(concatenate(chunks), expected)
+
+
+def test_follower_binary(tmp_path):
+    records = binary_records(400, seed=5)
+    path = write_binary_trace(tmp_path / 'mix.trb', records)
+    with open(path, 'rb') as file:
+        data = file.read()
+    growing = str(tmp_path / 'growing.trb')
+    follower = trace_stream.TraceFollower(growing, COLUMNS)
+    chunks = follow(follower, data, growing, 7)
+    follower.close()
+    assert_columns_equal(concatenate(chunks), concatenate(trace_stream.iter_binary_trace(path, COLUMNS)))
+
+
+def test_follower_truncated(trace, tmp_path):
+    path, _ = trace
+    follower = trace_stream.TraceFollower(path)
+    assert follower.poll() is not None
+    with open(path, 'w') as file:
+        file.write('0.0000001 /1 0.1>0.2 u 10000 1 3\n')
+    with pytest.raises(RuntimeError):
+        follower.poll()
+    follower.close()